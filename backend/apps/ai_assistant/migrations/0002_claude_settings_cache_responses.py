@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 06:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ai_assistant', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userclaudesettings',
+            name='cache_responses',
+            field=models.BooleanField(default=True, help_text='Answer repeated identical requests from the response cache'),
+        ),
+    ]
@@ -22,6 +22,10 @@ class UserClaudeSettings(models.Model):
     max_tokens = models.IntegerField(default=4096, help_text="Maximum tokens per response")
     temperature = models.FloatField(default=0.7, help_text="Response creativity (0.0-1.0)")
     is_active = models.BooleanField(default=False, help_text="Whether AI features are enabled")
+    cache_responses = models.BooleanField(
+        default=True,
+        help_text="Answer repeated identical requests from the response cache"
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -4,6 +4,8 @@ from .base import (
     BaseAIService, AIProvider, AIMessage, AIModelInfo, 
     AIResponse, AIStreamChunk, AIServiceError
 )
+from .http_client import get_async_client, request_timeout
+from .resilience import parse_retry_after
 
 
 class AnthropicService(BaseAIService):
@@ -11,6 +13,15 @@ class AnthropicService(BaseAIService):
         return AIProvider.ANTHROPIC
 
     def _initialize_client(self, **kwargs) -> None:
+        # Reuse the process-wide connection pool instead of opening new
+        # connections for every service instance
+        http_client = get_async_client()
+        if http_client is not None:
+            kwargs.setdefault('http_client', http_client)
+        # BaseAIService retries; SDK retries on top would multiply attempts
+        kwargs.setdefault('max_retries', 0)
+        if isinstance(kwargs.get('timeout'), (int, float)):
+            kwargs['timeout'] = request_timeout(kwargs['timeout'])
         try:
             self._client = anthropic.AsyncAnthropic(
                 api_key=self.api_key,
@@ -80,7 +91,7 @@ class AnthropicService(BaseAIService):
         # Return both formatted messages and system prompt
         return formatted, "\n\n".join(system_messages) if system_messages else None
 
-    async def generate_response(
+    async def _generate_response(
         self,
         messages: List[AIMessage],
         model: str,
@@ -136,13 +147,23 @@ class AnthropicService(BaseAIService):
         except anthropic.AuthenticationError as e:
             raise AIServiceError("Invalid API key", self.provider, "AUTHENTICATION_ERROR")
         except anthropic.RateLimitError as e:
-            raise AIServiceError("Rate limit exceeded", self.provider, "RATE_LIMIT_ERROR")
+            raise AIServiceError("Rate limit exceeded", self.provider, "RATE_LIMIT_ERROR",
+                                 retry_after=parse_retry_after(e.response.headers))
         except anthropic.BadRequestError as e:
             raise AIServiceError(f"Bad request: {str(e)}", self.provider, "BAD_REQUEST")
+        except anthropic.APITimeoutError as e:
+            raise AIServiceError("Request timed out", self.provider, "TIMEOUT")
+        except anthropic.APIConnectionError as e:
+            raise AIServiceError(f"Connection error: {str(e)}", self.provider, "CONNECTION_ERROR")
+        except anthropic.APIStatusError as e:
+            if e.status_code < 500:
+                raise self._handle_error(e, "Anthropic API error")
+            raise AIServiceError("Service unavailable", self.provider, "SERVER_ERROR",
+                                 retry_after=parse_retry_after(e.response.headers))
         except Exception as e:
             raise self._handle_error(e, "Anthropic API error")
 
-    async def generate_stream(
+    async def _generate_stream(
         self,
         messages: List[AIMessage],
         model: str,
@@ -174,35 +195,49 @@ class AnthropicService(BaseAIService):
 
             stream = await self._client.messages.create(**request_params)
 
+            # Input tokens arrive with message_start, output tokens and the
+            # stop reason with message_delta; message_stop carries neither
+            input_tokens = output_tokens = 0
+            stop_reason = None
             async for event in stream:
-                if event.type == "content_block_delta":
+                if event.type == "message_start":
+                    input_tokens = event.message.usage.input_tokens
+                elif event.type == "content_block_delta":
                     if hasattr(event.delta, 'text'):
                         yield AIStreamChunk(
                             content=event.delta.text,
                             finish_reason=None
                         )
+                elif event.type == "message_delta":
+                    output_tokens = event.usage.output_tokens
+                    stop_reason = event.delta.stop_reason
                 elif event.type == "message_stop":
-                    usage = None
-                    if hasattr(event, 'message') and hasattr(event.message, 'usage'):
-                        usage_data = event.message.usage
-                        usage = {
-                            "prompt_tokens": usage_data.input_tokens,
-                            "completion_tokens": usage_data.output_tokens,
-                            "total_tokens": usage_data.input_tokens + usage_data.output_tokens
-                        }
-                    
                     yield AIStreamChunk(
                         content="",
-                        finish_reason="stop",
-                        usage=usage
+                        finish_reason=stop_reason or "stop",
+                        usage={
+                            "prompt_tokens": input_tokens,
+                            "completion_tokens": output_tokens,
+                            "total_tokens": input_tokens + output_tokens
+                        }
                     )
 
         except anthropic.AuthenticationError as e:
             raise AIServiceError("Invalid API key", self.provider, "AUTHENTICATION_ERROR")
         except anthropic.RateLimitError as e:
-            raise AIServiceError("Rate limit exceeded", self.provider, "RATE_LIMIT_ERROR")
+            raise AIServiceError("Rate limit exceeded", self.provider, "RATE_LIMIT_ERROR",
+                                 retry_after=parse_retry_after(e.response.headers))
         except anthropic.BadRequestError as e:
             raise AIServiceError(f"Bad request: {str(e)}", self.provider, "BAD_REQUEST")
+        except anthropic.APITimeoutError as e:
+            raise AIServiceError("Request timed out", self.provider, "TIMEOUT")
+        except anthropic.APIConnectionError as e:
+            raise AIServiceError(f"Connection error: {str(e)}", self.provider, "CONNECTION_ERROR")
+        except anthropic.APIStatusError as e:
+            if e.status_code < 500:
+                raise self._handle_error(e, "Anthropic streaming error")
+            raise AIServiceError("Service unavailable", self.provider, "SERVER_ERROR",
+                                 retry_after=parse_retry_after(e.response.headers))
         except Exception as e:
             raise self._handle_error(e, "Anthropic streaming error")
 
@@ -5,6 +5,9 @@ from enum import Enum
 import asyncio
 import json
 
+from .rate_limit import OutboundRateLimiter, RateLimited
+from .resilience import CircuitBreaker, CircuitOpen, counters, retry_delay
+
 
 class AIProvider(Enum):
     OPENAI = "openai"
@@ -45,16 +48,23 @@ class AIStreamChunk:
 
 
 class AIServiceError(Exception):
-    def __init__(self, message: str, provider: AIProvider, error_code: Optional[str] = None):
+    def __init__(self, message: str, provider: AIProvider, error_code: Optional[str] = None,
+                 retry_after: Optional[int] = None):
         self.provider = provider
         self.error_code = error_code
+        # Seconds the caller should wait before trying again, when known
+        self.retry_after = retry_after
         super().__init__(message)
 
 
 class BaseAIService(ABC):
-    def __init__(self, api_key: str, **kwargs):
+    def __init__(self, api_key: str, user_id=None, **kwargs):
         self.api_key = api_key
         self.provider = self.get_provider()
+        # Outbound calls are rate limited per API key and, when known, per user
+        self.rate_limiter = OutboundRateLimiter(api_key, user_id=user_id)
+        # Shared by every service instance of the provider
+        self.circuit_breaker = CircuitBreaker(self.provider.value)
         self._client = None
         self._initialize_client(**kwargs)
 
@@ -70,7 +80,6 @@ class BaseAIService(ABC):
     def get_available_models(self) -> List[AIModelInfo]:
         pass
 
-    @abstractmethod
     async def generate_response(
         self,
         messages: List[AIMessage],
@@ -78,11 +87,102 @@ class BaseAIService(ABC):
         max_tokens: Optional[int] = None,
         temperature: float = 0.7,
         **kwargs
+    ) -> AIResponse:
+        """
+        Provider completion, once the circuit breaker and the outbound rate
+        limiter let the call through, retrying transient failures.
+        """
+        attempt = 0
+        while True:
+            probe = await self._check_circuit()
+            try:
+                permit = await self._acquire_permit(messages, max_tokens)
+                try:
+                    response = await self._generate_response(messages, model, max_tokens, temperature, **kwargs)
+                    await permit.settle(response.usage)
+                finally:
+                    await permit.release()
+            except AIServiceError as e:
+                await self.circuit_breaker.record(e.error_code, probe)
+                await self._before_retry(e, attempt)
+                attempt += 1
+            else:
+                await self.circuit_breaker.record(probe=probe)
+                return response
+
+    async def generate_stream(
+        self,
+        messages: List[AIMessage],
+        model: str,
+        max_tokens: Optional[int] = None,
+        temperature: float = 0.7,
+        **kwargs
+    ) -> AsyncGenerator[AIStreamChunk, None]:
+        """
+        Streaming variant of generate_response(), under the same limits.
+        Failures are retried only until the first chunk has been sent.
+        """
+        attempt = 0
+        while True:
+            probe = await self._check_circuit()
+            started = False
+            try:
+                permit = await self._acquire_permit(messages, max_tokens)
+                try:
+                    async for chunk in self._generate_stream(messages, model, max_tokens, temperature, **kwargs):
+                        if chunk.usage:
+                            await permit.settle(chunk.usage)
+                        if not started:
+                            started = True
+                            await self.circuit_breaker.record(probe=probe)
+                        yield chunk
+                finally:
+                    await permit.release()
+            except AIServiceError as e:
+                await self.circuit_breaker.record(e.error_code, probe and not started)
+                if started:
+                    raise
+                await self._before_retry(e, attempt)
+                attempt += 1
+            else:
+                if not started:
+                    await self.circuit_breaker.record(probe=probe)
+                return
+
+    async def _check_circuit(self) -> bool:
+        try:
+            return await self.circuit_breaker.before_call()
+        except CircuitOpen as e:
+            raise AIServiceError(str(e), self.provider, "CIRCUIT_OPEN", retry_after=e.retry_after)
+
+    async def _before_retry(self, error: AIServiceError, attempt: int):
+        """Wait out the backoff before the next attempt, or re-raise `error` when it's not worth one"""
+        delay = retry_delay(error.error_code, error.retry_after, attempt)
+        if delay is None:
+            raise error
+        counters[f'{self.provider.value}.retries'] += 1
+        await asyncio.sleep(delay)
+
+    async def _acquire_permit(self, messages: List[AIMessage], max_tokens: Optional[int]):
+        estimated_tokens = sum(self.estimate_tokens(message.content) for message in messages) + (max_tokens or 0)
+        try:
+            return await self.rate_limiter.acquire(estimated_tokens)
+        except RateLimited as e:
+            raise AIServiceError(str(e), self.provider, "RATE_LIMITED", retry_after=e.retry_after)
+
+    @abstractmethod
+    async def _generate_response(
+        self,
+        messages: List[AIMessage],
+        model: str,
+        max_tokens: Optional[int] = None,
+        temperature: float = 0.7,
+        **kwargs
     ) -> AIResponse:
         pass
 
     @abstractmethod
-    async def generate_stream(
+    async def _generate_stream(
         self,
         messages: List[AIMessage],
         model: str,
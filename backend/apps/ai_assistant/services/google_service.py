@@ -1,4 +1,5 @@
 import google.generativeai as genai
+from google.api_core import exceptions as google_exceptions
 from google.auth.credentials import Credentials
 from google.oauth2 import service_account
 import json
@@ -9,6 +10,14 @@ from .base import (
 )
 
 
+# Provider-side failures, retried and counted by the circuit breaker
+SERVER_ERRORS = (
+    google_exceptions.InternalServerError,
+    google_exceptions.BadGateway,
+    google_exceptions.ServiceUnavailable,
+)
+
+
 class GoogleAIService(BaseAIService):
     def get_provider(self) -> AIProvider:
         return AIProvider.GOOGLE
@@ -106,7 +115,7 @@ class GoogleAIService(BaseAIService):
         
         return formatted
 
-    async def generate_response(
+    async def _generate_response(
         self,
         messages: List[AIMessage],
         model: str,
@@ -172,6 +181,8 @@ class GoogleAIService(BaseAIService):
                 finish_reason=finish_reason
             )
 
+        except SERVER_ERRORS:
+            raise AIServiceError("Service unavailable", self.provider, "SERVER_ERROR")
         except Exception as e:
             if "API_KEY_INVALID" in str(e) or "authentication" in str(e).lower():
                 raise AIServiceError("Invalid API key", self.provider, "AUTHENTICATION_ERROR")
@@ -180,7 +191,7 @@ class GoogleAIService(BaseAIService):
             else:
                 raise self._handle_error(e, "Google AI API error")
 
-    async def generate_stream(
+    async def _generate_stream(
         self,
         messages: List[AIMessage],
         model: str,
@@ -246,6 +257,8 @@ class GoogleAIService(BaseAIService):
                         usage=usage
                     )
 
+        except SERVER_ERRORS:
+            raise AIServiceError("Service unavailable", self.provider, "SERVER_ERROR")
         except Exception as e:
             if "API_KEY_INVALID" in str(e) or "authentication" in str(e).lower():
                 raise AIServiceError("Invalid API key", self.provider, "AUTHENTICATION_ERROR")
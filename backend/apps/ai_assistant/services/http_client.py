@@ -0,0 +1,154 @@
+"""
+Process-wide pooled HTTP clients for AI provider calls.
+
+A client created per request brings its own connection pool, so every call
+paid for a new TCP and TLS handshake. Services take their HTTP client from
+here instead: one per event loop (an async client's connections belong to
+the loop that opened them), kept alive across requests. Forked children,
+such as gunicorn workers, start with no clients, since the sockets they
+inherit belong to the parent.
+
+A loop's client is closed when asyncio.run() finishes the loop. Reuse
+therefore needs a long-lived loop, as under ASGI. Under WSGI, and in the job
+worker, every async_to_sync() call runs its own loop, so a client only
+lasts that one call.
+
+settings.AI_HTTP_CLIENT configures pool size, keep-alive, HTTP/2 and the
+connect timeout. pool_metrics() reports how often connections are reused.
+"""
+import asyncio
+import importlib.util
+import os
+import sys
+import threading
+import weakref
+
+from django.conf import settings
+
+import anthropic
+
+# The package the SDK is built on: httpx, or its httpx2 fork in later
+# releases. Both can be installed (openai needs httpx), and the SDK rejects
+# timeouts and limits from the other one.
+httpx = sys.modules[anthropic.DefaultAsyncHttpxClient.__mro__[1].__module__.partition('.')[0]]
+
+DEFAULTS = {
+    'MAX_CONNECTIONS': 100,
+    'MAX_KEEPALIVE_CONNECTIONS': 20,
+    # Seconds an idle connection is kept open for reuse
+    'KEEPALIVE_EXPIRY': 60,
+    'CONNECT_TIMEOUT': 5,
+    # Only used when the h2 package is installed
+    'HTTP2': True,
+}
+
+_lock = threading.Lock()
+_clients = weakref.WeakKeyDictionary()
+_counters = {}
+
+
+def get_options():
+    return {**DEFAULTS, **getattr(settings, 'AI_HTTP_CLIENT', {})}
+
+
+def http2_enabled():
+    return bool(get_options()['HTTP2']) and importlib.util.find_spec('h2') is not None
+
+
+def request_timeout(seconds):
+    """Per-call timeout: `seconds` overall, with the configured connect timeout"""
+    return httpx.Timeout(seconds, connect=min(seconds, get_options()['CONNECT_TIMEOUT']))
+
+
+def get_async_client():
+    """
+    Shared client for the running event loop, or None when called outside
+    one (callers then fall back to a client of their own).
+    """
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+    with _lock:
+        entry = _clients.get(loop)
+        if entry is None or entry[0].is_closed:
+            if entry is not None:
+                entry[1].cancel()
+            client = _create_client()
+            # Held here: the loop keeps only weak references to its tasks
+            entry = _clients[loop] = (client, loop.create_task(_close_with_loop(client)))
+        return entry[0]
+
+
+async def _close_with_loop(client):
+    """Closes `client` once cancelled, as asyncio.run() does to the tasks left when it ends"""
+    try:
+        await asyncio.get_running_loop().create_future()
+    finally:
+        await client.aclose()
+
+
+def _create_client():
+    options = get_options()
+    return anthropic.DefaultAsyncHttpxClient(
+        limits=httpx.Limits(
+            max_connections=options['MAX_CONNECTIONS'],
+            max_keepalive_connections=options['MAX_KEEPALIVE_CONNECTIONS'],
+            keepalive_expiry=options['KEEPALIVE_EXPIRY'],
+        ),
+        http2=http2_enabled(),
+        event_hooks={'request': [_on_request], 'response': [_on_response]},
+    )
+
+
+def _count(name):
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + 1
+
+
+async def _on_request(request):
+    request.extensions['trace'] = _trace
+    _count('requests')
+
+
+async def _on_response(response):
+    _count('responses')
+
+
+async def _trace(event, info):
+    if event == 'connection.connect_tcp.complete':
+        _count('connections_opened')
+    elif event == 'connection.start_tls.complete':
+        _count('tls_handshakes')
+
+
+def pool_metrics():
+    """Counters for this process since it started, or since it was forked"""
+    with _lock:
+        counters = dict(_counters)
+        clients = len(_clients)
+    requests = counters.get('requests', 0)
+    opened = counters.get('connections_opened', 0)
+    return {
+        'pid': os.getpid(),
+        'clients': clients,
+        'http2': http2_enabled(),
+        'requests': requests,
+        'responses': counters.get('responses', 0),
+        'connections_opened': opened,
+        'tls_handshakes': counters.get('tls_handshakes', 0),
+        # Share of requests served on an already open connection
+        'connection_reuse_ratio': round(1 - opened / requests, 3) if requests else None,
+        'config': {key.lower(): value for key, value in get_options().items()},
+    }
+
+
+def _reset_after_fork():
+    global _lock
+    # The parent's lock may have been held by another thread at fork time
+    _lock = threading.Lock()
+    _clients.clear()
+    _counters.clear()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
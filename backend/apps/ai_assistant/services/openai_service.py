@@ -4,6 +4,7 @@ from .base import (
     BaseAIService, AIProvider, AIMessage, AIModelInfo, 
     AIResponse, AIStreamChunk, AIServiceError
 )
+from .resilience import parse_retry_after
 
 
 class OpenAIService(BaseAIService):
@@ -11,6 +12,8 @@ class OpenAIService(BaseAIService):
         return AIProvider.OPENAI
 
     def _initialize_client(self, **kwargs) -> None:
+        # BaseAIService retries; SDK retries on top would multiply attempts
+        kwargs.setdefault('max_retries', 0)
         try:
             self._client = openai.AsyncOpenAI(
                 api_key=self.api_key,
@@ -63,7 +66,7 @@ class OpenAIService(BaseAIService):
             )
         ]
 
-    async def generate_response(
+    async def _generate_response(
         self,
         messages: List[AIMessage],
         model: str,
@@ -104,13 +107,23 @@ class OpenAIService(BaseAIService):
         except openai.AuthenticationError as e:
             raise AIServiceError("Invalid API key", self.provider, "AUTHENTICATION_ERROR")
         except openai.RateLimitError as e:
-            raise AIServiceError("Rate limit exceeded", self.provider, "RATE_LIMIT_ERROR")
+            raise AIServiceError("Rate limit exceeded", self.provider, "RATE_LIMIT_ERROR",
+                                 retry_after=parse_retry_after(e.response.headers))
         except openai.BadRequestError as e:
             raise AIServiceError(f"Bad request: {str(e)}", self.provider, "BAD_REQUEST")
+        except openai.APITimeoutError as e:
+            raise AIServiceError("Request timed out", self.provider, "TIMEOUT")
+        except openai.APIConnectionError as e:
+            raise AIServiceError(f"Connection error: {str(e)}", self.provider, "CONNECTION_ERROR")
+        except openai.APIStatusError as e:
+            if e.status_code < 500:
+                raise self._handle_error(e, "OpenAI API error")
+            raise AIServiceError("Service unavailable", self.provider, "SERVER_ERROR",
+                                 retry_after=parse_retry_after(e.response.headers))
         except Exception as e:
             raise self._handle_error(e, "OpenAI API error")
 
-    async def generate_stream(
+    async def _generate_stream(
         self,
         messages: List[AIMessage],
         model: str,
@@ -155,9 +168,19 @@ class OpenAIService(BaseAIService):
         except openai.AuthenticationError as e:
             raise AIServiceError("Invalid API key", self.provider, "AUTHENTICATION_ERROR")
         except openai.RateLimitError as e:
-            raise AIServiceError("Rate limit exceeded", self.provider, "RATE_LIMIT_ERROR")
+            raise AIServiceError("Rate limit exceeded", self.provider, "RATE_LIMIT_ERROR",
+                                 retry_after=parse_retry_after(e.response.headers))
         except openai.BadRequestError as e:
             raise AIServiceError(f"Bad request: {str(e)}", self.provider, "BAD_REQUEST")
+        except openai.APITimeoutError as e:
+            raise AIServiceError("Request timed out", self.provider, "TIMEOUT")
+        except openai.APIConnectionError as e:
+            raise AIServiceError(f"Connection error: {str(e)}", self.provider, "CONNECTION_ERROR")
+        except openai.APIStatusError as e:
+            if e.status_code < 500:
+                raise self._handle_error(e, "OpenAI streaming error")
+            raise AIServiceError("Service unavailable", self.provider, "SERVER_ERROR",
+                                 retry_after=parse_retry_after(e.response.headers))
         except Exception as e:
             raise self._handle_error(e, "OpenAI streaming error")
 
@@ -0,0 +1,219 @@
+"""
+Limits on outbound AI provider calls, enforced before the request is sent
+so that a burst is absorbed here instead of becoming provider 429s.
+
+Each call takes from four token buckets, refilled continuously over a
+minute: requests and tokens per user, and requests and tokens per API key.
+A global cap bounds the calls in flight at once. State lives in the
+settings.AI_RATE_LIMIT['CACHE_ALIAS'] cache, so every worker sharing that
+cache shares the limits.
+
+A call over a limit waits up to 'MAX_WAIT' seconds for capacity, then is
+rejected with RateLimited, carrying the number of seconds to wait. So is a
+call that can't get the bucket lock within LOCK_TIMEOUT: limits are never
+skipped. Only the token correction made once usage is known goes ahead
+without the lock, since the call has already happened.
+"""
+import asyncio
+import hashlib
+import math
+import time
+from typing import Optional
+
+from django.conf import settings
+from django.core.cache import caches
+
+DEFAULTS = {
+    'ENABLED': True,
+    'CACHE_ALIAS': 'default',
+    'USER_REQUESTS_PER_MINUTE': 30,
+    'USER_TOKENS_PER_MINUTE': 50000,
+    'KEY_REQUESTS_PER_MINUTE': 50,
+    'KEY_TOKENS_PER_MINUTE': 100000,
+    'MAX_IN_FLIGHT': 20,
+    'MAX_WAIT': 10,
+}
+
+KEY_PREFIX = 'ai-rate-limit'
+IN_FLIGHT_KEY = f'{KEY_PREFIX}:in-flight'
+# Refreshed on every change, so it only runs out once no call has started or
+# finished for that long; it bounds how long a count leaked by a killed
+# worker lingers after traffic stops
+IN_FLIGHT_TIMEOUT = 300
+# Long enough for a bucket driven below zero by a large call to refill
+STATE_TIMEOUT = 600
+LOCK_TIMEOUT = 2
+POLL_INTERVAL = 0.25
+
+
+class RateLimited(Exception):
+    def __init__(self, message, retry_after):
+        self.retry_after = retry_after
+        super().__init__(message)
+
+
+def get_options():
+    return {**DEFAULTS, **getattr(settings, 'AI_RATE_LIMIT', {})}
+
+
+def _cache():
+    return caches[get_options()['CACHE_ALIAS']]
+
+
+class Bucket:
+    def __init__(self, key, per_minute):
+        self.key = key
+        self.per_minute = per_minute
+
+    def level(self, state, now):
+        if state is None:
+            return self.per_minute
+        level, updated = state
+        return min(self.per_minute, level + (now - updated) * self.per_minute / 60)
+
+    def wait_for(self, level, cost):
+        """Seconds until `cost` can be taken; a cost above capacity only needs a full bucket"""
+        missing = min(cost, self.per_minute) - level
+        return max(missing, 0) * 60 / self.per_minute
+
+
+class Permit:
+    """Capacity taken for one call; settle() corrects the token estimate once usage is known"""
+
+    def __init__(self, limiter, token_buckets, estimated_tokens):
+        self._limiter = limiter
+        self._token_buckets = token_buckets
+        self._estimated_tokens = estimated_tokens
+        self._released = False
+
+    async def settle(self, usage: Optional[dict]):
+        if usage and usage.get('total_tokens') is not None:
+            extra = usage['total_tokens'] - self._estimated_tokens
+            if extra:
+                await self._limiter._charge(self._token_buckets, extra)
+                self._estimated_tokens += extra
+
+    async def release(self):
+        if not self._released:
+            self._released = True
+            cache = _cache()
+            try:
+                in_flight = await cache.adecr(IN_FLIGHT_KEY)
+            except ValueError:
+                # Expired: there is no count left to take this call from
+                return
+            if in_flight < 0:
+                # Counted before the key expired; don't let the new count go below zero
+                in_flight = await cache.aincr(IN_FLIGHT_KEY, -in_flight)
+            await cache.atouch(IN_FLIGHT_KEY, IN_FLIGHT_TIMEOUT)
+
+
+class OutboundRateLimiter:
+    def __init__(self, api_key: str, user_id=None):
+        options = get_options()
+        self.enabled = options['ENABLED']
+        # Cache keys must not reveal the API key
+        key_id = hashlib.sha256((api_key or '').encode()).hexdigest()[:16]
+        self._lock_key = f'{KEY_PREFIX}:lock:{key_id}'
+        self._request_buckets = [Bucket(f'{KEY_PREFIX}:key:{key_id}:requests', options['KEY_REQUESTS_PER_MINUTE'])]
+        self._token_buckets = [Bucket(f'{KEY_PREFIX}:key:{key_id}:tokens', options['KEY_TOKENS_PER_MINUTE'])]
+        if user_id is not None:
+            self._request_buckets.append(Bucket(f'{KEY_PREFIX}:user:{user_id}:requests', options['USER_REQUESTS_PER_MINUTE']))
+            self._token_buckets.append(Bucket(f'{KEY_PREFIX}:user:{user_id}:tokens', options['USER_TOKENS_PER_MINUTE']))
+
+    async def acquire(self, estimated_tokens: int) -> Permit:
+        """Take capacity for one call of about `estimated_tokens`, waiting if needed"""
+        permit = Permit(self, self._token_buckets, estimated_tokens)
+        if not self.enabled:
+            permit._released = True
+            return permit
+
+        deadline = time.monotonic() + get_options()['MAX_WAIT']
+        costs = [(self._request_buckets, 1), (self._token_buckets, estimated_tokens)]
+        while True:
+            wait = await self._take_all(costs)
+            if not wait:
+                break
+            if time.monotonic() + wait > deadline:
+                raise RateLimited('AI request limit reached', retry_after=math.ceil(wait))
+            await asyncio.sleep(wait)
+
+        while not await self._enter():
+            if time.monotonic() + POLL_INTERVAL > deadline:
+                raise RateLimited('Too many AI requests in progress', retry_after=1)
+            await asyncio.sleep(POLL_INTERVAL)
+        return permit
+
+    async def _enter(self):
+        cache = _cache()
+        await cache.aadd(IN_FLIGHT_KEY, 0, timeout=IN_FLIGHT_TIMEOUT)
+        try:
+            in_flight = await cache.aincr(IN_FLIGHT_KEY)
+        except ValueError:
+            # Expired between add and incr
+            return False
+        if in_flight > get_options()['MAX_IN_FLIGHT']:
+            await cache.adecr(IN_FLIGHT_KEY)
+            return False
+        await cache.atouch(IN_FLIGHT_KEY, IN_FLIGHT_TIMEOUT)
+        return True
+
+    async def _take_all(self, costs):
+        """Take every cost, or none of them; returns the seconds to wait when short"""
+        async with self._locked(required=True):
+            cache = _cache()
+            now = time.time()
+            states = await cache.aget_many([bucket.key for buckets, _ in costs for bucket in buckets])
+            wait = max(
+                bucket.wait_for(bucket.level(states.get(bucket.key), now), cost)
+                for buckets, cost in costs for bucket in buckets
+            )
+            if wait:
+                return wait
+            await cache.aset_many({
+                bucket.key: (bucket.level(states.get(bucket.key), now) - cost, now)
+                for buckets, cost in costs for bucket in buckets
+            }, timeout=STATE_TIMEOUT)
+            return 0
+
+    async def _charge(self, buckets, cost):
+        """Take `cost` unconditionally: the usage already happened, so buckets may go below zero"""
+        async with self._locked(required=False):
+            cache = _cache()
+            now = time.time()
+            states = await cache.aget_many([bucket.key for bucket in buckets])
+            await cache.aset_many({
+                bucket.key: (bucket.level(states.get(bucket.key), now) - cost, now) for bucket in buckets
+            }, timeout=STATE_TIMEOUT)
+
+    def _locked(self, required):
+        return _CacheLock(self._lock_key, required)
+
+
+class _CacheLock:
+    """
+    Lock in the cache, so workers update a bucket one at a time. When it
+    can't be had within LOCK_TIMEOUT, a required lock raises RateLimited;
+    otherwise the block runs without it.
+    """
+
+    def __init__(self, key, required):
+        self.key = key
+        self.required = required
+        self.acquired = False
+
+    async def __aenter__(self):
+        cache = _cache()
+        deadline = time.monotonic() + LOCK_TIMEOUT
+        while not await cache.aadd(self.key, 1, timeout=LOCK_TIMEOUT):
+            if time.monotonic() > deadline:
+                if self.required:
+                    raise RateLimited('AI rate limiter busy', retry_after=1)
+                return self
+            await asyncio.sleep(0.01)
+        self.acquired = True
+        return self
+
+    async def __aexit__(self, *exc_info):
+        if self.acquired:
+            await _cache().adelete(self.key)
@@ -0,0 +1,168 @@
+"""
+Retries and circuit breaking around AI provider calls (see BaseAIService).
+
+Transient provider failures (429, 5xx, dropped connections) are retried up
+to 'MAX_RETRIES' times with jittered exponential backoff, or after the
+provider's Retry-After when it sent one. Timeouts are not retried: the
+caller has already waited the full request timeout once.
+
+Each provider has a circuit breaker. 'FAILURE_THRESHOLD' consecutive
+outage errors open it, and calls then fail at once with CIRCUIT_OPEN
+instead of waiting on a provider that is down. After 'RECOVERY_TIMEOUT'
+seconds a single probe call is let through (half-open): its success closes
+the breaker, its failure opens it again. Breaker state lives in the
+settings.AI_RESILIENCE['CACHE_ALIAS'] cache, so all workers sharing that
+cache trip and recover together.
+"""
+import email.utils
+import random
+import time
+from collections import Counter
+from typing import Optional
+
+from django.conf import settings
+from django.core.cache import caches
+
+DEFAULTS = {
+    'CACHE_ALIAS': 'default',
+    'MAX_RETRIES': 2,
+    'BACKOFF_BASE': 0.5,
+    'BACKOFF_MAX': 8,
+    # A longer Retry-After is not waited out; the error goes to the caller
+    'MAX_RETRY_AFTER': 10,
+    'FAILURE_THRESHOLD': 5,
+    'RECOVERY_TIMEOUT': 30,
+}
+
+# Errors worth another attempt
+RETRYABLE_ERROR_CODES = {'RATE_LIMIT_ERROR', 'SERVER_ERROR', 'CONNECTION_ERROR'}
+# Errors that suggest the provider is down, as opposed to a bad request or key
+OUTAGE_ERROR_CODES = {'SERVER_ERROR', 'CONNECTION_ERROR', 'TIMEOUT'}
+# Errors raised before the provider was reached, which say nothing about it
+LOCAL_ERROR_CODES = {'RATE_LIMITED', 'INVALID_MODEL', 'CIRCUIT_OPEN'}
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+KEY_PREFIX = 'ai-circuit'
+STATE_TIMEOUT = 86400
+
+# Per-process counters, reported by breaker_metrics()
+counters = Counter()
+
+
+class CircuitOpen(Exception):
+    def __init__(self, message, retry_after):
+        self.retry_after = retry_after
+        super().__init__(message)
+
+
+def get_options():
+    return {**DEFAULTS, **getattr(settings, 'AI_RESILIENCE', {})}
+
+
+def _cache():
+    return caches[get_options()['CACHE_ALIAS']]
+
+
+def parse_retry_after(headers) -> Optional[int]:
+    """Seconds from a Retry-After header, given as seconds or as an HTTP date"""
+    value = headers.get('retry-after') if headers is not None else None
+    if not value:
+        return None
+    try:
+        return max(int(float(value)), 0)
+    except ValueError:
+        pass
+    try:
+        return max(int(email.utils.parsedate_to_datetime(value).timestamp() - time.time()), 0)
+    except (TypeError, ValueError):
+        return None
+
+
+def retry_delay(error_code: Optional[str], retry_after: Optional[int], attempt: int) -> Optional[float]:
+    """Seconds to wait before retrying after the `attempt`th failure (from 0), or None to give up"""
+    options = get_options()
+    if error_code not in RETRYABLE_ERROR_CODES or attempt >= options['MAX_RETRIES']:
+        return None
+    if retry_after is not None:
+        return retry_after if retry_after <= options['MAX_RETRY_AFTER'] else None
+    # Full jitter keeps clients that failed together from retrying together
+    return random.uniform(0, min(options['BACKOFF_MAX'], options['BACKOFF_BASE'] * 2 ** attempt))
+
+
+class CircuitBreaker:
+    def __init__(self, name: str):
+        self.name = name
+        self.key = f'{KEY_PREFIX}:{name}'
+        self._probe_key = f'{self.key}:probe'
+
+    async def get_state(self) -> dict:
+        state = await _cache().aget(self.key)
+        return state or {'state': CLOSED, 'failures': 0, 'opened_at': None}
+
+    async def before_call(self) -> bool:
+        """
+        Raise CircuitOpen unless the call may go through. Returns whether the
+        call is the recovery probe, to be passed back to record().
+        """
+        state = await self.get_state()
+        if state['state'] == CLOSED:
+            return False
+        recovery_timeout = get_options()['RECOVERY_TIMEOUT']
+        waited = time.time() - state['opened_at']
+        # Only one caller, across workers, gets to probe a recovering provider
+        if waited >= recovery_timeout and await _cache().aadd(self._probe_key, 1, timeout=recovery_timeout):
+            await self._save(HALF_OPEN, state['failures'], state['opened_at'])
+            return True
+        counters[f'{self.name}.rejected'] += 1
+        raise CircuitOpen(
+            f'{self.name} is unavailable, not retrying yet',
+            retry_after=max(int(recovery_timeout - waited), 1),
+        )
+
+    async def record(self, error_code: Optional[str] = None, probe: bool = False):
+        """Outcome of a call let through by before_call(); None for success"""
+        if error_code in OUTAGE_ERROR_CODES:
+            await self._record_failure(probe)
+        elif error_code not in LOCAL_ERROR_CODES:
+            # Any answer from the provider, even an error, means it is up
+            await self._record_success()
+        if probe:
+            await _cache().adelete(self._probe_key)
+
+    async def _record_success(self):
+        state = await self.get_state()
+        if state['state'] != CLOSED or state['failures']:
+            if state['state'] != CLOSED:
+                counters[f'{self.name}.closed'] += 1
+            await self._save(CLOSED, 0, None)
+
+    async def _record_failure(self, probe):
+        state = await self.get_state()
+        failures = state['failures'] + 1
+        if probe or (state['state'] == CLOSED and failures >= get_options()['FAILURE_THRESHOLD']):
+            counters[f'{self.name}.opened'] += 1
+            await self._save(OPEN, failures, time.time())
+        elif state['state'] == CLOSED:
+            await self._save(CLOSED, failures, None)
+
+    async def _save(self, state, failures, opened_at):
+        await _cache().aset(self.key, {'state': state, 'failures': failures, 'opened_at': opened_at},
+                            timeout=STATE_TIMEOUT)
+
+
+async def breaker_metrics(names) -> dict:
+    """Shared breaker state of the named providers, with this process's counters"""
+    breakers = {}
+    for name in names:
+        state = await CircuitBreaker(name).get_state()
+        breakers[name] = {
+            **state,
+            'retries': counters[f'{name}.retries'],
+            'rejected': counters[f'{name}.rejected'],
+            'opened': counters[f'{name}.opened'],
+            'closed': counters[f'{name}.closed'],
+        }
+    return {'breakers': breakers, 'config': get_options()}
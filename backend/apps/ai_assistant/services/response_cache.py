@@ -0,0 +1,162 @@
+"""
+Cache of AI responses keyed on a hash of the request.
+
+Identical requests (same model, system prompt, messages, temperature and
+max_tokens) within settings.AI_RESPONSE_CACHE['TIMEOUT'] are answered from
+the cache instead of the provider. Entries outlive their freshness by
+'STALE_TIMEOUT' so that, with 'SERVE_STALE', an expired answer can stand in
+when the provider is rate limiting or timing out.
+
+Entries live in the CACHES alias named by 'ALIAS'; eviction is up to that
+backend (LocMemCache drops least recently used entries past MAX_ENTRIES,
+Redis should run with maxmemory-policy allkeys-lru).
+"""
+import hashlib
+import json
+import logging
+import time
+from typing import AsyncIterator, Callable, List, Optional
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .base import AIMessage, AIResponse, AIStreamChunk, AIServiceError, BaseAIService
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'ALIAS': 'default',
+    'TIMEOUT': 3600,
+    'STALE_TIMEOUT': 86400,
+    'SERVE_STALE': True,
+}
+
+# Provider failures that a stale entry may paper over
+STALE_ERROR_CODES = {'RATE_LIMIT_ERROR', 'TIMEOUT', 'SERVER_ERROR', 'CIRCUIT_OPEN'}
+
+
+def get_options():
+    return {**DEFAULTS, **getattr(settings, 'AI_RESPONSE_CACHE', {})}
+
+
+def response_cache_key(messages: List[AIMessage], model: str, temperature: float, max_tokens: Optional[int]) -> str:
+    payload = json.dumps({
+        'model': model,
+        'temperature': temperature,
+        'max_tokens': max_tokens,
+        # The system prompt travels as a message with the system role
+        'messages': [[message.role, message.content] for message in messages],
+    }, sort_keys=True)
+    return 'ai-response:' + hashlib.sha256(payload.encode()).hexdigest()
+
+
+class CachedEntry:
+    def __init__(self, response: AIResponse, created_at: float):
+        self.response = response
+        self.created_at = created_at
+
+    @property
+    def is_fresh(self):
+        return time.time() - self.created_at < get_options()['TIMEOUT']
+
+
+async def get_entry(key) -> Optional[CachedEntry]:
+    value = await caches[get_options()['ALIAS']].aget(key)
+    return CachedEntry(*value) if value is not None else None
+
+
+async def set_entry(key, response: AIResponse):
+    options = get_options()
+    await caches[options['ALIAS']].aset(
+        key, (response, time.time()), timeout=options['TIMEOUT'] + options['STALE_TIMEOUT']
+    )
+
+
+def can_serve_stale(entry: Optional[CachedEntry], error: AIServiceError) -> bool:
+    return entry is not None and get_options()['SERVE_STALE'] and error.error_code in STALE_ERROR_CODES
+
+
+async def generate_cached(
+    service: BaseAIService,
+    messages: List[AIMessage],
+    model: str,
+    max_tokens: Optional[int] = None,
+    temperature: float = 0.7,
+    enabled: bool = True,
+    cacheable: Optional[Callable[[AIResponse], bool]] = None,
+) -> AIResponse:
+    """
+    service.generate_response() through the cache. Only non-empty responses
+    accepted by `cacheable` are stored. enabled=False bypasses the cache.
+    """
+    if not enabled:
+        return await service.generate_response(messages, model=model, max_tokens=max_tokens, temperature=temperature)
+
+    key = response_cache_key(messages, model, temperature, max_tokens)
+    entry = await get_entry(key)
+    if entry is not None and entry.is_fresh:
+        return entry.response
+
+    try:
+        response = await service.generate_response(messages, model=model, max_tokens=max_tokens, temperature=temperature)
+    except AIServiceError as e:
+        if can_serve_stale(entry, e):
+            logger.warning(f"Serving stale AI response after provider error ({e.error_code})")
+            return entry.response
+        raise
+
+    if response.content.strip() and (cacheable is None or cacheable(response)):
+        await set_entry(key, response)
+    return response
+
+
+async def stream_cached(
+    service: BaseAIService,
+    messages: List[AIMessage],
+    model: str,
+    max_tokens: Optional[int] = None,
+    temperature: float = 0.7,
+    enabled: bool = True,
+) -> AsyncIterator[AIStreamChunk]:
+    """
+    service.generate_stream() through the cache. A cached response is sent
+    as a single chunk; a streamed one is stored once it has finished.
+    """
+    if not enabled:
+        async for chunk in service.generate_stream(messages, model=model, max_tokens=max_tokens, temperature=temperature):
+            yield chunk
+        return
+
+    key = response_cache_key(messages, model, temperature, max_tokens)
+    entry = await get_entry(key)
+    if entry is not None and entry.is_fresh:
+        async for chunk in _replay(entry.response):
+            yield chunk
+        return
+
+    parts = []
+    try:
+        async for chunk in service.generate_stream(messages, model=model, max_tokens=max_tokens, temperature=temperature):
+            parts.append(chunk.content)
+            if chunk.finish_reason and ''.join(parts).strip():
+                await set_entry(key, AIResponse(
+                    content=''.join(parts),
+                    model=model,
+                    provider=service.provider,
+                    usage=chunk.usage,
+                    finish_reason=chunk.finish_reason,
+                ))
+            yield chunk
+    except AIServiceError as e:
+        # Only before anything was sent; a partial answer can't be swapped out
+        if not parts and can_serve_stale(entry, e):
+            logger.warning(f"Serving stale AI response after provider error ({e.error_code})")
+            async for chunk in _replay(entry.response):
+                yield chunk
+            return
+        raise
+
+
+async def _replay(response: AIResponse) -> AsyncIterator[AIStreamChunk]:
+    yield AIStreamChunk(content=response.content)
+    yield AIStreamChunk(content='', finish_reason=response.finish_reason or 'stop', usage=response.usage)
@@ -0,0 +1,100 @@
+"""
+Per-process cache of each user's UserClaudeSettings, so that the AI hot
+path does no settings query on a warm worker.
+
+Entries expire after settings.AI_SETTINGS_CACHE['TIMEOUT'] seconds, and are
+stored along with the user's settings version: a token in the shared cache
+that is replaced whenever the settings are saved or deleted (see signals).
+A read whose version no longer matches goes back to the database, so a
+change made through one worker is seen by all of them.
+
+Cached instances are shared between requests; treat them as read-only.
+"""
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import UserClaudeSettings
+
+DEFAULTS = {
+    'TIMEOUT': 300,
+    'MAX_ENTRIES': 10000,
+}
+
+_lock = threading.Lock()
+# user id -> (UserClaudeSettings or None, version, expires at)
+_entries = {}
+_missing = object()
+
+
+def get_options():
+    return {**DEFAULTS, **getattr(settings, 'AI_SETTINGS_CACHE', {})}
+
+
+def settings_version_key(user_id):
+    return f'ai-settings:version:{user_id}'
+
+
+def get_user_settings(user_id):
+    """The user's UserClaudeSettings, or None when they have none"""
+    key = settings_version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, uuid.uuid4().hex, None)
+        version = cache.get(key)
+    claude_settings = _lookup(user_id, version)
+    if claude_settings is _missing:
+        claude_settings = UserClaudeSettings.objects.filter(user_id=user_id).first()
+        _store(user_id, claude_settings, version)
+    return claude_settings
+
+
+async def aget_user_settings(user_id):
+    """Async variant of get_user_settings"""
+    key = settings_version_key(user_id)
+    version = await cache.aget(key)
+    if version is None:
+        await cache.aadd(key, uuid.uuid4().hex, None)
+        version = await cache.aget(key)
+    claude_settings = _lookup(user_id, version)
+    if claude_settings is _missing:
+        claude_settings = await UserClaudeSettings.objects.filter(user_id=user_id).afirst()
+        _store(user_id, claude_settings, version)
+    return claude_settings
+
+
+def invalidate_user_settings(user_id):
+    with _lock:
+        _entries.pop(user_id, None)
+    cache.set(settings_version_key(user_id), uuid.uuid4().hex, None)
+
+
+def clear():
+    """Drop every entry of this process"""
+    with _lock:
+        _entries.clear()
+
+
+def _lookup(user_id, version):
+    entry = _entries.get(user_id)
+    # Without a working cache there is no version; never trust an entry then
+    if entry is None or version is None:
+        return _missing
+    claude_settings, entry_version, expires_at = entry
+    if entry_version != version or time.monotonic() >= expires_at:
+        return _missing
+    return claude_settings
+
+
+def _store(user_id, claude_settings, version):
+    if version is None:
+        return
+    options = get_options()
+    with _lock:
+        if user_id not in _entries and len(_entries) >= options['MAX_ENTRIES']:
+            # Oldest first; good enough to bound memory
+            _entries.pop(next(iter(_entries)))
+        _entries[user_id] = (claude_settings, version, time.monotonic() + options['TIMEOUT'])
@@ -0,0 +1,15 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import UserClaudeSettings
+from .settings_cache import invalidate_user_settings
+
+
+@receiver(post_save, sender=UserClaudeSettings)
+@receiver(post_delete, sender=UserClaudeSettings)
+def claude_settings_changed(sender, instance, **kwargs):
+    invalidate_user_settings(instance.user_id)
+    # Again after commit: a worker may have cached the old row under the
+    # version set above while the transaction was still open
+    transaction.on_commit(lambda: invalidate_user_settings(instance.user_id))
@@ -1,3 +1,566 @@
-from django.test import TestCase
+import asyncio
+import json
+import time
+from unittest import mock
 
-# Create your tests here.
\ No newline at end of file
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.test import override_settings
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from . import settings_cache
+from .models import UserClaudeSettings
+from .services import http_client, rate_limit
+from .services.anthropic_service import AnthropicService
+from .services.base import AIMessage, AIProvider, AIResponse, AIServiceError, AIStreamChunk
+from .services.rate_limit import OutboundRateLimiter, RateLimited
+from .services.resilience import CircuitBreaker, parse_retry_after, retry_delay
+
+API_KEY = 'sk-ant-api03-test_key'
+
+
+def read_events(response):
+    """(event, data) pairs of a text/event-stream response"""
+    async def read():
+        return b''.join([chunk async for chunk in response.streaming_content])
+    events = []
+    for block in async_to_sync(read)().decode().strip().split('\n\n'):
+        event, data = block.split('\n')
+        events.append((event[len('event: '):], json.loads(data[len('data: '):])))
+    return events
+
+
+class ClaudeChatViewTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.client.force_authenticate(user=self.user)
+        caches['ai_responses'].clear()
+
+    def test_requires_api_key(self):
+        response = self.client.post('/api/ai/chat/', {'messages': [{'role': 'user', 'content': 'Hi'}]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_malformed_messages(self):
+        UserClaudeSettings.objects.create(user=self.user, api_key=API_KEY)
+        for messages in ([{'role': 'user'}], ['Hi'], {'role': 'user', 'content': 'Hi'}, [{'role': 'user', 'content': 1}]):
+            response = self.client.post('/api/ai/chat/', {'messages': messages}, format='json')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @mock.patch('apps.ai_assistant.views.AnthropicService.generate_response', new_callable=mock.AsyncMock)
+    def test_chat(self, generate_response):
+        UserClaudeSettings.objects.create(user=self.user, api_key=API_KEY)
+        generate_response.return_value = AIResponse(
+            content='Hello!', model='claude-3-5-sonnet-20241022', provider=AIProvider.ANTHROPIC,
+            usage={'prompt_tokens': 3, 'completion_tokens': 2, 'total_tokens': 5}
+        )
+        response = self.client.post('/api/ai/chat/', {'messages': [{'role': 'user', 'content': 'Hi'}]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['content'], 'Hello!')
+        self.assertEqual(response.json()['usage'], {'input_tokens': 3, 'output_tokens': 2})
+
+    @mock.patch('apps.ai_assistant.views.AnthropicService.generate_response', new_callable=mock.AsyncMock)
+    def test_timeout(self, generate_response):
+        UserClaudeSettings.objects.create(user=self.user, api_key=API_KEY)
+        generate_response.side_effect = AIServiceError('Request timed out', AIProvider.ANTHROPIC, 'TIMEOUT')
+        response = self.client.post('/api/ai/chat/', {'messages': [{'role': 'user', 'content': 'Hi'}]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_408_REQUEST_TIMEOUT)
+
+    def test_stream(self):
+        UserClaudeSettings.objects.create(user=self.user, api_key=API_KEY)
+
+        async def generate_stream(service, messages, **kwargs):
+            yield AIStreamChunk(content='Hel')
+            yield AIStreamChunk(content='lo!')
+            yield AIStreamChunk(content='', finish_reason='end_turn',
+                                usage={'prompt_tokens': 3, 'completion_tokens': 2, 'total_tokens': 5})
+
+        with mock.patch('apps.ai_assistant.views.AnthropicService.generate_stream', generate_stream):
+            response = self.client.post('/api/ai/chat/', {
+                'messages': [{'role': 'user', 'content': 'Hi'}], 'stream': True
+            }, format='json')
+            self.assertEqual(response['Content-Type'], 'text/event-stream')
+            self.assertEqual(read_events(response), [
+                ('chunk', {'content': 'Hel'}),
+                ('chunk', {'content': 'lo!'}),
+                ('done', {
+                    'model': 'claude-3-5-sonnet-20241022',
+                    'finish_reason': 'end_turn',
+                    'usage': {'input_tokens': 3, 'output_tokens': 2},
+                }),
+            ])
+
+    def test_stream_error(self):
+        UserClaudeSettings.objects.create(user=self.user, api_key=API_KEY)
+
+        async def generate_stream(service, messages, **kwargs):
+            yield AIStreamChunk(content='Hel')
+            raise AIServiceError('Rate limit exceeded', AIProvider.ANTHROPIC, 'RATE_LIMIT_ERROR')
+
+        with mock.patch('apps.ai_assistant.views.AnthropicService.generate_stream', generate_stream):
+            response = self.client.post('/api/ai/chat/', {'messages': [{'role': 'user', 'content': 'Hi'}]},
+                                        format='json', HTTP_ACCEPT='text/event-stream')
+            self.assertEqual(read_events(response)[-1], (
+                'error', {'error': 'Rate limit exceeded', 'error_code': 'RATE_LIMIT_ERROR'}
+            ))
+
+
+
+@mock.patch('apps.ai_assistant.views.AnthropicService.generate_response', new_callable=mock.AsyncMock)
+class ResponseCacheTest(APITestCase):
+    messages = {'messages': [{'role': 'user', 'content': 'Hi'}]}
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.client.force_authenticate(user=self.user)
+        self.settings = UserClaudeSettings.objects.create(user=self.user, api_key=API_KEY)
+        caches['ai_responses'].clear()
+
+    def chat(self, **extra):
+        return self.client.post('/api/ai/chat/', self.messages, format='json', **extra)
+
+    def respond(self, generate_response, content='Hello!'):
+        generate_response.return_value = AIResponse(
+            content=content, model='claude-3-5-sonnet-20241022', provider=AIProvider.ANTHROPIC
+        )
+
+    def test_identical_request_is_served_from_cache(self, generate_response):
+        self.respond(generate_response)
+        self.chat()
+        response = self.chat()
+        self.assertEqual(response.json()['content'], 'Hello!')
+        self.assertEqual(generate_response.await_count, 1)
+
+    def test_different_temperature_misses(self, generate_response):
+        self.respond(generate_response)
+        self.chat()
+        self.settings.temperature = 0.2
+        self.settings.save()
+        self.chat()
+        self.assertEqual(generate_response.await_count, 2)
+
+    def test_user_opt_out(self, generate_response):
+        self.settings.cache_responses = False
+        self.settings.save()
+        self.respond(generate_response)
+        self.chat()
+        self.chat()
+        self.assertEqual(generate_response.await_count, 2)
+
+    def test_stale_entry_served_when_rate_limited(self, generate_response):
+        self.respond(generate_response)
+        self.chat()
+        generate_response.side_effect = AIServiceError('Rate limit exceeded', AIProvider.ANTHROPIC, 'RATE_LIMIT_ERROR')
+        with override_settings(AI_RESPONSE_CACHE={'ALIAS': 'ai_responses', 'TIMEOUT': 0}), \
+                self.assertLogs('apps.ai_assistant.services.response_cache', 'WARNING'):
+            response = self.chat()
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response.json()['content'], 'Hello!')
+        self.assertEqual(generate_response.await_count, 2)
+
+    def test_stale_entry_not_served_when_disabled(self, generate_response):
+        self.respond(generate_response)
+        self.chat()
+        generate_response.side_effect = AIServiceError('Rate limit exceeded', AIProvider.ANTHROPIC, 'RATE_LIMIT_ERROR')
+        with override_settings(AI_RESPONSE_CACHE={'ALIAS': 'ai_responses', 'TIMEOUT': 0, 'SERVE_STALE': False}):
+            self.assertEqual(self.chat().status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_stream_replays_cached_response(self, generate_response):
+        self.respond(generate_response)
+        self.chat()
+        generate_stream = mock.Mock()
+        with mock.patch('apps.ai_assistant.views.AnthropicService.generate_stream', generate_stream):
+            events = read_events(self.chat(HTTP_ACCEPT='text/event-stream'))
+        generate_stream.assert_not_called()
+        self.assertEqual(events[0], ('chunk', {'content': 'Hello!'}))
+        self.assertEqual(events[-1][0], 'done')
+
+
+def limits(**options):
+    return override_settings(AI_RATE_LIMIT={'CACHE_ALIAS': 'default', **options})
+
+
+class OutboundRateLimitTest(APITestCase):
+    def setUp(self):
+        caches['default'].clear()
+        patcher = mock.patch.object(AnthropicService, '_generate_response', new_callable=mock.AsyncMock)
+        self.generate = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.generate.return_value = AIResponse(content='Hello!', model='claude-3-5-haiku-20241022',
+                                                provider=AIProvider.ANTHROPIC)
+
+    def call(self, user_id=1, max_tokens=10, api_key=API_KEY):
+        service = AnthropicService(api_key=api_key, user_id=user_id)
+        return async_to_sync(service.generate_response)(
+            [AIMessage(role='user', content='Hi')], model='claude-3-5-haiku-20241022', max_tokens=max_tokens
+        )
+
+    @limits(USER_REQUESTS_PER_MINUTE=2, MAX_WAIT=0)
+    def test_requests_over_the_user_limit_are_rejected(self):
+        self.call()
+        self.call()
+        with self.assertRaises(AIServiceError) as raised:
+            self.call()
+        self.assertEqual(raised.exception.error_code, 'RATE_LIMITED')
+        self.assertEqual(raised.exception.retry_after, 30)
+        self.assertEqual(self.generate.await_count, 2)
+        # Other users have buckets of their own
+        self.call(user_id=2)
+
+    @limits(KEY_REQUESTS_PER_MINUTE=1, MAX_WAIT=0)
+    def test_api_key_limit_is_shared_by_users(self):
+        self.call(user_id=1)
+        with self.assertRaises(AIServiceError):
+            self.call(user_id=2)
+        self.call(user_id=2, api_key=API_KEY + 'other')
+
+    @limits(USER_TOKENS_PER_MINUTE=6000, MAX_WAIT=5)
+    def test_calls_wait_for_tokens_to_refill(self):
+        self.call(max_tokens=6000)
+        started = time.monotonic()
+        self.call(max_tokens=50)
+        # 100 tokens refill per second
+        self.assertGreater(time.monotonic() - started, 0.4)
+
+    @limits(MAX_IN_FLIGHT=1, MAX_WAIT=0)
+    def test_in_flight_cap(self):
+        async def scenario():
+            release = asyncio.Event()
+
+            async def slow_call(*args, **kwargs):
+                await release.wait()
+                return self.generate.return_value
+
+            self.generate.side_effect = slow_call
+            service = AnthropicService(api_key=API_KEY, user_id=1)
+            messages = [AIMessage(role='user', content='Hi')]
+            first = asyncio.ensure_future(service.generate_response(messages, model='claude-3-5-haiku-20241022'))
+            await asyncio.sleep(0.05)
+            with self.assertRaises(AIServiceError):
+                await service.generate_response(messages, model='claude-3-5-haiku-20241022')
+            release.set()
+            await first
+            # The slot is free again
+            await service.generate_response(messages, model='claude-3-5-haiku-20241022')
+
+        async_to_sync(scenario)()
+
+    @limits()
+    def test_in_flight_count_survives_expiry(self):
+        limiter = OutboundRateLimiter(API_KEY, user_id=1)
+        before_expiry = async_to_sync(limiter.acquire)(10)
+        caches['default'].delete(rate_limit.IN_FLIGHT_KEY)
+        after_expiry = async_to_sync(limiter.acquire)(10)
+        async_to_sync(after_expiry.release)()
+        async_to_sync(before_expiry.release)()
+        self.assertEqual(caches['default'].get(rate_limit.IN_FLIGHT_KEY), 0)
+
+    @limits(MAX_WAIT=5)
+    @mock.patch.object(rate_limit, 'LOCK_TIMEOUT', 0.05)
+    def test_fails_closed_when_the_bucket_lock_is_held(self):
+        limiter = OutboundRateLimiter(API_KEY, user_id=1)
+        caches['default'].add(limiter._lock_key, 1, timeout=10)
+        with self.assertRaises(RateLimited):
+            async_to_sync(limiter.acquire)(10)
+
+    @limits(USER_REQUESTS_PER_MINUTE=1, MAX_WAIT=0)
+    def test_chat_answers_429_with_retry_after(self):
+        user = User.objects.create_user(username='testuser', password='testpass123')
+        UserClaudeSettings.objects.create(user=user, api_key=API_KEY, cache_responses=False)
+        self.client.force_authenticate(user=user)
+        self.client.post('/api/ai/chat/', {'messages': [{'role': 'user', 'content': 'Hi'}]}, format='json')
+        response = self.client.post('/api/ai/chat/', {'messages': [{'role': 'user', 'content': 'Hi'}]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(response['Retry-After'], '60')
+
+
+class SettingsCacheTest(APITestCase):
+    def setUp(self):
+        caches['default'].clear()
+        settings_cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.settings = UserClaudeSettings.objects.create(user=self.user, api_key=API_KEY)
+
+    def get(self):
+        return async_to_sync(settings_cache.aget_user_settings)(self.user.pk)
+
+    def test_warm_lookup_does_no_query(self):
+        self.get()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.get().api_key, API_KEY)
+            self.assertEqual(settings_cache.get_user_settings(self.user.pk).api_key, API_KEY)
+
+    def test_missing_settings_are_cached_too(self):
+        other = User.objects.create_user(username='other', password='testpass123')
+        self.assertIsNone(settings_cache.get_user_settings(other.pk))
+        with self.assertNumQueries(0):
+            self.assertIsNone(settings_cache.get_user_settings(other.pk))
+
+    def test_save_invalidates(self):
+        self.get()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.settings.model = 'claude-3-5-haiku-20241022'
+            self.settings.save()
+        self.assertEqual(self.get().model, 'claude-3-5-haiku-20241022')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.settings.delete()
+        self.assertIsNone(self.get())
+
+    def test_version_change_from_another_worker_invalidates(self):
+        self.get()
+        UserClaudeSettings.objects.filter(pk=self.settings.pk).update(model='claude-3-opus-20240229')
+        self.assertEqual(self.get().model, 'claude-3-5-sonnet-20241022')
+        # What a save in another worker does to the shared cache
+        caches['default'].set(settings_cache.settings_version_key(self.user.pk), 'elsewhere', None)
+        self.assertEqual(self.get().model, 'claude-3-opus-20240229')
+
+    @override_settings(AI_SETTINGS_CACHE={'TIMEOUT': 0})
+    def test_entries_expire(self):
+        self.get()
+        with self.assertNumQueries(1):
+            self.get()
+
+
+def resilience(**options):
+    return override_settings(AI_RESILIENCE={'CACHE_ALIAS': 'default', 'BACKOFF_BASE': 0, **options})
+
+
+def server_error(retry_after=None):
+    return AIServiceError('Service unavailable', AIProvider.ANTHROPIC, 'SERVER_ERROR', retry_after=retry_after)
+
+
+class ResilienceTest(APITestCase):
+    def setUp(self):
+        caches['default'].clear()
+        patcher = mock.patch.object(AnthropicService, '_generate_response', new_callable=mock.AsyncMock)
+        self.generate = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.response = AIResponse(content='Hello!', model='claude-3-5-haiku-20241022', provider=AIProvider.ANTHROPIC)
+
+    def call(self):
+        service = AnthropicService(api_key=API_KEY, user_id=1)
+        return async_to_sync(service.generate_response)(
+            [AIMessage(role='user', content='Hi')], model='claude-3-5-haiku-20241022', max_tokens=10
+        )
+
+    def breaker_state(self):
+        return async_to_sync(CircuitBreaker('anthropic').get_state)()['state']
+
+    @resilience()
+    def test_transient_errors_are_retried(self):
+        self.generate.side_effect = [server_error(), server_error(), self.response]
+        self.assertEqual(self.call().content, 'Hello!')
+        self.assertEqual(self.generate.await_count, 3)
+
+    @resilience(MAX_RETRIES=1)
+    def test_gives_up_after_max_retries(self):
+        self.generate.side_effect = server_error()
+        with self.assertRaises(AIServiceError) as raised:
+            self.call()
+        self.assertEqual(raised.exception.error_code, 'SERVER_ERROR')
+        self.assertEqual(self.generate.await_count, 2)
+
+    @resilience()
+    def test_client_errors_and_timeouts_are_not_retried(self):
+        for error_code in ('AUTHENTICATION_ERROR', 'TIMEOUT'):
+            self.generate.reset_mock()
+            self.generate.side_effect = AIServiceError('Failed', AIProvider.ANTHROPIC, error_code)
+            with self.assertRaises(AIServiceError):
+                self.call()
+            self.assertEqual(self.generate.await_count, 1)
+
+    @resilience(MAX_RETRY_AFTER=10)
+    def test_retry_delay_honors_retry_after(self):
+        self.assertEqual(retry_delay('RATE_LIMIT_ERROR', 3, attempt=0), 3)
+        # Too long to wait out; the caller gets the error instead
+        self.assertIsNone(retry_delay('RATE_LIMIT_ERROR', 60, attempt=0))
+        self.assertIsNone(retry_delay('BAD_REQUEST', None, attempt=0))
+
+    @resilience(BACKOFF_BASE=1, BACKOFF_MAX=4)
+    def test_backoff_is_jittered_and_capped(self):
+        delays = [retry_delay('SERVER_ERROR', None, attempt=1) for _ in range(50)]
+        self.assertTrue(all(0 <= delay <= 2 for delay in delays))
+        self.assertGreater(len(set(delays)), 1)
+        with override_settings(AI_RESILIENCE={'BACKOFF_BASE': 1, 'BACKOFF_MAX': 4, 'MAX_RETRIES': 10}):
+            self.assertLessEqual(retry_delay('SERVER_ERROR', None, attempt=8), 4)
+
+    def test_parse_retry_after(self):
+        self.assertEqual(parse_retry_after({'retry-after': '12'}), 12)
+        self.assertEqual(parse_retry_after({'retry-after': 'Wed, 21 Oct 2015 07:28:00 GMT'}), 0)
+        self.assertIsNone(parse_retry_after({}))
+
+    @resilience(MAX_RETRIES=0, FAILURE_THRESHOLD=2, RECOVERY_TIMEOUT=30)
+    def test_breaker_opens_and_fails_fast(self):
+        self.generate.side_effect = server_error()
+        for _ in range(2):
+            with self.assertRaises(AIServiceError):
+                self.call()
+        self.assertEqual(self.breaker_state(), 'open')
+
+        with self.assertRaises(AIServiceError) as raised:
+            self.call()
+        self.assertEqual(raised.exception.error_code, 'CIRCUIT_OPEN')
+        self.assertGreater(raised.exception.retry_after, 0)
+        self.assertEqual(self.generate.await_count, 2)
+
+    @resilience(MAX_RETRIES=0, FAILURE_THRESHOLD=1, RECOVERY_TIMEOUT=0)
+    def test_probe_closes_or_reopens_the_breaker(self):
+        self.generate.side_effect = server_error()
+        with self.assertRaises(AIServiceError):
+            self.call()
+        self.assertEqual(self.breaker_state(), 'open')
+
+        # The probe fails: open again
+        with self.assertRaises(AIServiceError) as raised:
+            self.call()
+        self.assertEqual(raised.exception.error_code, 'SERVER_ERROR')
+        self.assertEqual(self.breaker_state(), 'open')
+
+        # The probe succeeds: closed
+        self.generate.side_effect = None
+        self.generate.return_value = self.response
+        self.call()
+        self.assertEqual(self.breaker_state(), 'closed')
+
+    @resilience(MAX_RETRIES=0, FAILURE_THRESHOLD=2)
+    def test_provider_answers_reset_the_failure_count(self):
+        self.generate.side_effect = [server_error(), self.response, server_error(), self.response]
+        for _ in range(2):
+            with self.assertRaises(AIServiceError):
+                self.call()
+            self.call()
+        self.assertEqual(self.breaker_state(), 'closed')
+
+    @resilience()
+    def test_stream_retried_only_before_the_first_chunk(self):
+        attempts = []
+
+        async def generate_stream(service, messages, model, max_tokens, temperature, **kwargs):
+            attempts.append(1)
+            if len(attempts) == 1:
+                raise server_error()
+            yield AIStreamChunk(content='Hel')
+            raise server_error()
+
+        async def consume():
+            service = AnthropicService(api_key=API_KEY, user_id=1)
+            chunks = []
+            with self.assertRaises(AIServiceError):
+                async for chunk in service.generate_stream([AIMessage(role='user', content='Hi')],
+                                                           model='claude-3-5-haiku-20241022'):
+                    chunks.append(chunk.content)
+            return chunks
+
+        with mock.patch.object(AnthropicService, '_generate_stream', generate_stream):
+            self.assertEqual(async_to_sync(consume)(), ['Hel'])
+        self.assertEqual(len(attempts), 2)
+
+    @resilience(MAX_RETRIES=0, FAILURE_THRESHOLD=1)
+    def test_chat_answers_503_while_open(self):
+        user = User.objects.create_user(username='testuser', password='testpass123')
+        UserClaudeSettings.objects.create(user=user, api_key=API_KEY, cache_responses=False)
+        self.client.force_authenticate(user=user)
+        self.generate.side_effect = server_error()
+        self.client.post('/api/ai/chat/', {'messages': [{'role': 'user', 'content': 'Hi'}]}, format='json')
+        response = self.client.post('/api/ai/chat/', {'messages': [{'role': 'user', 'content': 'Hi'}]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(response.json()['error_code'], 'CIRCUIT_OPEN')
+        self.assertIn('Retry-After', response)
+
+    @resilience(MAX_RETRIES=0, FAILURE_THRESHOLD=1)
+    def test_breaker_metrics(self):
+        self.generate.side_effect = server_error()
+        with self.assertRaises(AIServiceError):
+            self.call()
+        self.client.force_authenticate(user=User.objects.create_user(username='user', password='testpass123'))
+        self.assertEqual(self.client.get('/api/ai/circuit-breakers/').status_code, status.HTTP_403_FORBIDDEN)
+
+        self.client.force_authenticate(user=User.objects.create_superuser(username='admin', password='testpass123'))
+        response = self.client.get('/api/ai/circuit-breakers/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        breakers = response.json()['breakers']
+        self.assertEqual(breakers['anthropic']['state'], 'open')
+        self.assertEqual(breakers['openai']['state'], 'closed')
+
+
+class TestClaudeConnectionViewTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.client.force_authenticate(user=self.user)
+
+    @mock.patch('apps.ai_assistant.views.AnthropicService.generate_response', new_callable=mock.AsyncMock)
+    def test_invalid_key(self, generate_response):
+        generate_response.side_effect = AIServiceError('Invalid API key', AIProvider.ANTHROPIC, 'AUTHENTICATION_ERROR')
+        response = self.client.post('/api/ai/test-connection/', {'api_key': API_KEY}, format='json')
+        self.assertEqual(response.json(), {
+            'success': False, 'error': 'Invalid API key', 'error_code': 'AUTHENTICATION_ERROR'
+        })
+
+    def test_malformed_body(self):
+        for data in (['sk-ant-api03-test_key'], {'api_key': 1}, {'api_key': ['sk-ant-api03-test_key']}):
+            response = self.client.post('/api/ai/test-connection/', data, format='json')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_requires_authentication(self):
+        self.client.force_authenticate(user=None)
+        response = self.client.post('/api/ai/test-connection/', {'api_key': API_KEY}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class HTTPClientPoolTest(APITestCase):
+    def setUp(self):
+        http_client._reset_after_fork()
+        self.addCleanup(http_client._reset_after_fork)
+
+    def test_services_share_a_client_per_event_loop(self):
+        async def clients():
+            first = AnthropicService(api_key=API_KEY, timeout=10)
+            second = AnthropicService(api_key=API_KEY, timeout=30)
+            return first._client._client, second._client._client
+
+        first, second = asyncio.run(clients())
+        self.assertIs(first, second)
+        self.assertIsNot(asyncio.run(clients())[0], first)
+
+    def test_numeric_timeout(self):
+        async def timeout():
+            return AnthropicService(api_key=API_KEY, timeout=30)._client.timeout
+
+        timeout = asyncio.run(timeout())
+        self.assertEqual((timeout.read, timeout.connect), (30, http_client.get_options()['CONNECT_TIMEOUT']))
+        # Outside an event loop the SDK opens a client of its own
+        self.assertEqual(AnthropicService(api_key=API_KEY, timeout=30)._client.timeout.read, 30)
+
+    def test_client_is_closed_with_its_loop(self):
+        async def client():
+            return http_client.get_async_client()
+
+        self.assertTrue(asyncio.run(client()).is_closed)
+
+    def test_no_shared_client_outside_event_loop(self):
+        self.assertIsNone(http_client.get_async_client())
+
+    def test_forked_child_starts_without_clients(self):
+        asyncio.run(self._open_client())
+        self.assertEqual(http_client.pool_metrics()['clients'], 1)
+        http_client._reset_after_fork()
+        self.assertEqual(http_client.pool_metrics()['clients'], 0)
+
+    async def _open_client(self):
+        # Hold a reference so the loop's client is still listed afterwards
+        self.loop = asyncio.get_running_loop()
+        return http_client.get_async_client()
+
+    def test_metrics_require_admin(self):
+        user = User.objects.create_user(username='testuser', password='testpass123')
+        self.client.force_authenticate(user=user)
+        self.assertEqual(self.client.get('/api/ai/http-pool/').status_code, status.HTTP_403_FORBIDDEN)
+
+        user.is_staff = True
+        user.save()
+        response = self.client.get('/api/ai/http-pool/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['requests'], 0)
+        self.assertIsNone(response.data['connection_reuse_ratio'])
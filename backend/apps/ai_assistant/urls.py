@@ -2,11 +2,15 @@ from django.urls import path
 from .views import (
     ClaudeSettingsView,
     TestClaudeConnectionView,
-    ClaudeChatView
+    ClaudeChatView,
+    HTTPPoolMetricsView,
+    CircuitBreakerMetricsView
 )
 
 urlpatterns = [
     path('settings/', ClaudeSettingsView.as_view(), name='claude-settings'),
     path('test-connection/', TestClaudeConnectionView.as_view(), name='test-claude-connection'),
     path('chat/', ClaudeChatView.as_view(), name='claude-chat'),
+    path('http-pool/', HTTPPoolMetricsView.as_view(), name='ai-http-pool-metrics'),
+    path('circuit-breakers/', CircuitBreakerMetricsView.as_view(), name='ai-circuit-breakers'),
 ]
\ No newline at end of file
@@ -1,12 +1,27 @@
 from rest_framework import status
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework.views import APIView
+from django.http import JsonResponse
 from django.shortcuts import get_object_or_404
-import requests
-import json
 
+from taskmanager.async_views import AsyncAPIView, event_stream_response, too_many_requests
 from .models import UserClaudeSettings
+from .settings_cache import aget_user_settings
+from .services.anthropic_service import AnthropicService
+from .services.base import AIMessage, AIProvider, AIServiceError
+from .services.http_client import pool_metrics
+from .services.resilience import breaker_metrics
+from .services.response_cache import generate_cached, stream_cached
+
+
+def token_usage(usage):
+    """Provider usage dict in the shape returned to clients"""
+    usage = usage or {}
+    return {
+        "input_tokens": usage.get('prompt_tokens', 0),
+        "output_tokens": usage.get('completion_tokens', 0),
+    }
 
 
 class ClaudeSettingsView(APIView):
@@ -23,6 +38,7 @@ class ClaudeSettingsView(APIView):
             "max_tokens": settings.max_tokens,
             "temperature": settings.temperature,
             "is_active": settings.is_active,
+            "cache_responses": settings.cache_responses,
             "api_key_preview": f"sk-ant-***{settings.api_key[-4:]}" if settings.api_key else "",
         })
 
@@ -52,6 +68,8 @@ class ClaudeSettingsView(APIView):
             settings.max_tokens = int(data['max_tokens'])
         if 'temperature' in data:
             settings.temperature = float(data['temperature'])
+        if 'cache_responses' in data:
+            settings.cache_responses = bool(data['cache_responses'])
 
         try:
             settings.save()
@@ -62,6 +80,7 @@ class ClaudeSettingsView(APIView):
                 "max_tokens": settings.max_tokens,
                 "temperature": settings.temperature,
                 "is_active": settings.is_active,
+                "cache_responses": settings.cache_responses,
             })
         except Exception as e:
             return Response(
@@ -70,163 +89,189 @@ class ClaudeSettingsView(APIView):
             )
 
 
-class TestClaudeConnectionView(APIView):
+class HTTPPoolMetricsView(APIView):
+    """Connection reuse counters of the AI HTTP client pool in this worker process"""
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(pool_metrics())
+
+
+class CircuitBreakerMetricsView(AsyncAPIView):
+    """Circuit breaker state per AI provider, with retry counters of this worker process"""
+    permission_classes = [IsAdminUser]
+
+    async def get(self, request):
+        return JsonResponse(await breaker_metrics([provider.value for provider in AIProvider]))
+
+
+class TestClaudeConnectionView(AsyncAPIView):
     """API view for testing Claude API connection"""
     permission_classes = [IsAuthenticated]
 
-    def post(self, request):
+    async def post(self, request):
         """Test Claude API key connection"""
+        if not isinstance(request.data, dict):
+            return JsonResponse(
+                {"error": "Expected a JSON object"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         api_key = request.data.get('api_key')
+        if api_key is not None and not isinstance(api_key, str):
+            return JsonResponse(
+                {"error": "API key must be a string"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
 
         # If no API key provided, use the stored one
         if not api_key:
-            try:
-                settings = UserClaudeSettings.objects.get(user=request.user)
-                api_key = settings.api_key
-            except UserClaudeSettings.DoesNotExist:
-                return Response(
+            settings = await aget_user_settings(request.user.pk)
+            if settings is None:
+                return JsonResponse(
                     {"error": "No API key found. Please add your Claude API key first."},
                     status=status.HTTP_404_NOT_FOUND
                 )
+            api_key = settings.api_key
 
         if not api_key:
-            return Response(
+            return JsonResponse(
                 {"error": "API key is required"},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
         # Test the Claude API with a simple request
         try:
-            headers = {
-                'Content-Type': 'application/json',
-                'x-api-key': api_key,
-                'anthropic-version': '2023-06-01'
-            }
-
-            payload = {
-                'model': 'claude-3-5-haiku-20241022',
-                'max_tokens': 10,
-                'messages': [
-                    {
-                        'role': 'user',
-                        'content': 'Hello'
-                    }
-                ]
-            }
-
-            response = requests.post(
-                'https://api.anthropic.com/v1/messages',
-                headers=headers,
-                json=payload,
-                timeout=10
+            service = AnthropicService(api_key=api_key, user_id=request.user.pk, timeout=10)
+            await service.generate_response(
+                [AIMessage(role='user', content='Hello')],
+                model='claude-3-5-haiku-20241022',
+                max_tokens=10
             )
+            return JsonResponse({
+                "success": True,
+                "message": "Claude API connection successful!"
+            })
 
-            if response.status_code == 200:
-                return Response({
-                    "success": True,
-                    "message": "Claude API connection successful!"
-                })
+        except AIServiceError as e:
+            if e.error_code == 'TIMEOUT':
+                error = "Connection timeout. Please check your internet connection."
             else:
-                error_data = response.json() if response.content else {}
-                return Response({
-                    "success": False,
-                    "error": error_data.get('error', {}).get('message', 'API key validation failed'),
-                    "status_code": response.status_code
-                })
-
-        except requests.exceptions.Timeout:
-            return Response({
+                error = str(e)
+            return JsonResponse({
                 "success": False,
-                "error": "Connection timeout. Please check your internet connection."
-            })
-        except requests.exceptions.RequestException as e:
-            return Response({
-                "success": False,
-                "error": f"Connection error: {str(e)}"
+                "error": error,
+                "error_code": e.error_code
             })
         except Exception as e:
-            return Response({
+            return JsonResponse({
                 "success": False,
                 "error": f"Unexpected error: {str(e)}"
             })
 
 
-class ClaudeChatView(APIView):
-    """API view for Claude chat completions"""
+class ClaudeChatView(AsyncAPIView):
+    """
+    API view for Claude chat completions
+
+    With {"stream": true} or "Accept: text/event-stream" the reply is sent as
+    Server-Sent Events: "chunk" events as Claude generates text, then a
+    "done" event with the model and token usage, or an "error" event.
+    """
     permission_classes = [IsAuthenticated]
 
-    def post(self, request):
+    async def post(self, request):
         """Generate Claude AI response"""
-        messages = request.data.get('messages', [])
+        messages = request.data.get('messages', []) if isinstance(request.data, dict) else []
 
         if not messages:
-            return Response(
+            return JsonResponse(
                 {"error": "Messages are required"},
                 status=status.HTTP_400_BAD_REQUEST
             )
+        if not isinstance(messages, list) or not all(
+            isinstance(message, dict)
+            and isinstance(message.get('role'), str)
+            and isinstance(message.get('content'), str)
+            for message in messages
+        ):
+            return JsonResponse(
+                {"error": "Each message needs a string role and content"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
 
         # Get user's Claude settings
-        try:
-            settings = UserClaudeSettings.objects.get(user=request.user)
-            if not settings.has_valid_api_key():
-                return Response(
-                    {"error": "Please configure your Claude API key first"},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-        except UserClaudeSettings.DoesNotExist:
-            return Response(
+        settings = await aget_user_settings(request.user.pk)
+        if settings is None or not settings.has_valid_api_key():
+            return JsonResponse(
                 {"error": "Please configure your Claude API key first"},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        # Prepare Claude API request
+        service = AnthropicService(api_key=settings.api_key, user_id=request.user.pk, timeout=30)
+        ai_messages = [AIMessage(role=message['role'], content=message['content']) for message in messages]
+        if self.wants_stream(request):
+            return event_stream_response(self.stream_chat(service, ai_messages, settings))
+
         try:
-            headers = {
-                'Content-Type': 'application/json',
-                'x-api-key': settings.api_key,
-                'anthropic-version': '2023-06-01'
-            }
-
-            payload = {
-                'model': settings.model,
-                'max_tokens': settings.max_tokens,
-                'temperature': settings.temperature,
-                'messages': messages
-            }
-
-            response = requests.post(
-                'https://api.anthropic.com/v1/messages',
-                headers=headers,
-                json=payload,
-                timeout=30
+            response = await generate_cached(
+                service,
+                ai_messages,
+                model=settings.model,
+                max_tokens=settings.max_tokens,
+                temperature=settings.temperature,
+                enabled=settings.cache_responses
             )
+            return JsonResponse({
+                "content": response.content,
+                "model": settings.model,
+                "usage": token_usage(response.usage),
+            })
 
-            if response.status_code == 200:
-                data = response.json()
-                return Response({
-                    "content": data['content'][0]['text'] if data.get('content') else '',
-                    "model": settings.model,
-                    "usage": data.get('usage', {}),
-                })
-            else:
-                error_data = response.json() if response.content else {}
-                return Response({
-                    "error": error_data.get('error', {}).get('message', 'Claude API request failed'),
-                    "status_code": response.status_code
-                }, status=status.HTTP_400_BAD_REQUEST)
-
-        except requests.exceptions.Timeout:
-            return Response(
-                {"error": "Request timeout. Please try again."},
-                status=status.HTTP_408_REQUEST_TIMEOUT
-            )
-        except requests.exceptions.RequestException as e:
-            return Response(
-                {"error": f"Connection error: {str(e)}"},
-                status=status.HTTP_503_SERVICE_UNAVAILABLE
-            )
+        except AIServiceError as e:
+            if e.error_code == 'RATE_LIMITED':
+                return too_many_requests(e.retry_after)
+            if e.error_code == 'TIMEOUT':
+                return JsonResponse(
+                    {"error": "Request timeout. Please try again."},
+                    status=status.HTTP_408_REQUEST_TIMEOUT
+                )
+            if e.error_code in ('CONNECTION_ERROR', 'SERVER_ERROR', 'CIRCUIT_OPEN'):
+                response = JsonResponse(
+                    {"error": str(e), "error_code": e.error_code},
+                    status=status.HTTP_503_SERVICE_UNAVAILABLE
+                )
+                if e.retry_after:
+                    response['Retry-After'] = str(e.retry_after)
+                return response
+            return JsonResponse({
+                "error": str(e),
+                "error_code": e.error_code
+            }, status=status.HTTP_400_BAD_REQUEST)
         except Exception as e:
-            return Response(
+            return JsonResponse(
                 {"error": f"Unexpected error: {str(e)}"},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
-            )
\ No newline at end of file
+            )
+
+    async def stream_chat(self, service, messages, settings):
+        try:
+            async for chunk in stream_cached(
+                service,
+                messages,
+                model=settings.model,
+                max_tokens=settings.max_tokens,
+                temperature=settings.temperature,
+                enabled=settings.cache_responses
+            ):
+                if chunk.content:
+                    yield 'chunk', {"content": chunk.content}
+                if chunk.finish_reason:
+                    yield 'done', {
+                        "model": settings.model,
+                        "finish_reason": chunk.finish_reason,
+                        "usage": token_usage(chunk.usage),
+                    }
+        except AIServiceError as e:
+            yield 'error', {"error": str(e), "error_code": e.error_code}
+        except Exception as e:
+            yield 'error', {"error": f"Unexpected error: {str(e)}"}
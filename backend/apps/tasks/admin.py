@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Task, Tag, AIAssistantInteraction
+from .models import Task, Tag, TaskTombstone, AIAssistantInteraction, AIJob, TaskConversationSummary
 
 
 @admin.register(Task)
@@ -16,8 +16,27 @@ class TagAdmin(admin.ModelAdmin):
     search_fields = ['name']
 
 
+@admin.register(TaskTombstone)
+class TaskTombstoneAdmin(admin.ModelAdmin):
+    list_display = ['task_id', 'user', 'deleted_at']
+    readonly_fields = ['deleted_at']
+
+
 @admin.register(AIAssistantInteraction)
 class AIAssistantInteractionAdmin(admin.ModelAdmin):
     list_display = ['task', 'created_at']
     readonly_fields = ['created_at']
-    list_filter = ['created_at']
\ No newline at end of file
+    list_filter = ['created_at']
+
+
+@admin.register(TaskConversationSummary)
+class TaskConversationSummaryAdmin(admin.ModelAdmin):
+    list_display = ['task', 'interaction_count', 'updated_at']
+    readonly_fields = ['updated_at']
+
+
+@admin.register(AIJob)
+class AIJobAdmin(admin.ModelAdmin):
+    list_display = ['id', 'kind', 'status', 'task', 'user', 'attempts', 'created_at', 'finished_at']
+    list_filter = ['kind', 'status']
+    readonly_fields = ['created_at', 'started_at', 'finished_at']
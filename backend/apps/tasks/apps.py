@@ -3,4 +3,7 @@ from django.apps import AppConfig
 
 class TasksConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'apps.tasks'
\ No newline at end of file
+    name = 'apps.tasks'
+
+    def ready(self):
+        from . import signals  # noqa: F401
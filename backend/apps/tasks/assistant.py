@@ -0,0 +1,68 @@
+"""
+Task changes made from AI responses. Shared by the AI views, which apply
+them during the request, and by the AI job worker.
+"""
+from django.db import transaction
+from django.db.models import prefetch_related_objects
+import logging
+
+from .models import Task, AIAssistantInteraction
+from .serializers import TaskSerializer
+from .signals import tasks_changed
+from .tree import TaskTree
+
+logger = logging.getLogger(__name__)
+
+
+class TaskAlreadyBrokenDown(Exception):
+    """The task gained subtasks while its breakdown was being generated"""
+
+
+def create_subtasks(task, subtasks_data):
+    """Subtasks of `task` created from a parsed breakdown, in one transaction"""
+    with transaction.atomic():
+        # Lock the parent so that two concurrent breakdowns of the same
+        # task cannot both pass the subtasks check
+        task = Task.objects.select_for_update().get(pk=task.pk)
+        if task.subtasks.exists():
+            raise TaskAlreadyBrokenDown
+        created_subtasks = []
+        for subtask_data in subtasks_data:
+            subtask = Task(
+                title=subtask_data['title'],
+                description=subtask_data['description'],
+                priority=subtask_data['priority'],
+                status='todo',
+                user_id=task.user_id,
+                parent_task=task
+            )
+            subtask.sync_ancestry()
+            created_subtasks.append(subtask)
+        Task.objects.bulk_create(created_subtasks)
+    # bulk_create() bypasses the post_save signal
+    tasks_changed(task.user_id)
+    logger.info(f"Task breakdown completed for task {task.id}: created {len(created_subtasks)} subtasks")
+    return created_subtasks
+
+
+def serialize_subtasks(subtasks, request=None):
+    """Representation of freshly created subtasks, rendered without a query per task"""
+    prefetch_related_objects(subtasks, 'tags')
+    return TaskSerializer(subtasks, many=True, context={
+        'request': request,
+        'task_tree': TaskTree(subtasks),
+    }).data
+
+
+async def asave_suggestion(task, user_message, ai_response):
+    """
+    Append the exchange to the task's conversation log: a single INSERT,
+    the task row itself is left alone
+    """
+    interaction = await AIAssistantInteraction.objects.acreate(
+        task=task,
+        user_message=user_message,
+        ai_response=ai_response
+    )
+    logger.info(f"AI suggestion generated for task {task.id} by user {task.user_id}")
+    return interaction
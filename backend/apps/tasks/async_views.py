@@ -0,0 +1,236 @@
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+from django.urls import reverse
+import logging
+
+from apps.ai_assistant.services.base import AIServiceError
+from taskmanager.async_views import AsyncAPIView, event_stream_response, service_unavailable, too_many_requests
+from taskmanager.single_flight import flight_key, single_flight
+from .assistant import TaskAlreadyBrokenDown, asave_suggestion, create_subtasks, serialize_subtasks
+from .conversation import aconversation_context
+from .jobs import enqueue_compaction_if_due, enqueue_job
+from .models import AIJob, Task
+from .services import RETRYABLE_ERRORS, aget_claude_service, suggestion_error_message
+
+logger = logging.getLogger(__name__)
+
+
+async def aget_user_task(request, pk):
+    try:
+        return await Task.objects.aget(pk=pk, user=request.user)
+    except Task.DoesNotExist:
+        return None
+
+
+def task_not_found():
+    return JsonResponse({'detail': 'No Task matches the given query.'}, status=404)
+
+
+ALREADY_BROKEN_DOWN = {'error': 'Task already has subtasks. Delete existing subtasks first to regenerate.'}
+NESTED_TOO_DEEPLY = {'error': 'Task is nested too deeply to have subtasks.'}
+
+
+def is_retryable(error):
+    return isinstance(error, AIServiceError) and error.error_code in RETRYABLE_ERRORS
+
+
+def retry_later_response(error):
+    """429 when our own rate limit refused the call, 503 when the provider failed it"""
+    if error.error_code == 'RATE_LIMITED':
+        return too_many_requests(error.retry_after)
+    return service_unavailable(error.retry_after)
+
+
+def suggestion_failed(error):
+    """Response for a suggestion that failed, with the text suggestion_error_message() gives"""
+    if is_retryable(error):
+        return retry_later_response(error)
+    if not isinstance(error, AIServiceError):
+        status = 500
+    elif error.error_code in ('MISSING_API_KEY', 'AUTHENTICATION_ERROR', 'INVALID_MODEL'):
+        # Fixed in the user's AI settings
+        status = 400
+    else:
+        status = 502
+    return JsonResponse({'error': suggestion_error_message(error)}, status=status)
+
+
+def wants_background(request):
+    return isinstance(request.data, dict) and bool(request.data.get('background'))
+
+
+async def job_accepted(request, task, kind, payload=None):
+    """Queue the request as an AIJob and answer 202 with where to poll it"""
+    job = await sync_to_async(enqueue_job)(task, kind, payload)
+    return JsonResponse({
+        'job_id': job.pk,
+        'status': job.status,
+        'status_url': request.build_absolute_uri(reverse('ai-job-detail', args=[job.pk])),
+    }, status=202)
+
+
+class TaskAISuggestView(AsyncAPIView):
+    """
+    POST /api/tasks/{id}/ai_suggest/
+
+    With {"stream": true} or "Accept: text/event-stream" the suggestion is
+    sent as Server-Sent Events: "chunk" events with the text as Claude
+    generates it, then a "done" event once the interaction is saved.
+    Only real model output is saved: failures are answered with an error
+    status (429 or 503 when worth retrying), or end the stream with an
+    "error" event.
+    With {"background": true} it is queued as an AIJob instead.
+
+    Identical requests for the same task arriving together (double clicks,
+    client retries) share one AI call and one saved interaction.
+    """
+
+    async def post(self, request, pk):
+        """
+        Get AI suggestions for a task using Claude API
+        """
+        task = await aget_user_task(request, pk)
+        if task is None:
+            return task_not_found()
+        user_message = request.data.get('message', '') if isinstance(request.data, dict) else ''
+
+        if not isinstance(user_message, str):
+            return JsonResponse({'error': 'Message must be a string'}, status=400)
+        if not user_message.strip():
+            return JsonResponse({'error': 'Message is required'}, status=400)
+
+        if wants_background(request):
+            return await job_accepted(request, task, AIJob.SUGGEST, {'message': user_message})
+        if self.wants_stream(request):
+            return event_stream_response(self.stream_suggestion(request, task, user_message))
+
+        try:
+            data = await single_flight(
+                flight_key(task.pk, 'suggest', task.title, task.description, user_message),
+                lambda: self.suggest(request, task, user_message),
+            )
+            return JsonResponse(data)
+
+        except Exception as e:
+            return suggestion_failed(e)
+
+    async def suggest(self, request, task, user_message):
+        # Get user-specific Claude service
+        claude_service = await aget_claude_service(request.user)
+
+        # Get AI suggestion from Claude
+        ai_response = await claude_service.get_task_suggestion(
+            task_title=task.title,
+            task_description=task.description or "",
+            user_message=user_message,
+            context=await aconversation_context(task),
+        )
+
+        interaction = await asave_suggestion(task, user_message, ai_response)
+        await sync_to_async(enqueue_compaction_if_due)(task)
+
+        return {
+            'ai_response': ai_response,
+            'interaction_id': interaction.id
+        }
+
+    async def stream_suggestion(self, request, task, user_message):
+        # Nothing is saved if the client disconnects before the end
+        try:
+            claude_service = await aget_claude_service(request.user)
+            parts = []
+            async for text in claude_service.stream_task_suggestion(
+                task_title=task.title,
+                task_description=task.description or "",
+                user_message=user_message,
+                context=await aconversation_context(task),
+            ):
+                parts.append(text)
+                yield 'chunk', {'content': text}
+
+            ai_response = ''.join(parts).strip()
+            interaction = await asave_suggestion(task, user_message, ai_response)
+            await sync_to_async(enqueue_compaction_if_due)(task)
+            yield 'done', {'ai_response': ai_response, 'interaction_id': interaction.id}
+
+        except Exception as e:
+            yield 'error', {'error': suggestion_error_message(e), 'retry_after': getattr(e, 'retry_after', None)}
+
+
+class TaskBreakdownView(AsyncAPIView):
+    """
+    POST /api/tasks/{id}/breakdown/
+
+    With {"background": true} the breakdown is queued as an AIJob and the
+    response is 202 with the job id; poll /api/ai-jobs/{id}/ for the result.
+
+    Concurrent breakdowns of the same task share one AI call, and all get
+    the subtasks it created.
+    """
+
+    async def post(self, request, pk):
+        """
+        Break down a complex task into subtasks using AI
+        """
+        task = await aget_user_task(request, pk)
+        if task is None:
+            return task_not_found()
+
+        if wants_background(request):
+            if await task.subtasks.aexists():
+                return JsonResponse(ALREADY_BROKEN_DOWN, status=400)
+            if not task.can_have_subtasks():
+                return JsonResponse(NESTED_TOO_DEEPLY, status=400)
+            return await job_accepted(request, task, AIJob.BREAKDOWN)
+
+        try:
+            # Keyed on the task alone: a second breakdown could only conflict
+            data, status = await single_flight(
+                flight_key(task.pk, 'breakdown'),
+                lambda: self.breakdown(request, task),
+                reuse=lambda result: self.is_current(task, result),
+            )
+            return JsonResponse(data, status=status)
+
+        except Exception as e:
+            if is_retryable(e):
+                return retry_later_response(e)
+            logger.error(f"Error during task breakdown: {str(e)}")
+            return JsonResponse({'error': 'Failed to break down task. Please try again.'}, status=500)
+
+    async def is_current(self, task, result):
+        """Whether the task's subtasks are still those an earlier breakdown created"""
+        data, _ = result
+        created = {subtask['id'] for subtask in data.get('subtasks', [])}
+        return created == {pk async for pk in task.subtasks.values_list('pk', flat=True)}
+
+    async def breakdown(self, request, task):
+        """Response body and status of one breakdown attempt"""
+        # Check if task already has subtasks
+        if await task.subtasks.aexists():
+            return ALREADY_BROKEN_DOWN, 400
+        if not task.can_have_subtasks():
+            return NESTED_TOO_DEEPLY, 400
+
+        # Get user-specific Claude service
+        claude_service = await aget_claude_service(request.user)
+
+        # Get AI breakdown from Claude
+        subtasks_data = await claude_service.breakdown_task(
+            task_title=task.title,
+            task_description=task.description or ""
+        )
+
+        if not subtasks_data:
+            return {'error': 'Failed to generate subtasks. The task might be too simple or AI service is unavailable.'}, 400
+
+        try:
+            subtasks = await sync_to_async(create_subtasks)(task, subtasks_data)
+        except TaskAlreadyBrokenDown:
+            return {'error': 'Task was broken down by another request in the meantime.'}, 409
+
+        # Serialize and return the created subtasks
+        return {
+            'message': f'Successfully created {len(subtasks)} subtasks',
+            'subtasks': await sync_to_async(serialize_subtasks)(subtasks, request),
+        }, 200
@@ -0,0 +1,129 @@
+"""
+Conversation history fed back to the model with each AI call on a task,
+kept a constant size however long the conversation gets.
+
+The model sees a rolling summary of the older interactions
+(TaskConversationSummary), then the newest ones verbatim, up to
+settings.AI_CONVERSATION['CONTEXT_MAX_TOKENS']. Once the interactions not
+summarized yet, leaving out the last 'KEEP_TURNS', reach
+'COMPACT_THRESHOLD' tokens, a background AIJob folds them into the summary
+(see jobs.enqueue_compaction_if_due).
+
+Token counts are estimated from the text length: they only need to bound
+prompt sizes, not to match the provider's tokenizer.
+"""
+from dataclasses import dataclass, field
+from typing import List, Tuple
+
+from django.conf import settings
+from django.db.models import Q, Sum
+from django.db.models.functions import Length
+
+from .models import AIAssistantInteraction, TaskConversationSummary
+
+DEFAULTS = {
+    'KEEP_TURNS': 6,
+    'COMPACT_THRESHOLD': 2000,
+    'SUMMARY_MAX_TOKENS': 500,
+    'CONTEXT_MAX_TOKENS': 4000,
+}
+
+CHARS_PER_TOKEN = 4
+# Rows read for the verbatim part of a context, however short they are
+MAX_CONTEXT_TURNS = 50
+NEWEST_FIRST = ('-created_at', '-id')
+OLDEST_FIRST = ('created_at', 'id')
+
+
+class SummaryFailed(Exception):
+    """The model returned no summary"""
+
+
+@dataclass
+class ConversationContext:
+    summary: str = ''
+    # (user message, AI response) pairs, oldest first
+    turns: List[Tuple[str, str]] = field(default_factory=list)
+
+
+def get_options():
+    return {**DEFAULTS, **getattr(settings, 'AI_CONVERSATION', {})}
+
+
+def estimate_tokens(text: str) -> int:
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+def unsummarized(task_id, summary=None):
+    """The task's interactions not folded into `summary` yet"""
+    interactions = AIAssistantInteraction.objects.filter(task_id=task_id)
+    if summary is None:
+        return interactions
+    return interactions.filter(
+        Q(created_at__gt=summary.through_created_at)
+        | Q(created_at=summary.through_created_at, id__gt=summary.through_id)
+    )
+
+
+async def aconversation_context(task) -> ConversationContext:
+    """Summary and newest turns of the task's conversation, within 'CONTEXT_MAX_TOKENS'"""
+    summary = await TaskConversationSummary.objects.filter(task_id=task.pk).afirst()
+    budget = get_options()['CONTEXT_MAX_TOKENS']
+    turns = []
+    async for interaction in unsummarized(task.pk, summary).order_by(*NEWEST_FIRST)[:MAX_CONTEXT_TURNS]:
+        budget -= estimate_tokens(interaction.user_message) + estimate_tokens(interaction.ai_response)
+        if budget < 0:
+            break
+        turns.append((interaction.user_message, interaction.ai_response))
+    turns.reverse()
+    return ConversationContext(summary.summary if summary else '', turns)
+
+
+def compaction_due(task_id) -> bool:
+    """Whether the interactions to fold have reached 'COMPACT_THRESHOLD' tokens"""
+    options = get_options()
+    summary = TaskConversationSummary.objects.filter(task_id=task_id).first()
+    older = unsummarized(task_id, summary).order_by(*NEWEST_FIRST)[options['KEEP_TURNS']:]
+    chars = older.aggregate(chars=Sum(Length('user_message') + Length('ai_response')))['chars'] or 0
+    return chars // CHARS_PER_TOKEN >= options['COMPACT_THRESHOLD']
+
+
+async def acompact_conversation(task, summarize) -> int:
+    """
+    Fold the task's interactions older than the last 'KEEP_TURNS' into its
+    summary, oldest first, in batches of about 'COMPACT_THRESHOLD' tokens so
+    that no summarization prompt grows with the backlog. The summary is saved
+    after each batch.
+
+    `await summarize(summary, turns)` returns the new summary given the
+    current one and (user message, AI response) pairs. Raises SummaryFailed
+    when it returns nothing. Returns the number of interactions folded.
+    """
+    options = get_options()
+    summary = await TaskConversationSummary.objects.filter(task_id=task.pk).afirst()
+    interactions = unsummarized(task.pk, summary).order_by(*OLDEST_FIRST)
+    foldable = await interactions.acount() - options['KEEP_TURNS']
+    if foldable <= 0:
+        return 0
+
+    # A single huge message is cut short rather than overflow the prompt
+    max_chars = options['COMPACT_THRESHOLD'] * CHARS_PER_TOKEN
+    batch, batch_tokens, folded = [], 0, 0
+    async for interaction in interactions[:foldable]:
+        batch.append(interaction)
+        batch_tokens += estimate_tokens(interaction.user_message) + estimate_tokens(interaction.ai_response)
+        if batch_tokens >= options['COMPACT_THRESHOLD'] or len(batch) + folded == foldable:
+            turns = [(i.user_message[:max_chars], i.ai_response[:max_chars]) for i in batch]
+            text = await summarize(summary.summary if summary else '', turns)
+            if not text:
+                raise SummaryFailed
+            if summary is None:
+                summary = TaskConversationSummary(task_id=task.pk)
+            summary.summary = text
+            summary.through_created_at = batch[-1].created_at
+            summary.through_id = batch[-1].pk
+            summary.interaction_count += len(batch)
+            await summary.asave()
+            folded += len(batch)
+            batch, batch_tokens = [], 0
+    return folded
@@ -0,0 +1,81 @@
+import json
+import time
+
+from asgiref.sync import async_to_sync
+from django.db import transaction
+
+from taskmanager import pubsub
+
+# Tags are shared, so their changes go to every stream
+TAGS_CHANNEL = 'events:tags'
+
+
+def user_channel(user_id):
+    return f'events:tasks:{user_id}'
+
+
+def publish_event(channel, event, **data):
+    """Publish once the current transaction commits, so streams never see rolled back writes"""
+    message = {'event': event, **data}
+    transaction.on_commit(lambda: pubsub.publish(channel, message))
+
+
+def format_event(message):
+    """Server-Sent Events wire format of a published message"""
+    return f"event: {message['event']}\ndata: {json.dumps(message)}\n\n"
+
+
+class EventStream:
+    """
+    Server-Sent Events for a subscription. Sends a keep-alive comment when
+    nothing happened for `heartbeat` seconds and ends after `lifetime`
+    seconds; browsers reconnect on their own. close() unsubscribes.
+    """
+
+    def __init__(self, subscription, heartbeat, lifetime):
+        self.subscription = subscription
+        self.heartbeat = heartbeat
+        self.lifetime = lifetime
+
+    def __iter__(self):
+        # Reconnect delay for the client, in milliseconds
+        yield 'retry: 3000\n\n'
+        deadline = time.monotonic() + self.lifetime
+        while (remaining := deadline - time.monotonic()) > 0:
+            message = self.subscription.get(timeout=min(self.heartbeat, remaining))
+            yield format_event(message) if message is not None else ': keep-alive\n\n'
+
+    def close(self):
+        self.subscription.close()
+
+
+class AsyncEventStream(EventStream):
+    """
+    EventStream for ASGI servers, over a subscription from the broker's
+    asubscribe(): waiting for a message holds no thread
+    """
+    # Django streams anything iterable synchronously, buffering it under ASGI
+    __iter__ = None
+
+    def __init__(self, subscription, heartbeat, lifetime):
+        super().__init__(subscription, heartbeat, lifetime)
+        self.closed = False
+
+    async def __aiter__(self):
+        try:
+            yield 'retry: 3000\n\n'
+            deadline = time.monotonic() + self.lifetime
+            while (remaining := deadline - time.monotonic()) > 0:
+                message = await self.subscription.get(timeout=min(self.heartbeat, remaining))
+                yield format_event(message) if message is not None else ': keep-alive\n\n'
+        finally:
+            await self.aclose()
+
+    async def aclose(self):
+        if not self.closed:
+            self.closed = True
+            await self.subscription.aclose()
+
+    def close(self):
+        # Django calls this from a thread; covers streams that never started
+        async_to_sync(self.aclose)()
@@ -0,0 +1,117 @@
+from datetime import datetime, time
+
+from django.db import connections
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend
+
+from .models import Task
+
+SEARCH_FIELDS = ('title', 'description', 'notes')
+SEARCH_CONFIG = 'english'
+
+
+def search_tasks(queryset, terms):
+    """
+    Full-text search over title, description and notes.
+
+    On PostgreSQL this matches the GIN tsvector index created by migration
+    0007; other databases (SQLite in development and tests) fall back to
+    case-insensitive substring matching of every term.
+    """
+    if connections[queryset.db].vendor == 'postgresql':
+        from django.contrib.postgres.search import SearchQuery, SearchVector
+
+        return queryset.alias(
+            search=SearchVector(*SEARCH_FIELDS, config=SEARCH_CONFIG)
+        ).filter(search=SearchQuery(terms, config=SEARCH_CONFIG, search_type='websearch'))
+
+    for term in terms.split():
+        match = Q()
+        for field in SEARCH_FIELDS:
+            match |= Q(**{f'{field}__icontains': term})
+        queryset = queryset.filter(match)
+    return queryset
+
+
+class TaskFilterBackend(BaseFilterBackend):
+    """
+    Filters tasks from query parameters:
+
+    ?status=, ?priority=, ?velocity=  one or more comma-separated choices
+    ?tag=                             one or more comma-separated tag ids
+    ?due_after=, ?due_before=         ISO date or datetime bounds (inclusive)
+    ?parent=                          parent task id, or "none" for root tasks
+    ?search=                          full-text search
+    """
+    choice_filters = {
+        'status': Task.STATUS_CHOICES,
+        'priority': Task.PRIORITY_CHOICES,
+        'velocity': Task.VELOCITY_CHOICES,
+    }
+
+    def filter_queryset(self, request, queryset, view):
+        params = request.query_params
+
+        for field, choices in self.choice_filters.items():
+            values = self._split(params.get(field))
+            if values:
+                allowed = {choice for choice, _ in choices}
+                invalid = [value for value in values if value not in allowed]
+                if invalid:
+                    raise ValidationError({field: f"Invalid choice(s): {', '.join(invalid)}"})
+                queryset = queryset.filter(**{f'{field}__in': values})
+
+        tag_ids = self._ids('tag', params.get('tag'))
+        if tag_ids:
+            # EXISTS rather than a join so tasks with several tags aren't duplicated
+            tagged = Task.tags.through.objects.filter(task_id=OuterRef('pk'), tag_id__in=tag_ids)
+            queryset = queryset.filter(Exists(tagged))
+
+        due_after = self._datetime('due_after', params.get('due_after'))
+        if due_after is not None:
+            queryset = queryset.filter(due_date__gte=due_after)
+        due_before = self._datetime('due_before', params.get('due_before'), end_of_day=True)
+        if due_before is not None:
+            queryset = queryset.filter(due_date__lte=due_before)
+
+        parent = params.get('parent')
+        if parent:
+            if parent.lower() in ('none', 'null'):
+                queryset = queryset.filter(parent_task__isnull=True)
+            else:
+                queryset = queryset.filter(parent_task_id__in=self._ids('parent', parent))
+
+        terms = params.get('search', '').strip()
+        if terms:
+            queryset = search_tasks(queryset, terms)
+
+        return queryset
+
+    def _split(self, value):
+        return [part.strip() for part in (value or '').split(',') if part.strip()]
+
+    def _ids(self, field, value):
+        try:
+            return [int(part) for part in self._split(value)]
+        except ValueError:
+            raise ValidationError({field: 'Expected one or more comma-separated ids.'})
+
+    def _datetime(self, field, value, end_of_day=False):
+        if not value:
+            return None
+        try:
+            parsed = parse_datetime(value)
+            if parsed is None:
+                day = parse_date(value)
+                if day is not None:
+                    parsed = datetime.combine(day, time.max if end_of_day else time.min)
+        except ValueError:
+            parsed = None
+        if parsed is None:
+            raise ValidationError({field: 'Expected an ISO 8601 date or datetime.'})
+        if timezone.is_naive(parsed):
+            parsed = timezone.make_aware(parsed)
+        return parsed
@@ -0,0 +1,207 @@
+"""
+Database-backed queue of AI jobs (see AIJob), drained by the run_ai_worker
+command, so it needs no service besides the database. Enqueueing also
+publishes on JOBS_CHANNEL: when PUBSUB_BROKER reaches the workers (Redis),
+idle workers pick a job up at once instead of at their next poll.
+
+Besides the jobs clients ask for, saving a suggestion queues a compaction
+job once the task's conversation has grown enough (see conversation.py).
+"""
+from datetime import timedelta
+from functools import partial
+import logging
+
+from asgiref.sync import async_to_sync, sync_to_async
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from apps.ai_assistant.services.base import AIServiceError
+from taskmanager import pubsub
+from .assistant import TaskAlreadyBrokenDown, asave_suggestion, create_subtasks, serialize_subtasks
+from .conversation import (
+    SummaryFailed, acompact_conversation, aconversation_context, compaction_due,
+    get_options as get_conversation_options,
+)
+from .events import publish_event, user_channel
+from .models import AIJob, Task
+from .services import aget_claude_service, suggestion_error_message
+
+logger = logging.getLogger(__name__)
+
+JOBS_CHANNEL = 'ai-jobs'
+
+DEFAULTS = {
+    'PROCESSES': 2,
+    # Seconds an idle worker waits for a wake-up before looking again
+    'POLL_INTERVAL': 2,
+    # A job running longer than this is assumed lost with its worker
+    'TIMEOUT': 300,
+    'MAX_ATTEMPTS': 2,
+}
+
+
+class JobFailed(Exception):
+    """Expected failure, reported to the client as the job's error"""
+
+
+def get_options():
+    return {**DEFAULTS, **getattr(settings, 'AI_JOBS', {})}
+
+
+def enqueue_job(task, kind, payload=None):
+    """New queued job, or the identical one already queued or running for the task"""
+    payload = payload or {}
+    with transaction.atomic():
+        # Serializes enqueueing per task, so duplicates can't both miss each other
+        Task.objects.select_for_update().filter(pk=task.pk).exists()
+        active = AIJob.objects.filter(task=task, kind=kind, status__in=[AIJob.QUEUED, AIJob.RUNNING])
+        for job in active:
+            if job.payload == payload:
+                return job
+        job = AIJob.objects.create(user_id=task.user_id, task=task, kind=kind, payload=payload)
+        transaction.on_commit(lambda: pubsub.publish(JOBS_CHANNEL, {'job': job.pk}))
+    return job
+
+
+def enqueue_compaction_if_due(task):
+    """Queue compaction of the task's conversation once it has grown past the threshold"""
+    if compaction_due(task.pk):
+        enqueue_job(task, AIJob.COMPACT)
+
+
+def claim_job():
+    """Oldest queued job, marked running, or None when the queue is empty"""
+    candidates = AIJob.objects.filter(status=AIJob.QUEUED).order_by('created_at', 'id')
+    for job_id in candidates.values_list('pk', flat=True)[:10]:
+        # Another worker may claim the same job first; only one update wins
+        claimed = AIJob.objects.filter(pk=job_id, status=AIJob.QUEUED).update(
+            status=AIJob.RUNNING, started_at=timezone.now(), attempts=F('attempts') + 1,
+        )
+        if claimed:
+            return AIJob.objects.select_related('task', 'user').get(pk=job_id)
+    return None
+
+
+def requeue_stale_jobs():
+    """Put back jobs whose worker died mid-run, or fail them after MAX_ATTEMPTS"""
+    options = get_options()
+    now = timezone.now()
+    stale = AIJob.objects.filter(status=AIJob.RUNNING, started_at__lt=now - timedelta(seconds=options['TIMEOUT']))
+    failed = stale.filter(attempts__gte=options['MAX_ATTEMPTS']).update(
+        status=AIJob.FAILED, error='The job did not finish in time.', finished_at=now,
+    )
+    requeued = stale.update(status=AIJob.QUEUED)
+    if failed or requeued:
+        logger.warning(f"Stale AI jobs: {requeued} requeued, {failed} failed")
+
+
+def run_job(job):
+    try:
+        result = async_to_sync(RUNNERS[job.kind])(job)
+    except JobFailed as e:
+        finish_job(job, AIJob.FAILED, error=str(e))
+    except Exception as e:
+        if isinstance(e, AIServiceError) and e.error_code == 'RATE_LIMITED':
+            error = 'Too many AI requests. Please try again shortly.'
+        elif isinstance(e, AIServiceError):
+            error = suggestion_error_message(e)
+        else:
+            logger.exception(f"AI job {job.pk} failed")
+            error = 'The AI request failed. Please try again.'
+        finish_job(job, AIJob.FAILED, error=error)
+    else:
+        finish_job(job, AIJob.SUCCEEDED, result=result)
+
+
+def finish_job(job, status, result=None, error=''):
+    job.status = status
+    job.result = result
+    job.error = error
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'result', 'error', 'finished_at'])
+    publish_event(user_channel(job.user_id), 'ai_job.finished', id=job.pk, task_id=job.task_id)
+
+
+async def run_breakdown(job):
+    task = job.task
+    if await task.subtasks.aexists():
+        raise JobFailed('Task already has subtasks. Delete existing subtasks first to regenerate.')
+    if not task.can_have_subtasks():
+        raise JobFailed('Task is nested too deeply to have subtasks.')
+
+    claude_service = await aget_claude_service(job.user)
+    subtasks_data = await claude_service.breakdown_task(
+        task_title=task.title,
+        task_description=task.description or ""
+    )
+    if not subtasks_data:
+        raise JobFailed('Failed to generate subtasks. The task might be too simple or AI service is unavailable.')
+
+    try:
+        subtasks = await sync_to_async(create_subtasks)(task, subtasks_data)
+    except TaskAlreadyBrokenDown:
+        raise JobFailed('Task was broken down by another request in the meantime.')
+    return {
+        'message': f'Successfully created {len(subtasks)} subtasks',
+        'subtasks': await sync_to_async(serialize_subtasks)(subtasks),
+    }
+
+
+async def run_suggestion(job):
+    user_message = job.payload['message']
+    claude_service = await aget_claude_service(job.user)
+    ai_response = await claude_service.get_task_suggestion(
+        task_title=job.task.title,
+        task_description=job.task.description or "",
+        user_message=user_message,
+        context=await aconversation_context(job.task),
+    )
+    interaction = await asave_suggestion(job.task, user_message, ai_response)
+    await sync_to_async(enqueue_compaction_if_due)(job.task)
+    return {'ai_response': ai_response, 'interaction_id': interaction.pk}
+
+
+async def run_compaction(job):
+    claude_service = await aget_claude_service(job.user)
+    summarize = partial(
+        claude_service.summarize_conversation,
+        job.task.title,
+        max_tokens=get_conversation_options()['SUMMARY_MAX_TOKENS'],
+    )
+    try:
+        folded = await acompact_conversation(job.task, summarize)
+    except SummaryFailed:
+        raise JobFailed('Failed to summarize the conversation. The AI service might be unavailable.')
+    return {'summarized': folded}
+
+
+RUNNERS = {
+    AIJob.BREAKDOWN: run_breakdown,
+    AIJob.SUGGEST: run_suggestion,
+    AIJob.COMPACT: run_compaction,
+}
+
+
+def work(poll_interval=None, burst=False, should_stop=lambda: False):
+    """
+    Run queued jobs one at a time until should_stop() is true, or, with
+    burst, until the queue is empty.
+    """
+    if poll_interval is None:
+        poll_interval = get_options()['POLL_INTERVAL']
+    subscription = pubsub.get_broker().subscribe(JOBS_CHANNEL)
+    try:
+        while not should_stop():
+            close_old_connections()
+            requeue_stale_jobs()
+            job = claim_job()
+            if job is not None:
+                run_job(job)
+            elif burst:
+                return
+            else:
+                subscription.get(timeout=poll_interval)
+    finally:
+        subscription.close()
@@ -0,0 +1,62 @@
+import statistics
+import time
+import uuid
+
+from django.core.cache import caches
+from django.core.cache.backends.db import DatabaseCache
+from django.core.management.base import BaseCommand
+from django.core.management.commands.createcachetable import Command as CreateCacheTableCommand
+from django.db import DEFAULT_DB_ALIAS, connection
+
+BENCHMARK_TABLE = 'benchmark_cache_table'
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare cache hit latency of the configured cache aliases (with production settings: "
+        "the tiered 'default', Redis 'shared') and of a database cache table"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=2000, help='Reads per backend')
+        parser.add_argument('--size', type=int, default=1024, help='Size of the cached value in bytes')
+        parser.add_argument('--alias', action='append', dest='aliases',
+                            help='Cache alias to include (repeatable); all configured aliases by default')
+        parser.add_argument('--no-db', action='store_true', help='Leave out the database cache table')
+
+    def handle(self, *args, **options):
+        backends = [(alias, caches[alias]) for alias in options['aliases'] or caches.settings]
+        if not options['no_db']:
+            create = CreateCacheTableCommand()
+            create.verbosity = 0
+            create.create_table(DEFAULT_DB_ALIAS, BENCHMARK_TABLE, dry_run=False)
+            backends.append(('database', DatabaseCache(BENCHMARK_TABLE, {})))
+
+        value = 'x' * options['size']
+        self.stdout.write(f"{'cache':<14}{'backend':<16}{'mean us':>10}{'p50 us':>10}{'p99 us':>10}")
+        try:
+            for name, cache in backends:
+                self._measure(name, cache, value, options['iterations'])
+        finally:
+            if not options['no_db']:
+                with connection.cursor() as cursor:
+                    cursor.execute(f'DROP TABLE {connection.ops.quote_name(BENCHMARK_TABLE)}')
+
+    def _measure(self, name, cache, value, iterations):
+        key = f'benchmark:{uuid.uuid4().hex}'
+        cache.set(key, value, timeout=60)
+        # The first read fills per-process tiers
+        cache.get(key)
+        timings = []
+        for _ in range(iterations):
+            started = time.perf_counter()
+            cache.get(key)
+            timings.append((time.perf_counter() - started) * 1e6)
+        cache.delete(key)
+
+        timings.sort()
+        p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+        self.stdout.write(
+            f"{name:<14}{type(cache).__name__:<16}{statistics.mean(timings):>10.1f}"
+            f"{statistics.median(timings):>10.1f}{p99:>10.1f}"
+        )
@@ -0,0 +1,88 @@
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from apps.tasks.models import Task
+
+
+def legacy_hierarchy_level(task):
+    level = 0
+    current = task.parent_task
+    while current:
+        level += 1
+        current = current.parent_task
+    return level
+
+
+def legacy_root_task(task):
+    current = task
+    while current.parent_task:
+        current = current.parent_task
+    return current
+
+
+def legacy_all_subtasks(task):
+    subtasks = []
+    for subtask in task.subtasks.all():
+        subtasks.append(subtask)
+        subtasks.extend(legacy_all_subtasks(subtask))
+    return subtasks
+
+
+class Command(BaseCommand):
+    help = "Compare query counts of the parent-walk and materialized-path hierarchy lookups"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--nodes', type=int, default=2000, help='Total number of tasks in the tree')
+        parser.add_argument('--levels', type=int, default=5, help='Number of levels, root included')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            root, leaf = self._build_tree(options['nodes'], options['levels'])
+
+            self.stdout.write(f"{'operation':<20}{'legacy queries':>16}{'path queries':>14}{'legacy ms':>12}{'path ms':>10}")
+            self._compare('hierarchy_level', lambda t: legacy_hierarchy_level(t), lambda t: t.hierarchy_level, leaf)
+            self._compare('get_root_task', legacy_root_task, lambda t: t.get_root_task(), leaf)
+            self._compare('get_all_subtasks', legacy_all_subtasks, lambda t: t.get_all_subtasks(), root)
+
+            transaction.set_rollback(True)
+
+    def _build_tree(self, nodes, levels):
+        user = User.objects.create_user(username=f'hierarchy-bench-{time.time_ns()}')
+        root = Task.objects.create(title='root', user=user)
+        created = 1
+        level = [root]
+        # Spread the remaining nodes evenly over the requested number of levels
+        branching = 1
+        while sum(branching ** depth for depth in range(levels)) < nodes:
+            branching += 1
+
+        for _ in range(levels - 1):
+            batch = []
+            for parent in level:
+                for _ in range(branching):
+                    if created >= nodes:
+                        break
+                    child = Task(title=f'task {created}', user=user, parent_task=parent)
+                    child.sync_ancestry()
+                    batch.append(child)
+                    created += 1
+            level = Task.objects.bulk_create(batch)
+
+        leaf = level[-1] if level else root
+        self.stdout.write(f"Built {created} tasks over {leaf.depth + 1} levels\n")
+        return root, leaf
+
+    def _compare(self, label, legacy, indexed, task):
+        results = []
+        for fn in (legacy, indexed):
+            fresh = Task.objects.get(pk=task.pk)
+            start = time.perf_counter()
+            with CaptureQueriesContext(connection) as ctx:
+                fn(fresh)
+            results.append((len(ctx.captured_queries), (time.perf_counter() - start) * 1000))
+        (legacy_queries, legacy_ms), (path_queries, path_ms) = results
+        self.stdout.write(f"{label:<20}{legacy_queries:>16}{path_queries:>14}{legacy_ms:>12.1f}{path_ms:>10.1f}")
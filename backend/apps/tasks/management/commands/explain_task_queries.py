@@ -0,0 +1,97 @@
+import random
+import time
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+
+from apps.tasks.models import Task
+
+
+class Command(BaseCommand):
+    help = "Seed a large task dataset and print EXPLAIN plans for the hot Task queries without and with the Task indexes"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tasks', type=int, default=100000, help='Number of tasks to seed')
+        parser.add_argument('--users', type=int, default=50, help='Number of users to spread the tasks over')
+        parser.add_argument('--keep', action='store_true', help='Keep the seeded data instead of rolling back')
+
+    def handle(self, *args, **options):
+        # Render the DDL up front: SQLite refuses schema_editor() inside a
+        # transaction, but the plain statements can run (and roll back) there
+        with connection.schema_editor(collect_sql=True) as editor:
+            drop_indexes = [str(index.remove_sql(Task, editor)) for index in Task._meta.indexes]
+            create_indexes = [str(index.create_sql(Task, editor)) for index in Task._meta.indexes]
+
+        with transaction.atomic():
+            user, parent = self._seed(options['tasks'], options['users'])
+            queries = self._queries(user, parent)
+
+            self._run_ddl(drop_indexes)
+            self._analyze()
+            self._explain('WITHOUT Task indexes', queries)
+
+            self._run_ddl(create_indexes)
+            self._analyze()
+            self._explain('WITH Task indexes', queries)
+
+            if not options['keep']:
+                transaction.set_rollback(True)
+
+    def _seed(self, total, user_count):
+        stamp = time.time_ns()
+        users = User.objects.bulk_create(
+            User(username=f'explain-{stamp}-{i}') for i in range(user_count)
+        )
+        now = timezone.now()
+        statuses = [choice for choice, _ in Task.STATUS_CHOICES]
+        priorities = [choice for choice, _ in Task.PRIORITY_CHOICES]
+        batch = []
+        for i in range(total):
+            batch.append(Task(
+                title=f'Task {i}',
+                user=users[i % len(users)],
+                status=random.choice(statuses),
+                priority=random.choice(priorities),
+                due_date=now + timedelta(days=random.randint(-60, 60)) if random.random() < 0.5 else None,
+            ))
+            if len(batch) == 5000:
+                Task.objects.bulk_create(batch)
+                batch = []
+        Task.objects.bulk_create(batch)
+
+        user = users[0]
+        parent = Task.objects.filter(user=user).first()
+        self.stdout.write(f"Seeded {total} tasks for {user_count} users")
+        return user, parent
+
+    def _queries(self, user, parent):
+        now = timezone.now()
+        tasks = Task.objects.filter(user=user)
+        return {
+            'list (user, -created_at)': tasks.order_by('-created_at')[:20],
+            'by_status (user, status)': tasks.filter(status='todo'),
+            'due range (user, due_date)': tasks.filter(due_date__range=(now, now + timedelta(days=7))),
+            'overdue (open tasks)': tasks.filter(
+                due_date__isnull=False, due_date__lt=now, status__in=['todo', 'in_progress']
+            ),
+            'subtasks (parent_task)': Task.objects.filter(parent_task=parent),
+        }
+
+    def _run_ddl(self, statements):
+        with connection.cursor() as cursor:
+            for statement in statements:
+                cursor.execute(statement)
+
+    def _analyze(self):
+        # Refresh planner statistics so the plans reflect the seeded data
+        with connection.cursor() as cursor:
+            cursor.execute(f'ANALYZE {connection.ops.quote_name(Task._meta.db_table)}')
+
+    def _explain(self, heading, queries):
+        self.stdout.write(self.style.MIGRATE_HEADING(f"\n=== {heading} ==="))
+        for label, queryset in queries.items():
+            self.stdout.write(self.style.SUCCESS(f"-- {label}"))
+            self.stdout.write(queryset.explain())
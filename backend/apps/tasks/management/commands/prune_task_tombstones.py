@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from apps.tasks.models import TaskTombstone
+from apps.tasks.sync import tombstone_cutoff
+
+
+class Command(BaseCommand):
+    help = "Delete deleted-task tombstones older than TASK_TOMBSTONE_RETENTION_DAYS"
+
+    def handle(self, *args, **options):
+        deleted, _ = TaskTombstone.objects.filter(deleted_at__lt=tombstone_cutoff()).delete()
+        self.stdout.write(f"Pruned {deleted} task tombstones")
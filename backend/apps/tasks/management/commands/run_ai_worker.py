@@ -0,0 +1,63 @@
+import multiprocessing
+import signal
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from apps.tasks.jobs import get_options, work
+
+
+class StopFlag:
+    """Set by SIGTERM/SIGINT; the worker stops once its current job is done"""
+
+    def __init__(self):
+        self.stopped = False
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+    def stop(self, *args):
+        self.stopped = True
+
+    def __call__(self):
+        return self.stopped
+
+
+def worker_process(poll_interval, burst):
+    # No-op when forked; spawned children start without Django set up
+    django.setup()
+    work(poll_interval=poll_interval, burst=burst, should_stop=StopFlag())
+
+
+class Command(BaseCommand):
+    help = "Run queued AI jobs (task breakdowns and suggestions) in a pool of worker processes"
+
+    def add_arguments(self, parser):
+        options = get_options()
+        parser.add_argument('--processes', type=int, default=options['PROCESSES'],
+                            help='Number of worker processes')
+        parser.add_argument('--poll-interval', type=float, default=options['POLL_INTERVAL'],
+                            help='Seconds an idle worker waits before checking the queue again')
+        parser.add_argument('--burst', action='store_true',
+                            help='Exit once the queue is empty')
+
+    def handle(self, *args, **options):
+        processes = max(options['processes'], 1)
+        self.stdout.write(f"Starting {processes} AI worker process(es)")
+        if processes == 1:
+            worker_process(options['poll_interval'], options['burst'])
+            return
+
+        # Children must open their own database connections
+        connections.close_all()
+        pool = [
+            multiprocessing.Process(target=worker_process, args=(options['poll_interval'], options['burst']))
+            for _ in range(processes)
+        ]
+        for process in pool:
+            process.start()
+        # Forward SIGTERM to the children and wait for them to finish their jobs
+        signal.signal(signal.SIGTERM, lambda *args: [process.terminate() for process in pool])
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        for process in pool:
+            process.join()
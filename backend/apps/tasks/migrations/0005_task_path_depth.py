@@ -0,0 +1,47 @@
+# Generated by Django 5.2.6 for the materialized task hierarchy
+
+from collections import defaultdict
+
+from django.db import migrations, models
+
+
+def backfill_ancestry(apps, schema_editor):
+    """Compute path/depth for existing trees, one level at a time."""
+    Task = apps.get_model('tasks', 'Task')
+    children = defaultdict(list)
+    for pk, parent_id in Task.objects.values_list('id', 'parent_task_id'):
+        children[parent_id].append(pk)
+
+    updated = []
+    level = [(pk, '') for pk in children[None]]
+    depth = 0
+    while level:
+        next_level = []
+        for pk, path in level:
+            updated.append(Task(id=pk, path=path, depth=depth))
+            next_level.extend((child, f"{path}{pk}/") for child in children[pk])
+        level = next_level
+        depth += 1
+
+    Task.objects.bulk_update(updated, ['path', 'depth'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0004_task_parent_task'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='task',
+            name='path',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, help_text="Materialized path of ancestor ids, e.g. '1/5/' (empty for root tasks)", max_length=255),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='depth',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_ancestry, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.18 on 2026-10-17 06:04
+
+from django.conf import settings
+from django.db import migrations, models
+
+SEARCH_INDEX_NAME = 'task_search_idx'
+
+
+def _search_index():
+    from django.contrib.postgres.indexes import GinIndex
+    from django.contrib.postgres.search import SearchVector
+
+    # Must stay identical to the expression built by apps.tasks.filters.search_tasks
+    return GinIndex(SearchVector('title', 'description', 'notes', config='english'), name=SEARCH_INDEX_NAME)
+
+
+def add_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.add_index(apps.get_model('tasks', 'Task'), _search_index())
+
+
+def remove_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.remove_index(apps.get_model('tasks', 'Task'), _search_index())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0006_task_query_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['user', 'priority'], name='task_user_priority_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['user', 'velocity'], name='task_user_velocity_idx'),
+        ),
+        migrations.RunPython(add_search_index, remove_search_index),
+    ]
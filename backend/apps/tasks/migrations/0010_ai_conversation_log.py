@@ -0,0 +1,82 @@
+# Generated by Django 5.2.18 on 2026-10-17 06:44
+
+from collections import Counter
+from datetime import datetime, timezone
+import re
+
+from django.db import migrations, models
+
+# Blocks appended to Task.notes by ai_suggest before the conversation log
+CONVERSATION_RE = re.compile(
+    r'\n{0,2}--- AI Conversation \((?P<timestamp>[^)]*)\) ---\n'
+    r'You: (?P<user_message>.*?)\nAI: (?P<ai_response>.*?)\n--- End of Conversation ---',
+    re.DOTALL,
+)
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+def parse_timestamp(value):
+    try:
+        # Written with timezone.now(), i.e. in UTC
+        return datetime.strptime(value, TIMESTAMP_FORMAT).replace(tzinfo=timezone.utc)
+    except ValueError:
+        return None
+
+
+def split_notes(apps, schema_editor):
+    """
+    Move the conversations out of Task.notes. Most already have their
+    AIAssistantInteraction row; the others get one, dated from the marker.
+    """
+    Task = apps.get_model('tasks', 'Task')
+    AIAssistantInteraction = apps.get_model('tasks', 'AIAssistantInteraction')
+    tasks = Task.objects.filter(notes__contains='--- AI Conversation (').only('id', 'notes')
+    for task in tasks.iterator(chunk_size=500):
+        recorded = Counter(AIAssistantInteraction.objects.filter(task_id=task.id).values_list('user_message', 'ai_response'))
+        for match in CONVERSATION_RE.finditer(task.notes):
+            exchange = (match['user_message'], match['ai_response'])
+            if recorded[exchange]:
+                recorded[exchange] -= 1
+                continue
+            interaction = AIAssistantInteraction.objects.create(
+                task_id=task.id, user_message=exchange[0], ai_response=exchange[1],
+            )
+            created_at = parse_timestamp(match['timestamp'])
+            if created_at is not None:
+                # created_at is auto_now_add, so it can only be backdated by an update
+                AIAssistantInteraction.objects.filter(pk=interaction.pk).update(created_at=created_at)
+        Task.objects.filter(pk=task.id).update(notes=CONVERSATION_RE.sub('', task.notes).strip())
+
+
+def join_notes(apps, schema_editor):
+    """Append each task's conversation to its notes again"""
+    Task = apps.get_model('tasks', 'Task')
+    AIAssistantInteraction = apps.get_model('tasks', 'AIAssistantInteraction')
+    task_ids = AIAssistantInteraction.objects.values_list('task_id', flat=True).distinct()
+    for task in Task.objects.filter(pk__in=task_ids).only('id', 'notes').iterator(chunk_size=500):
+        entries = [
+            f"--- AI Conversation ({interaction.created_at.strftime(TIMESTAMP_FORMAT)}) ---\n"
+            f"You: {interaction.user_message}\nAI: {interaction.ai_response}\n--- End of Conversation ---"
+            for interaction in AIAssistantInteraction.objects.filter(task_id=task.id).order_by('created_at', 'id')
+        ]
+        Task.objects.filter(pk=task.id).update(notes='\n\n'.join([task.notes, *entries] if task.notes else entries))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0009_ai_job'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='task',
+            name='notes',
+            field=models.TextField(blank=True, help_text='User-authored task notes; AI conversations are AIAssistantInteraction rows'),
+        ),
+        migrations.AddIndex(
+            model_name='aiassistantinteraction',
+            index=models.Index(fields=['task', 'created_at'], name='interaction_task_created_idx'),
+        ),
+        migrations.RunPython(split_notes, join_notes),
+    ]
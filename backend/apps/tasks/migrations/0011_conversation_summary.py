@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-17 06:47
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0010_ai_conversation_log'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='aijob',
+            name='kind',
+            field=models.CharField(choices=[('breakdown', 'Breakdown'), ('suggest', 'Suggestion'), ('compact', 'Conversation compaction')], max_length=20),
+        ),
+        migrations.CreateModel(
+            name='TaskConversationSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('summary', models.TextField()),
+                ('through_created_at', models.DateTimeField()),
+                ('through_id', models.BigIntegerField()),
+                ('interaction_count', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('task', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='conversation_summary', to='tasks.task')),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 06:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0011_conversation_summary'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='tasktombstone',
+            name='task_id',
+            field=models.PositiveBigIntegerField(),
+        ),
+    ]
@@ -1,6 +1,15 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F, Max, Q, Value
+from django.db.models.functions import Concat, Length, Substr
 from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator, MaxValueValidator
+from django.utils import timezone
+
+# Stored parent of a task loaded with parent_task_id deferred: unknown
+_NOT_LOADED = object()
+
+# Length of Task.path, which bounds how deeply tasks can be nested
+PATH_MAX_LENGTH = 255
 
 
 class Task(models.Model):
@@ -17,6 +26,7 @@ class Task(models.Model):
         ('completed', 'Completed'),
         ('cancelled', 'Cancelled'),
     ]
+    OPEN_STATUSES = ('todo', 'in_progress')
     
     VELOCITY_CHOICES = [
         ('slow', 'Slow'),
@@ -27,7 +37,7 @@ class Task(models.Model):
 
     title = models.CharField(max_length=200)
     description = models.TextField(blank=True)
-    notes = models.TextField(blank=True, help_text="Task notes and AI conversation history")
+    notes = models.TextField(blank=True, help_text="User-authored task notes; AI conversations are AIAssistantInteraction rows")
     priority = models.CharField(max_length=10, choices=PRIORITY_CHOICES, default='medium')
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='todo')
     progress = models.IntegerField(
@@ -46,13 +56,123 @@ class Task(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='tasks')
     parent_task = models.ForeignKey('self', on_delete=models.CASCADE, null=True, blank=True, related_name='subtasks')
+    path = models.CharField(
+        max_length=PATH_MAX_LENGTH,
+        blank=True,
+        default='',
+        db_index=True,
+        editable=False,
+        help_text="Materialized path of ancestor ids, e.g. '1/5/' (empty for root tasks)"
+    )
+    depth = models.PositiveIntegerField(default=0, editable=False)
     tags = models.ManyToManyField('Tag', blank=True)
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', '-created_at'], name='task_user_created_idx'),
+            models.Index(fields=['user', 'status'], name='task_user_status_idx'),
+            models.Index(fields=['user', 'due_date'], name='task_user_due_idx'),
+            models.Index(fields=['user', 'priority'], name='task_user_priority_idx'),
+            models.Index(fields=['user', 'velocity'], name='task_user_velocity_idx'),
+            # Delta sync: tasks changed since a client's cursor
+            models.Index(fields=['user', 'updated_at'], name='task_user_updated_idx'),
+            # Overdue / due-soon lookups only ever look at open tasks with a due date
+            models.Index(
+                fields=['user', 'due_date'],
+                condition=Q(due_date__isnull=False, status__in=['todo', 'in_progress']),
+                name='task_open_due_idx',
+            ),
+            # The full-text GIN index (task_search_idx) is PostgreSQL-only, so
+            # it is created by migration 0007 instead of being declared here
+        ]
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Read from __dict__: a deferred field would be fetched with a query
+        self._loaded_parent_task_id = self.__dict__.get('parent_task_id', _NOT_LOADED)
 
     def __str__(self):
         return self.title
+
+    def save(self, *args, **kwargs):
+        creating = self.pk is None
+        reparented = not creating and self._parent_changed()
+        if not (creating or reparented):
+            super().save(*args, **kwargs)
+            return
+
+        old_prefix, old_depth = self.subtree_prefix, self.depth
+        self.sync_ancestry()
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = {*kwargs['update_fields'], 'path', 'depth'}
+
+        if creating:
+            super().save(*args, **kwargs)
+        else:
+            with transaction.atomic():
+                super().save(*args, **kwargs)
+                # Rewrite the whole subtree in one UPDATE instead of walking it;
+                # updated_at moves too so delta sync picks up the new depths
+                Task.objects.filter(path__startswith=old_prefix).update(
+                    path=Concat(Value(self.subtree_prefix), Substr('path', len(old_prefix) + 1)),
+                    depth=F('depth') + (self.depth - old_depth),
+                    updated_at=timezone.now(),
+                )
+        self._loaded_parent_task_id = self.parent_task_id
+
+    def _parent_changed(self):
+        if 'parent_task_id' not in self.__dict__:
+            # Deferred and never assigned since
+            return False
+        loaded = self._loaded_parent_task_id
+        if loaded is _NOT_LOADED:
+            loaded = Task.objects.filter(pk=self.pk).values_list('parent_task_id', flat=True).first()
+        return self.parent_task_id != loaded
+
+    def sync_ancestry(self):
+        """Recompute path and depth from the parent task.
+
+        Called automatically by save(); callers using bulk_create() must call
+        it themselves on each new task before inserting.
+        """
+        if self.parent_task_id is None:
+            self.path = ''
+            self.depth = 0
+            return
+        parent = self.parent_task
+        if self.pk is not None and (parent.pk == self.pk or parent.path.startswith(self.subtree_prefix)):
+            raise ValueError("A task cannot be moved under itself or one of its subtasks")
+        if not self.fits_under(parent):
+            raise ValueError("Tasks cannot be nested this deeply")
+        self.path = parent.subtree_prefix
+        self.depth = parent.depth + 1
+
+    def can_have_subtasks(self):
+        return len(self.subtree_prefix) <= PATH_MAX_LENGTH
+
+    def fits_under(self, parent):
+        """
+        Whether the task can be placed under `parent` without its path, or
+        the path of one of its subtasks, growing past PATH_MAX_LENGTH
+        """
+        if not parent.can_have_subtasks():
+            return False
+        if self.pk is None:
+            return True
+        longest = self.get_descendants().aggregate(longest=Max(Length('path')))['longest']
+        # Moving swaps the task's own path for the parent's prefix in every subtask's
+        return longest is None or longest + len(parent.subtree_prefix) - len(self.path) <= PATH_MAX_LENGTH
+
+    @property
+    def subtree_prefix(self):
+        """Path prefix shared by every descendant of this task"""
+        return f"{self.path}{self.pk}/"
+
+    @property
+    def ancestor_ids(self):
+        """Ids of all ancestors, root first"""
+        return [int(pk) for pk in self.path.split('/') if pk]
     
     @property
     def is_parent(self):
@@ -67,30 +187,30 @@ class Task(models.Model):
     @property
     def hierarchy_level(self):
         """Get the hierarchy level (0 = root task, 1 = first level subtask, etc.)"""
-        level = 0
-        current = self.parent_task
-        while current:
-            level += 1
-            current = current.parent_task
-        return level
+        return self.depth
     
     def get_root_task(self):
         """Get the root task in the hierarchy"""
-        current = self
-        while current.parent_task:
-            current = current.parent_task
-        return current
+        if not self.path:
+            return self
+        return Task.objects.get(pk=self.ancestor_ids[0])
     
+    def get_ancestors(self):
+        """Get all ancestors ordered from the root down"""
+        return Task.objects.filter(pk__in=self.ancestor_ids).order_by('depth')
+
+    def get_descendants(self):
+        """Queryset of all subtasks at any depth"""
+        return Task.objects.filter(path__startswith=self.subtree_prefix)
+
     def get_all_subtasks(self):
         """Get all subtasks recursively"""
-        def get_subtasks_recursive(task):
-            subtasks = []
-            for subtask in task.subtasks.all():
-                subtasks.append(subtask)
-                subtasks.extend(get_subtasks_recursive(subtask))
-            return subtasks
-        
-        return get_subtasks_recursive(self)
+        return list(self.get_descendants().order_by('path', 'id'))
+
+    def move_to(self, new_parent):
+        """Move this task, with its whole subtree, under new_parent (None for root)"""
+        self.parent_task = new_parent
+        self.save()
 
 
 class Tag(models.Model):
@@ -101,11 +221,103 @@ class Tag(models.Model):
         return self.name
 
 
+class TaskTombstone(models.Model):
+    """
+    Record of a deleted task, so delta sync clients can drop it. Written for
+    every deleted task, cascaded subtasks included, and pruned after
+    TASK_TOMBSTONE_RETENTION_DAYS by the prune_task_tombstones command.
+    """
+    # No FK constraint: deleting a user cascades to their tasks, whose
+    # tombstones are written after the user row is already gone
+    user = models.ForeignKey(User, on_delete=models.CASCADE, db_constraint=False, related_name='+')
+    task_id = models.PositiveBigIntegerField()
+    deleted_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'deleted_at'], name='tombstone_user_deleted_idx'),
+        ]
+
+    def __str__(self):
+        return f"Deleted task {self.task_id}"
+
+
 class AIAssistantInteraction(models.Model):
+    """One exchange of a task's append-only AI conversation log"""
     task = models.ForeignKey(Task, on_delete=models.CASCADE, related_name='ai_interactions')
     user_message = models.TextField()
     ai_response = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
-    
+
     class Meta:
-        ordering = ['-created_at']
\ No newline at end of file
+        ordering = ['-created_at']
+        indexes = [
+            # Keyset pagination of a task's conversation
+            models.Index(fields=['task', 'created_at'], name='interaction_task_created_idx'),
+        ]
+
+
+class TaskConversationSummary(models.Model):
+    """
+    Rolling summary of a task's older AI interactions, maintained by
+    conversation compaction. It covers every interaction up to and including
+    (through_created_at, through_id), in (created_at, id) order.
+    """
+    task = models.OneToOneField(Task, on_delete=models.CASCADE, related_name='conversation_summary')
+    summary = models.TextField()
+    through_created_at = models.DateTimeField()
+    through_id = models.BigIntegerField()
+    interaction_count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Conversation summary of task {self.task_id}"
+
+
+class AIJob(models.Model):
+    """
+    AI request on a task run in the background by the run_ai_worker command,
+    so the HTTP request returns at once. Clients poll /api/ai-jobs/{id}/.
+    """
+    BREAKDOWN = 'breakdown'
+    SUGGEST = 'suggest'
+    COMPACT = 'compact'
+    KIND_CHOICES = [
+        (BREAKDOWN, 'Breakdown'),
+        (SUGGEST, 'Suggestion'),
+        (COMPACT, 'Conversation compaction'),
+    ]
+
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (SUCCEEDED, 'Succeeded'),
+        (FAILED, 'Failed'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='ai_jobs')
+    task = models.ForeignKey(Task, on_delete=models.CASCADE, related_name='ai_jobs')
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=QUEUED)
+    payload = models.JSONField(default=dict, blank=True)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    # Claims so far; a job whose worker died is retried up to AI_JOBS['MAX_ATTEMPTS']
+    attempts = models.PositiveSmallIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            # Workers claim the oldest queued job
+            models.Index(fields=['status', 'created_at'], name='aijob_status_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} job for {self.task_id} ({self.status})"
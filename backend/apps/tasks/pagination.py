@@ -0,0 +1,57 @@
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+
+class TaskCursorPagination(CursorPagination):
+    """
+    Keyset pagination on (created_at, id): no COUNT(*) and no OFFSET scan.
+    ?ordering= is ignored: a cursor over a nullable (due_date) or non-unique
+    (title) column would drop or repeat tasks between pages.
+    """
+    ordering = ('-created_at', '-id')
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+    def get_ordering(self, request, queryset, view):
+        return self.ordering
+
+
+class InteractionCursorPagination(CursorPagination):
+    """A task's AI conversation, newest first, paged by created_at"""
+    ordering = ('-created_at', '-id')
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+
+class TaskPagination(PageNumberPagination):
+    """
+    Page-number pagination for existing clients, switching to keyset
+    pagination when the request passes ?cursor= or ?pagination=cursor.
+    """
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+    def __init__(self):
+        self.cursor_paginator = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.use_cursor(request):
+            self.cursor_paginator = TaskCursorPagination()
+            page = self.cursor_paginator.paginate_queryset(queryset, request, view)
+            self.display_page_controls = self.cursor_paginator.display_page_controls
+            return page
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+    def to_html(self):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.to_html()
+        return super().to_html()
+
+    def use_cursor(self, request):
+        params = request.query_params
+        return TaskCursorPagination.cursor_query_param in params or params.get('pagination') == 'cursor'
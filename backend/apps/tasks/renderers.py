@@ -0,0 +1,19 @@
+from rest_framework.renderers import BaseRenderer
+
+from .events import format_event
+
+
+class EventStreamRenderer(BaseRenderer):
+    """
+    Lets the events endpoint be negotiated for Accept: text/event-stream.
+    The stream itself bypasses rendering; this only renders error responses,
+    as a single "error" event.
+    """
+    media_type = 'text/event-stream'
+    format = 'event-stream'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return ''
+        return format_event({'event': 'error', **data})
@@ -1,5 +1,31 @@
+from django.db import transaction
+from django.utils import timezone
 from rest_framework import serializers
-from .models import Task, Tag, AIAssistantInteraction
+from .models import Task, Tag, AIAssistantInteraction, AIJob
+
+
+def parse_field_list(value):
+    """Split a comma separated ?fields=/?omit= value into a set of names"""
+    return {name.strip() for name in value.split(',') if name.strip()} if value else set()
+
+
+class SparseFieldsMixin:
+    """
+    Restricts read responses to the fields named in ?fields= and drops those
+    named in ?omit=. The id is always kept.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        if request is None or request.method not in ('GET', 'HEAD'):
+            return
+        params = getattr(request, 'query_params', request.GET)
+        fields = parse_field_list(params.get('fields'))
+        omit = parse_field_list(params.get('omit'))
+        for name in list(self.fields):
+            if name != 'id' and ((fields and name not in fields) or name in omit):
+                self.fields.pop(name)
 
 
 class TagSerializer(serializers.ModelSerializer):
@@ -8,7 +34,137 @@ class TagSerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'color']
 
 
-class TaskSerializer(serializers.ModelSerializer):
+class TaskBulkListSerializer(serializers.ListSerializer):
+    """
+    Creates or updates many tasks with batched queries: one bulk_create or
+    bulk_update for the tasks and one insert for all their tags, inside a
+    single transaction. Validation errors are reported per item.
+    """
+
+    def run_child_validation(self, data):
+        if self.instance is not None:
+            # Bulk update: validate each item against the task it targets
+            instances = {task.pk: task for task in self.instance if task is not None}
+            self.child.instance = instances.get(self._item_id(data))
+            if self.child.instance is None:
+                raise serializers.ValidationError({'id': ['Task not found.']})
+        return super().run_child_validation(data)
+
+    def to_internal_value(self, data):
+        if isinstance(data, list):
+            # Resolve every referenced parent task with one query instead of one per item
+            parent_ids = {self._item_id(item, 'parent_task') for item in data} - {None}
+            self.context['parent_tasks'] = Task.objects.in_bulk(parent_ids) if parent_ids else {}
+        return super().to_internal_value(data)
+
+    def validate(self, attrs):
+        if self.instance is not None:
+            self._validate_moves(attrs)
+        tag_ids = {tag_id for item in attrs for tag_id in item.get('tag_ids') or []}
+        if not tag_ids:
+            return attrs
+        missing = tag_ids - set(Tag.objects.filter(pk__in=tag_ids).values_list('pk', flat=True))
+        if missing:
+            errors = {}
+            for index, item in enumerate(attrs):
+                invalid = sorted(missing.intersection(item.get('tag_ids') or []))
+                if invalid:
+                    errors[index] = {'tag_ids': [f"Invalid tag id(s): {', '.join(map(str, invalid))}"]}
+            raise serializers.ValidationError(errors)
+        return attrs
+
+    def _validate_moves(self, attrs):
+        """
+        Moved tasks are saved one at a time, each from the tree as it was
+        before the batch. Moving a task together with one of its ancestors,
+        or under a task moved in the same batch, would leave stale paths (or
+        a cycle), so such batches are rejected.
+        """
+        moved = []
+        for index, (task, item) in enumerate(zip(self.instance, attrs)):
+            if 'parent_task' in item:
+                parent = item['parent_task']
+                if (parent.pk if parent is not None else None) != task.parent_task_id:
+                    moved.append((index, task, parent))
+        errors = {}
+        for index, task, parent in moved:
+            for _, other, _ in moved:
+                if other is not task and (
+                    task.path.startswith(other.subtree_prefix)
+                    or (parent is not None and (parent.pk == other.pk or parent.path.startswith(other.subtree_prefix)))
+                ):
+                    errors[index] = {'parent_task': [
+                        f"Task {other.pk} is moved in the same request; move them in separate requests."
+                    ]}
+                    break
+        if errors:
+            raise serializers.ValidationError(errors)
+
+    def create(self, validated_data):
+        tasks = []
+        for attrs in validated_data:
+            attrs = {key: value for key, value in attrs.items() if key != 'tag_ids'}
+            task = Task(**attrs)
+            task.sync_ancestry()
+            tasks.append(task)
+
+        with transaction.atomic():
+            Task.objects.bulk_create(tasks)
+            self._set_tags(tasks, [attrs.get('tag_ids') for attrs in validated_data], replace=False)
+        return tasks
+
+    def update(self, instances, validated_data):
+        now = timezone.now()
+        fields = {'updated_at'}
+        for task, attrs in zip(instances, validated_data):
+            for attr, value in attrs.items():
+                if attr != 'tag_ids':
+                    setattr(task, attr, value)
+                    fields.add(attr)
+            # bulk_update() skips auto_now
+            task.updated_at = now
+
+        moved = [task for task in instances if task.parent_task_id != task._loaded_parent_task_id]
+        unmoved = [task for task in instances if task not in moved]
+        with transaction.atomic():
+            for task in moved:
+                # save() also rewrites the paths of the moved subtree
+                task.save()
+            Task.objects.bulk_update(unmoved, fields)
+            self._set_tags(instances, [attrs.get('tag_ids') for attrs in validated_data], replace=True)
+        return instances
+
+    def _set_tags(self, tasks, tag_id_lists, replace):
+        through = Task.tags.through
+        assigned = [(task, set(tag_ids)) for task, tag_ids in zip(tasks, tag_id_lists) if tag_ids is not None]
+        if replace and assigned:
+            through.objects.filter(task_id__in=[task.pk for task, _ in assigned]).delete()
+        through.objects.bulk_create(
+            through(task_id=task.pk, tag_id=tag_id) for task, tag_ids in assigned for tag_id in tag_ids
+        )
+
+    def _item_id(self, data, key='id'):
+        try:
+            return int(data.get(key))
+        except (AttributeError, TypeError, ValueError):
+            return None
+
+
+class ParentTaskField(serializers.PrimaryKeyRelatedField):
+    """Looks parent tasks up in the batch primed by TaskBulkListSerializer when there is one."""
+
+    def to_internal_value(self, data):
+        prefetched = self.context.get('parent_tasks')
+        if prefetched is not None and not isinstance(data, bool):
+            try:
+                return prefetched[int(data)]
+            except (KeyError, TypeError, ValueError):
+                pass
+        return super().to_internal_value(data)
+
+
+class TaskSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    parent_task = ParentTaskField(queryset=Task.objects.all(), required=False, allow_null=True)
     tags = TagSerializer(many=True, read_only=True)
     tag_ids = serializers.ListField(
         child=serializers.IntegerField(),
@@ -18,14 +174,45 @@ class TaskSerializer(serializers.ModelSerializer):
     subtasks = serializers.SerializerMethodField()
     parent_task_title = serializers.CharField(source='parent_task.title', read_only=True)
     hierarchy_level = serializers.ReadOnlyField()
-    is_parent = serializers.ReadOnlyField()
+    is_parent = serializers.SerializerMethodField()
+    has_children = serializers.SerializerMethodField()
     is_subtask = serializers.ReadOnlyField()
     
     def get_subtasks(self, obj):
         """Get immediate subtasks (not recursive)"""
-        subtasks = obj.subtasks.all()
+        tree = self.context.get('task_tree')
+        if tree is not None:
+            subtasks = tree.children_of(obj)
+        else:
+            subtasks = obj.subtasks.all()
         return TaskSerializer(subtasks, many=True, context=self.context).data
+
+    def get_has_children(self, obj):
+        """Whether the task has subtasks, using the tree or annotation when available"""
+        tree = self.context.get('task_tree')
+        if tree is not None:
+            return tree.has_children(obj)
+        if hasattr(obj, 'has_subtasks'):
+            return obj.has_subtasks
+        return obj.is_parent
+
+    def get_is_parent(self, obj):
+        return self.get_has_children(obj)
     
+    def validate_parent_task(self, value):
+        """Only allow the user's own tasks as parent, and never the task's own subtree."""
+        request = self.context.get('request')
+        if value is not None and request is not None and value.user_id != request.user.pk:
+            raise serializers.ValidationError("Parent task not found.")
+        task = self.instance
+        if value is not None and task is not None and (
+            value.pk == task.pk or value.path.startswith(task.subtree_prefix)
+        ):
+            raise serializers.ValidationError("A task cannot be moved under itself or one of its subtasks.")
+        if value is not None and not (task if task is not None else Task()).fits_under(value):
+            raise serializers.ValidationError("Tasks cannot be nested this deeply.")
+        return value
+
     def validate_progress(self, value):
         """Validate that progress is between 0 and 100."""
         if value < 0 or value > 100:
@@ -38,8 +225,9 @@ class TaskSerializer(serializers.ModelSerializer):
             'id', 'title', 'description', 'notes', 'priority', 'status',
             'progress', 'velocity', 'due_date', 'created_at', 'updated_at', 
             'parent_task', 'parent_task_title', 'subtasks', 'hierarchy_level',
-            'is_parent', 'is_subtask', 'tags', 'tag_ids'
+            'is_parent', 'has_children', 'is_subtask', 'tags', 'tag_ids'
         ]
+        list_serializer_class = TaskBulkListSerializer
 
     def create(self, validated_data):
         tag_ids = validated_data.pop('tag_ids', [])
@@ -59,7 +247,40 @@ class TaskSerializer(serializers.ModelSerializer):
         return instance
 
 
+class TaskListSerializer(TaskSerializer):
+    """
+    Compact representation used by the task list: no description, notes or
+    nested subtasks. Clients can still ask for them with ?fields=.
+    """
+
+    class Meta(TaskSerializer.Meta):
+        fields = [
+            'id', 'title', 'priority', 'status', 'progress', 'velocity',
+            'due_date', 'created_at', 'updated_at', 'parent_task',
+            'parent_task_title', 'hierarchy_level', 'is_parent',
+            'has_children', 'is_subtask', 'tags'
+        ]
+
+
 class AIAssistantInteractionSerializer(serializers.ModelSerializer):
     class Meta:
         model = AIAssistantInteraction
-        fields = ['id', 'user_message', 'ai_response', 'created_at']
\ No newline at end of file
+        fields = ['id', 'user_message', 'ai_response', 'created_at']
+
+class AIJobSerializer(serializers.ModelSerializer):
+    queue_position = serializers.SerializerMethodField()
+
+    class Meta:
+        model = AIJob
+        fields = [
+            'id', 'task', 'kind', 'status', 'queue_position', 'result', 'error',
+            'created_at', 'started_at', 'finished_at',
+        ]
+
+    def get_queue_position(self, obj):
+        """Number of jobs ahead of a queued job, counting from 1"""
+        if obj.status != AIJob.QUEUED:
+            return None
+        if hasattr(obj, 'jobs_ahead'):
+            return obj.jobs_ahead + 1
+        return AIJob.objects.filter(status=AIJob.QUEUED, created_at__lt=obj.created_at).count() + 1
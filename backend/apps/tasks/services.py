@@ -1,40 +1,178 @@
 import os
 import logging
 import json
-from typing import Optional, List, Dict
-import requests
-from django.conf import settings
+from typing import AsyncIterator, List, Dict, Optional, Tuple
+
+from apps.ai_assistant.services.anthropic_service import AnthropicService
+from apps.ai_assistant.services.base import AIMessage, AIProvider, AIServiceError
+from apps.ai_assistant.services.response_cache import generate_cached, stream_cached
+from apps.ai_assistant.settings_cache import aget_user_settings, get_user_settings
+from .conversation import ConversationContext
 
 logger = logging.getLogger(__name__)
 
+REQUEST_TIMEOUT = 30
+
+SUGGESTION_SYSTEM_PROMPT = """You are an AI assistant for a task management application. You help users by providing practical, actionable suggestions for their tasks. Your responses should be:
+
+1. Helpful and specific to the task context
+2. Actionable with clear next steps
+3. Professional but friendly in tone
+4. Concise but comprehensive (aim for 2-4 sentences)
+5. Focused on productivity and task completion
+
+When users ask questions about their tasks, provide suggestions that could help them complete the task more effectively, break it down into smaller steps, identify potential challenges, or suggest resources/approaches."""
+
+BREAKDOWN_SYSTEM_PROMPT = """You are an AI assistant that helps break down complex tasks into smaller, manageable subtasks.
+
+Your response must be a valid JSON array containing objects with these exact fields:
+- "title": A clear, concise title for the subtask (max 100 characters)
+- "description": A detailed description of what needs to be done for this subtask
+- "priority": One of: "low", "medium", "high", "urgent"
+
+Guidelines:
+1. Break the task into 3-8 logical subtasks
+2. Each subtask should be specific and actionable
+3. Order subtasks logically (dependencies first)
+4. Make subtasks small enough to complete in a reasonable time
+5. Ensure each subtask contributes to the overall goal
+6. Assign appropriate priorities based on importance and dependencies
+
+Return ONLY the JSON array, no other text."""
+
+SUMMARY_SYSTEM_PROMPT = """You maintain a running summary of a conversation between a user and an AI assistant about one task.
+
+Merge the new exchanges into the current summary. Keep decisions, facts, constraints, open questions and the user's preferences; drop greetings and repetition. Write plain prose of at most {max_words} words.
+
+Return ONLY the updated summary, no other text."""
+
+
+def suggestion_messages(
+    task_title: str, task_description: str, user_message: str, context: Optional[ConversationContext] = None
+) -> List[AIMessage]:
+    """Prompt asking for a suggestion on a task, after its earlier conversation"""
+    system_prompt = SUGGESTION_SYSTEM_PROMPT
+    history = []
+    if context is not None:
+        if context.summary:
+            system_prompt += f"\n\nSummary of the earlier conversation about this task:\n{context.summary}"
+        for past_message, past_response in context.turns:
+            history += [AIMessage(role='user', content=past_message), AIMessage(role='assistant', content=past_response)]
+
+    user_content = f"""Task: {task_title}
+
+Description: {task_description or "No description provided"}
+
+User Question: {user_message}
+
+Please provide a helpful suggestion for this task."""
+    return [AIMessage(role='system', content=system_prompt), *history, AIMessage(role='user', content=user_content)]
+
+
+def summary_messages(task_title: str, summary: str, turns: List[Tuple[str, str]], max_tokens: int) -> List[AIMessage]:
+    """Prompt asking to fold conversation turns into the running summary"""
+    exchanges = "\n\n".join(f"User: {message}\nAssistant: {response}" for message, response in turns)
+    user_content = f"""Task: {task_title}
+
+Current summary: {summary or "None yet"}
+
+New exchanges:
+{exchanges}"""
+    # Roughly 0.75 words per token
+    system_prompt = SUMMARY_SYSTEM_PROMPT.format(max_words=max_tokens * 3 // 4)
+    return [AIMessage(role='system', content=system_prompt), AIMessage(role='user', content=user_content)]
+
+
+def breakdown_messages(task_title: str, task_description: str) -> List[AIMessage]:
+    """Prompt asking for a JSON list of subtasks"""
+    user_content = f"""Task to break down:
+Title: {task_title}
+Description: {task_description or "No description provided"}
+
+Please break this task into smaller, manageable subtasks. Return as JSON array only."""
+    return [AIMessage(role='system', content=BREAKDOWN_SYSTEM_PROMPT), AIMessage(role='user', content=user_content)]
+
+
+def parse_subtasks(response_text: str) -> List[Dict[str, str]]:
+    """Validated subtasks from a breakdown response, or [] when it is not a JSON list"""
+    try:
+        subtasks = json.loads(response_text)
+    except json.JSONDecodeError:
+        logger.error(f"Failed to parse Claude response as JSON: {response_text}")
+        return []
+    if not isinstance(subtasks, list):
+        return []
+
+    validated_subtasks = []
+    for subtask in subtasks:
+        if isinstance(subtask, dict) and 'title' in subtask and 'description' in subtask:
+            # Ensure all required fields exist with defaults
+            validated_subtask = {
+                'title': str(subtask.get('title', 'Untitled Subtask'))[:100],
+                'description': str(subtask.get('description', '')),
+                'priority': subtask.get('priority', 'medium') if subtask.get('priority') in ['low', 'medium', 'high', 'urgent'] else 'medium'
+            }
+            validated_subtasks.append(validated_subtask)
+    return validated_subtasks[:8]  # Limit to 8 subtasks max
+
+
+UNAVAILABLE_MESSAGE = "AI service is currently unavailable. Please configure your Claude API key in settings."
+EMPTY_SUGGESTION_MESSAGE = "I'm sorry, I couldn't generate a suggestion at this time. Please try again."
+
+# Failures worth retrying shortly. Breakdowns raise them instead of returning
+# no subtasks, so callers can answer 429 or 503
+RETRYABLE_ERRORS = ('RATE_LIMITED', 'RATE_LIMIT_ERROR', 'TIMEOUT', 'CONNECTION_ERROR', 'SERVER_ERROR', 'CIRCUIT_OPEN')
+
+
+def suggestion_error_message(error: Exception) -> str:
+    """User-facing text explaining why a suggestion failed"""
+    if not isinstance(error, AIServiceError):
+        logger.error(f"Unexpected error in Claude AI service: {str(error)}")
+        return "An unexpected error occurred. Please try again later."
+
+    logger.error(f"Claude API error ({error.error_code}): {str(error)}")
+    if error.error_code == 'MISSING_API_KEY':
+        return UNAVAILABLE_MESSAGE
+    elif error.error_code == 'EMPTY_RESPONSE':
+        return EMPTY_SUGGESTION_MESSAGE
+    elif error.error_code == 'AUTHENTICATION_ERROR':
+        return "AI service authentication failed. Please check your API key in settings."
+    elif error.error_code in ('RATE_LIMIT_ERROR', 'RATE_LIMITED'):
+        return "AI service is temporarily busy. Please try again in a moment."
+    elif error.error_code == 'TIMEOUT':
+        return "AI service request timed out. Please try again."
+    elif error.error_code == 'CONNECTION_ERROR':
+        return "AI service connection error. Please check your internet connection."
+    elif error.error_code in ('SERVER_ERROR', 'CIRCUIT_OPEN'):
+        return "AI service is temporarily unavailable. Please try again in a few minutes."
+    else:
+        return "AI service encountered an error. Please try again later."
+
 
 class ClaudeAIService:
     """Service for interacting with Claude AI API"""
 
-    def __init__(self, user=None):
+    def __init__(self, user=None, claude_settings=None):
         """
         Initialize Claude service with user-specific settings
 
         Args:
-            user: Django User instance to get Claude settings for
+            user: Django User instance the service acts for
+            claude_settings: The user's UserClaudeSettings, if any
         """
         self.user = user
         self.api_key = None
         self.model = 'claude-3-5-sonnet-20241022'
         self.max_tokens = 4096
         self.temperature = 0.7
+        self.cache_responses = True
 
-        if user:
-            try:
-                from apps.ai_assistant.models import UserClaudeSettings
-                settings = UserClaudeSettings.objects.get(user=user)
-                if settings.has_valid_api_key():
-                    self.api_key = settings.api_key
-                    self.model = settings.model
-                    self.max_tokens = settings.max_tokens
-                    self.temperature = settings.temperature
-            except Exception as e:
-                logger.warning(f"Could not load user Claude settings: {str(e)}")
+        if claude_settings is not None and claude_settings.has_valid_api_key():
+            self.api_key = claude_settings.api_key
+            self.model = claude_settings.model
+            self.max_tokens = claude_settings.max_tokens
+            self.temperature = claude_settings.temperature
+            self.cache_responses = claude_settings.cache_responses
 
         # Fallback to environment variable if no user-specific key
         if not self.api_key:
@@ -42,11 +180,19 @@ class ClaudeAIService:
             if not self.api_key:
                 logger.warning("No Claude API key found in user settings or environment variables")
 
+        self._service = AnthropicService(
+            api_key=self.api_key,
+            user_id=user.pk if user else None,
+            timeout=REQUEST_TIMEOUT,
+        ) if self.is_available() else None
+
     def is_available(self) -> bool:
         """Check if Claude API is available"""
         return bool(self.api_key and self.api_key.startswith('sk-ant-api03-'))
-    
-    def get_task_suggestion(self, task_title: str, task_description: str, user_message: str) -> str:
+
+    async def get_task_suggestion(
+        self, task_title: str, task_description: str, user_message: str, context: Optional[ConversationContext] = None
+    ) -> str:
         """
         Get AI suggestion for a task based on task details and user message
 
@@ -54,93 +200,58 @@ class ClaudeAIService:
             task_title: The title of the task
             task_description: The description of the task
             user_message: The user's specific question or request
+            context: Earlier conversation about the task (see conversation.py)
 
         Returns:
             AI-generated suggestion as a string
+
+        Raises:
+            AIServiceError: when no suggestion was generated, including
+                MISSING_API_KEY and EMPTY_RESPONSE; suggestion_error_message()
+                explains it to the user. Nothing but real model output is
+                returned, since it is saved to the task's conversation.
         """
         if not self.is_available():
-            return "AI service is currently unavailable. Please configure your Claude API key in settings."
-
-        try:
-            # Prepare the request
-            headers = {
-                'Content-Type': 'application/json',
-                'x-api-key': self.api_key,
-                'anthropic-version': '2023-06-01'
-            }
-
-            # Construct the messages
-            system_prompt = """You are an AI assistant for a task management application. You help users by providing practical, actionable suggestions for their tasks. Your responses should be:
-
-1. Helpful and specific to the task context
-2. Actionable with clear next steps
-3. Professional but friendly in tone
-4. Concise but comprehensive (aim for 2-4 sentences)
-5. Focused on productivity and task completion
-
-When users ask questions about their tasks, provide suggestions that could help them complete the task more effectively, break it down into smaller steps, identify potential challenges, or suggest resources/approaches."""
-
-            user_content = f"""Task: {task_title}
-
-Description: {task_description or "No description provided"}
-
-User Question: {user_message}
-
-Please provide a helpful suggestion for this task."""
-
-            payload = {
-                'model': self.model,
-                'max_tokens': min(300, self.max_tokens),  # Limit for task suggestions
-                'temperature': self.temperature,
-                'system': system_prompt,
-                'messages': [
-                    {
-                        'role': 'user',
-                        'content': user_content
-                    }
-                ]
-            }
-
-            # Make API call to Claude
-            response = requests.post(
-                'https://api.anthropic.com/v1/messages',
-                headers=headers,
-                json=payload,
-                timeout=30
-            )
-
-            if response.status_code == 200:
-                data = response.json()
-                if data.get('content') and len(data['content']) > 0:
-                    return data['content'][0]['text'].strip()
-                else:
-                    logger.error("Claude API returned empty response")
-                    return "I'm sorry, I couldn't generate a suggestion at this time. Please try again."
-            else:
-                error_data = response.json() if response.content else {}
-                error_message = error_data.get('error', {}).get('message', 'Unknown error')
-                logger.error(f"Claude API error {response.status_code}: {error_message}")
-
-                if response.status_code == 401:
-                    return "AI service authentication failed. Please check your API key in settings."
-                elif response.status_code == 429:
-                    return "AI service is temporarily busy. Please try again in a moment."
-                else:
-                    return "AI service encountered an error. Please try again later."
-
-        except requests.exceptions.Timeout:
-            logger.error("Claude API request timeout")
-            return "AI service request timed out. Please try again."
-
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Claude API request error: {str(e)}")
-            return "AI service connection error. Please check your internet connection."
-
-        except Exception as e:
-            logger.error(f"Unexpected error in Claude AI service: {str(e)}")
-            return "An unexpected error occurred. Please try again later."
-    
-    def breakdown_task(self, task_title: str, task_description: str) -> List[Dict[str, str]]:
+            raise AIServiceError("No Claude API key", AIProvider.ANTHROPIC, 'MISSING_API_KEY')
+
+        response = await generate_cached(
+            self._service,
+            suggestion_messages(task_title, task_description, user_message, context),
+            model=self.model,
+            max_tokens=min(300, self.max_tokens),  # Limit for task suggestions
+            temperature=self.temperature,
+            enabled=self.cache_responses,
+        )
+        if not response.content.strip():
+            raise AIServiceError("Claude API returned empty response", AIProvider.ANTHROPIC, 'EMPTY_RESPONSE')
+        return response.content.strip()
+
+    async def stream_task_suggestion(
+        self, task_title: str, task_description: str, user_message: str, context: Optional[ConversationContext] = None
+    ) -> AsyncIterator[str]:
+        """
+        Same as get_task_suggestion, but yields the text as Claude generates
+        it. Raises the same errors, possibly after some text was yielded.
+        """
+        if not self.is_available():
+            raise AIServiceError("No Claude API key", AIProvider.ANTHROPIC, 'MISSING_API_KEY')
+
+        received = False
+        async for chunk in stream_cached(
+            self._service,
+            suggestion_messages(task_title, task_description, user_message, context),
+            model=self.model,
+            max_tokens=min(300, self.max_tokens),
+            temperature=self.temperature,
+            enabled=self.cache_responses,
+        ):
+            if chunk.content:
+                received = received or bool(chunk.content.strip())
+                yield chunk.content
+        if not received:
+            raise AIServiceError("Claude API returned empty response", AIProvider.ANTHROPIC, 'EMPTY_RESPONSE')
+
+    async def breakdown_task(self, task_title: str, task_description: str) -> List[Dict[str, str]]:
         """
         Break down a complex task into smaller subtasks using AI
 
@@ -150,104 +261,80 @@ Please provide a helpful suggestion for this task."""
 
         Returns:
             List of dictionaries with subtask information
+
+        Raises:
+            AIServiceError: one of RETRYABLE_ERRORS
         """
         if not self.is_available():
             return []
 
         try:
-            headers = {
-                'Content-Type': 'application/json',
-                'x-api-key': self.api_key,
-                'anthropic-version': '2023-06-01'
-            }
-
-            system_prompt = """You are an AI assistant that helps break down complex tasks into smaller, manageable subtasks.
-
-Your response must be a valid JSON array containing objects with these exact fields:
-- "title": A clear, concise title for the subtask (max 100 characters)
-- "description": A detailed description of what needs to be done for this subtask
-- "priority": One of: "low", "medium", "high", "urgent"
-
-Guidelines:
-1. Break the task into 3-8 logical subtasks
-2. Each subtask should be specific and actionable
-3. Order subtasks logically (dependencies first)
-4. Make subtasks small enough to complete in a reasonable time
-5. Ensure each subtask contributes to the overall goal
-6. Assign appropriate priorities based on importance and dependencies
+            response = await generate_cached(
+                self._service,
+                breakdown_messages(task_title, task_description),
+                model=self.model,
+                max_tokens=min(1000, self.max_tokens),
+                temperature=0.3,  # Lower temperature for more consistent JSON format
+                enabled=self.cache_responses,
+                # Don't keep replaying a reply that wasn't a usable list
+                cacheable=lambda response: bool(parse_subtasks(response.content.strip())),
+            )
+            return parse_subtasks(response.content.strip())
 
-Return ONLY the JSON array, no other text."""
+        except AIServiceError as e:
+            if e.error_code in RETRYABLE_ERRORS:
+                raise
+            logger.error(f"Claude API error during task breakdown ({e.error_code}): {str(e)}")
+            return []
 
-            user_content = f"""Task to break down:
-Title: {task_title}
-Description: {task_description or "No description provided"}
+        except Exception as e:
+            logger.error(f"Unexpected error in task breakdown: {str(e)}")
+            return []
 
-Please break this task into smaller, manageable subtasks. Return as JSON array only."""
+    async def summarize_conversation(
+        self, task_title: str, summary: str, turns: List[Tuple[str, str]], max_tokens: int
+    ) -> Optional[str]:
+        """
+        The running summary of a task's conversation with `turns` folded in,
+        or None when it could not be generated
 
-            payload = {
-                'model': self.model,
-                'max_tokens': min(1000, self.max_tokens),
-                'temperature': 0.3,  # Lower temperature for more consistent JSON format
-                'system': system_prompt,
-                'messages': [
-                    {
-                        'role': 'user',
-                        'content': user_content
-                    }
-                ]
-            }
+        Raises:
+            AIServiceError: RATE_LIMITED, when our own outbound limit is reached
+        """
+        if not self.is_available():
+            return None
 
-            response = requests.post(
-                'https://api.anthropic.com/v1/messages',
-                headers=headers,
-                json=payload,
-                timeout=30
+        try:
+            response = await generate_cached(
+                self._service,
+                summary_messages(task_title, summary, turns, max_tokens),
+                model=self.model,
+                max_tokens=min(max_tokens, self.max_tokens),
+                temperature=0.3,
+                enabled=self.cache_responses,
             )
+            return response.content.strip() or None
 
-            if response.status_code == 200:
-                data = response.json()
-                if data.get('content') and len(data['content']) > 0:
-                    response_text = data['content'][0]['text'].strip()
-
-                    # Extract JSON from the response
-                    try:
-                        # Try to parse the response as JSON
-                        subtasks = json.loads(response_text)
-
-                        # Validate the structure
-                        if isinstance(subtasks, list):
-                            validated_subtasks = []
-                            for subtask in subtasks:
-                                if isinstance(subtask, dict) and 'title' in subtask and 'description' in subtask:
-                                    # Ensure all required fields exist with defaults
-                                    validated_subtask = {
-                                        'title': str(subtask.get('title', 'Untitled Subtask'))[:100],
-                                        'description': str(subtask.get('description', '')),
-                                        'priority': subtask.get('priority', 'medium') if subtask.get('priority') in ['low', 'medium', 'high', 'urgent'] else 'medium'
-                                    }
-                                    validated_subtasks.append(validated_subtask)
-
-                            return validated_subtasks[:8]  # Limit to 8 subtasks max
-
-                    except json.JSONDecodeError:
-                        logger.error(f"Failed to parse Claude response as JSON: {response_text}")
-                        return []
-            else:
-                logger.error(f"Claude API error {response.status_code} during task breakdown")
-
-            return []
-
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Claude API request error during task breakdown: {str(e)}")
-            return []
+        except AIServiceError as e:
+            if e.error_code == 'RATE_LIMITED':
+                raise
+            logger.error(f"Claude API error during conversation summary ({e.error_code}): {str(e)}")
+            return None
 
         except Exception as e:
-            logger.error(f"Unexpected error in task breakdown: {str(e)}")
-            return []
+            logger.error(f"Unexpected error in conversation summary: {str(e)}")
+            return None
 
 
 def get_claude_service(user=None):
     """
     Factory function to get a Claude service instance for a specific user
     """
-    return ClaudeAIService(user=user)
\ No newline at end of file
+    claude_settings = get_user_settings(user.pk) if user else None
+    return ClaudeAIService(user=user, claude_settings=claude_settings)
+
+
+async def aget_claude_service(user=None):
+    """Async variant of get_claude_service, for async views"""
+    claude_settings = await aget_user_settings(user.pk) if user else None
+    return ClaudeAIService(user=user, claude_settings=claude_settings)
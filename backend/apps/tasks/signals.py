@@ -0,0 +1,93 @@
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .events import TAGS_CHANNEL, publish_event, user_channel
+from .models import Tag, Task, TaskTombstone
+from .stats import invalidate_task_stats
+from .versions import TAGS_VERSION_KEY, bump_version, tasks_version_key
+
+
+def tasks_changed(user_id, event='tasks.changed', task_id=None):
+    """
+    Drop the per-user task caches and notify the user's event streams. Model
+    signals call this for every saved or deleted task; bulk writes that
+    bypass signals must call it themselves.
+    """
+    invalidate_task_caches(user_id)
+    # Again after commit: a reader may have cached stats, or taken the
+    # version set above, from rows the transaction had not committed yet
+    transaction.on_commit(lambda: invalidate_task_caches(user_id))
+    publish_event(user_channel(user_id), event, id=task_id)
+
+
+def invalidate_task_caches(user_id):
+    invalidate_task_stats(user_id)
+    bump_version(tasks_version_key(user_id))
+
+
+def tags_changed():
+    # Tags are shared and embedded in every task representation
+    bump_version(TAGS_VERSION_KEY)
+    transaction.on_commit(lambda: bump_version(TAGS_VERSION_KEY))
+    publish_event(TAGS_CHANNEL, 'tags.changed')
+
+
+@receiver(post_save, sender=Task)
+def task_saved(sender, instance, created, **kwargs):
+    tasks_changed(instance.user_id, 'task.created' if created else 'task.updated', instance.pk)
+
+
+@receiver(post_delete, sender=Task)
+def task_deleted(sender, instance, **kwargs):
+    tasks_changed(instance.user_id, 'task.deleted', instance.pk)
+
+
+@receiver(post_delete, sender=Task)
+def record_task_tombstone(sender, instance, **kwargs):
+    # Sent for cascaded subtasks as well, since the receivers above prevent fast deletes
+    TaskTombstone.objects.create(user_id=instance.user_id, task_id=instance.pk)
+
+
+def touch_tasks(tasks):
+    """
+    Move updated_at of tasks whose tags changed, so delta sync picks them up.
+    Signals don't run: the callers report the change themselves.
+    """
+    tasks.update(updated_at=timezone.now())
+
+
+@receiver(m2m_changed, sender=Task.tags.through)
+def invalidate_task_tags(sender, instance, reverse, action, pk_set, **kwargs):
+    if reverse and action == 'pre_clear':
+        # The rows are gone by post_clear, and pk_set is None for clears
+        instance._cleared_task_ids = list(instance.task_set.values_list('pk', flat=True))
+    if not action.startswith('post_'):
+        return
+    if reverse:
+        task_ids = instance.__dict__.pop('_cleared_task_ids', []) if action == 'post_clear' else pk_set
+        touch_tasks(Task.objects.filter(pk__in=task_ids))
+        # tag.task_set changes can touch any user's tasks
+        tags_changed()
+    else:
+        touch_tasks(Task.objects.filter(pk=instance.pk))
+        tasks_changed(instance.user_id, 'task.updated', instance.pk)
+
+
+@receiver(post_save, sender=Tag)
+def touch_tagged_tasks(sender, instance, created, **kwargs):
+    # Tags are embedded in tasks, so a renamed tag changes them
+    if not created:
+        touch_tasks(Task.objects.filter(tags=instance))
+
+
+@receiver(pre_delete, sender=Tag)
+def touch_untagged_tasks(sender, instance, **kwargs):
+    # The tag's task rows are deleted without an m2m_changed signal
+    touch_tasks(Task.objects.filter(tags=instance))
+
+
+@receiver([post_save, post_delete], sender=Tag)
+def invalidate_tag_caches(sender, instance, **kwargs):
+    tags_changed()
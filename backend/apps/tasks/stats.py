@@ -0,0 +1,52 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from .models import Task
+
+DUE_SOON_WINDOW = timedelta(days=7)
+
+
+def stats_cache_key(user_id):
+    return f'tasks:stats:{user_id}'
+
+
+def invalidate_task_stats(user_id):
+    cache.delete(stats_cache_key(user_id))
+
+
+def compute_task_stats(user):
+    """Dashboard counts for a user's tasks from a single conditional-aggregate query"""
+    now = timezone.now()
+    is_open = Q(status__in=Task.OPEN_STATUSES)
+
+    aggregates = {'total': Count('id')}
+    for value, _ in Task.STATUS_CHOICES:
+        aggregates[f'status_{value}'] = Count('id', filter=Q(status=value))
+    for value, _ in Task.PRIORITY_CHOICES:
+        aggregates[f'priority_{value}'] = Count('id', filter=Q(priority=value))
+    aggregates['overdue'] = Count('id', filter=is_open & Q(due_date__lt=now))
+    aggregates['due_soon'] = Count('id', filter=is_open & Q(due_date__gte=now, due_date__lt=now + DUE_SOON_WINDOW))
+
+    counts = Task.objects.filter(user=user).aggregate(**aggregates)
+    return {
+        'total': counts['total'],
+        'by_status': {value: counts[f'status_{value}'] for value, _ in Task.STATUS_CHOICES},
+        'by_priority': {value: counts[f'priority_{value}'] for value, _ in Task.PRIORITY_CHOICES},
+        'overdue': counts['overdue'],
+        'due_soon': counts['due_soon'],
+    }
+
+
+def get_task_stats(user):
+    """
+    Cached dashboard counts. Task signals invalidate the entry on every
+    change; the timeout only bounds how stale time-based counts (overdue,
+    due soon) can get.
+    """
+    return cache.get_or_set(
+        stats_cache_key(user.pk), lambda: compute_task_stats(user), settings.TASK_STATS_CACHE_TIMEOUT
+    )
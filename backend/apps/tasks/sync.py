@@ -0,0 +1,37 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.utils import timezone
+
+# Cursors point slightly into the past, so rows written by transactions that
+# commit after a sync started are not skipped; clients treat changes as upserts
+CURSOR_OVERLAP = timedelta(seconds=5)
+
+
+def encode_cursor(moment):
+    """Opaque, URL-safe cursor: microseconds since the epoch"""
+    return str(int(moment.timestamp()) * 10**6 + moment.microsecond)
+
+
+def decode_cursor(cursor):
+    """Datetime for a cursor, or None when it is malformed"""
+    try:
+        value = int(cursor)
+    except (TypeError, ValueError):
+        return None
+    if value < 0:
+        return None
+    seconds, microseconds = divmod(value, 10**6)
+    try:
+        return datetime.fromtimestamp(seconds, tz=dt_timezone.utc).replace(microsecond=microseconds)
+    except (OverflowError, OSError, ValueError):
+        return None
+
+
+def next_cursor():
+    return encode_cursor(timezone.now() - CURSOR_OVERLAP)
+
+
+def tombstone_cutoff():
+    """Tombstones older than this have been pruned"""
+    return timezone.now() - timedelta(days=settings.TASK_TOMBSTONE_RETENTION_DAYS)
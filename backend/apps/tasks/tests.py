@@ -1,8 +1,34 @@
-from django.test import TestCase
+from datetime import datetime, timedelta, timezone as dt_timezone
+from io import StringIO
+import asyncio
+import importlib
+import time
+from unittest import mock
+import json
+
+from asgiref.sync import async_to_sync
+from django.apps import apps
+from django.core.cache import cache, caches
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.http import http_date
 from django.contrib.auth.models import User
 from rest_framework.test import APITestCase
 from rest_framework import status
-from .models import Task, Tag
+from apps.ai_assistant.services.base import AIProvider, AIResponse, AIServiceError
+from taskmanager import pubsub
+from taskmanager.single_flight import single_flight
+from .conversation import aconversation_context
+from .events import user_channel
+from .jobs import claim_job, enqueue_job, requeue_stale_jobs, work
+from .models import AIAssistantInteraction, AIJob, Task, Tag, TaskConversationSummary, TaskTombstone
+from .services import ClaudeAIService
+from .stats import stats_cache_key
+from .sync import decode_cursor, encode_cursor
+from .versions import get_version, tasks_version_key
 
 
 class TaskModelTest(TestCase):
@@ -41,4 +67,1207 @@ class TaskAPITest(APITestCase):
     def test_get_tasks_authorized(self):
         self.client.force_authenticate(user=self.user)
         response = self.client.get('/api/tasks/')
-        self.assertEqual(response.status_code, status.HTTP_200_OK)
\ No newline at end of file
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_nesting_too_deeply_is_rejected(self):
+        self.client.force_authenticate(user=self.user)
+        child = Task.objects.create(title='Child', user=self.user, parent_task=self.task)
+        with mock.patch('apps.tasks.models.PATH_MAX_LENGTH', len(self.task.subtree_prefix)):
+            response = self.client.post('/api/tasks/', {'title': 'Too deep', 'parent_task': child.pk}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('parent_task', response.data)
+
+class TaskHierarchyTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            password='testpass123'
+        )
+        self.root = Task.objects.create(title='Root', user=self.user)
+        self.child = Task.objects.create(title='Child', user=self.user, parent_task=self.root)
+        self.grandchild = Task.objects.create(title='Grandchild', user=self.user, parent_task=self.child)
+
+    def test_path_and_depth_on_create(self):
+        self.assertEqual(self.root.path, '')
+        self.assertEqual(self.grandchild.path, f'{self.root.pk}/{self.child.pk}/')
+        self.assertEqual(self.grandchild.hierarchy_level, 2)
+
+    def test_lookups_are_single_queries(self):
+        grandchild = Task.objects.get(pk=self.grandchild.pk)
+        with self.assertNumQueries(1):
+            self.assertEqual(grandchild.get_root_task(), self.root)
+        with self.assertNumQueries(1):
+            self.assertEqual(set(self.root.get_all_subtasks()), {self.child, self.grandchild})
+
+    def test_move_subtree(self):
+        other = Task.objects.create(title='Other', user=self.user)
+        self.child.move_to(other)
+        self.grandchild.refresh_from_db()
+        self.assertEqual(self.grandchild.path, f'{other.pk}/{self.child.pk}/')
+        self.assertEqual(self.grandchild.depth, 2)
+        self.assertEqual(self.root.get_all_subtasks(), [])
+
+    def test_move_to_root(self):
+        self.child.move_to(None)
+        self.grandchild.refresh_from_db()
+        self.assertEqual(self.grandchild.path, f'{self.child.pk}/')
+        self.assertEqual(self.grandchild.depth, 1)
+
+    def test_deferred_parent_is_not_loaded(self):
+        with self.assertNumQueries(1):
+            Task.objects.only('id').get(pk=self.child.pk)
+
+    def test_move_with_deferred_parent(self):
+        other = Task.objects.create(title='Other', user=self.user)
+        child = Task.objects.defer('parent_task').get(pk=self.child.pk)
+        child.parent_task = other
+        child.save()
+        self.grandchild.refresh_from_db()
+        self.assertEqual(self.grandchild.path, f'{other.pk}/{self.child.pk}/')
+
+    def test_cannot_move_under_own_subtree(self):
+        with self.assertRaises(ValueError):
+            self.root.move_to(self.grandchild)
+
+    def test_nesting_is_bounded_by_path_length(self):
+        other = Task.objects.create(title='Other', user=self.user)
+        deep = Task.objects.create(title='Deep', user=self.user, parent_task=other)
+        with mock.patch('apps.tasks.models.PATH_MAX_LENGTH', len(deep.subtree_prefix)):
+            leaf = Task.objects.create(title='Leaf', user=self.user, parent_task=deep)
+            with self.assertRaises(ValueError):
+                Task.objects.create(title='Too deep', user=self.user, parent_task=leaf)
+            # The child fits, its own subtask would not
+            self.assertFalse(self.child.fits_under(deep))
+            with self.assertRaises(ValueError):
+                self.child.move_to(deep)
+            self.assertTrue(self.grandchild.fits_under(deep))
+
+
+class TaskTreeAPITest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            password='testpass123'
+        )
+        self.client.force_authenticate(user=self.user)
+        self.root = Task.objects.create(title='Root', user=self.user)
+        self.child = Task.objects.create(title='Child', user=self.user, parent_task=self.root)
+        self.grandchild = Task.objects.create(title='Grandchild', user=self.user, parent_task=self.child)
+        for i in range(5):
+            Task.objects.create(title=f'Leaf {i}', user=self.user, parent_task=self.grandchild)
+
+    def test_full_tree(self):
+        response = self.client.get('/api/tasks/tree/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([node['title'] for node in response.data], ['Root'])
+        grandchild = response.data[0]['subtasks'][0]['subtasks'][0]
+        self.assertEqual(len(grandchild['subtasks']), 5)
+        self.assertEqual(grandchild['parent_task_title'], 'Child')
+
+    def test_query_count_does_not_grow_with_tree(self):
+        # One query for the tasks and one for their tags, whatever the tree size
+        with self.assertNumQueries(2):
+            self.client.get('/api/tasks/tree/')
+
+    def test_depth_limits_nesting(self):
+        response = self.client.get('/api/tasks/tree/?depth=1')
+        child = response.data[0]['subtasks'][0]
+        self.assertEqual(child['subtasks'], [])
+        self.assertTrue(child['has_children'])
+
+    def test_lazy_expansion_of_a_node(self):
+        response = self.client.get(f'/api/tasks/tree/?root={self.child.pk}&depth=0')
+        self.assertEqual([node['title'] for node in response.data], ['Grandchild'])
+        self.assertEqual(response.data[0]['subtasks'], [])
+        self.assertTrue(response.data[0]['has_children'])
+
+    def test_invalid_depth(self):
+        response = self.client.get('/api/tasks/tree/?depth=abc')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_invalid_root(self):
+        response = self.client.get('/api/tasks/tree/?root=abc')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ExplainTaskQueriesCommandTest(TransactionTestCase):
+    def test_plans_use_task_indexes(self):
+        out = StringIO()
+        call_command('explain_task_queries', tasks=200, users=2, stdout=out)
+        output = out.getvalue()
+        self.assertIn('WITHOUT Task indexes', output)
+        self.assertIn('task_user_created_idx', output.split('WITH Task indexes')[1])
+        self.assertFalse(Task.objects.exists())
+
+
+class TaskPaginationTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            password='testpass123'
+        )
+        self.client.force_authenticate(user=self.user)
+        for i in range(5):
+            Task.objects.create(title=f'Task {i}', user=self.user)
+
+    def test_page_numbers_still_supported(self):
+        response = self.client.get('/api/tasks/?page_size=2&page=2')
+        self.assertEqual(response.data['count'], 5)
+        self.assertEqual(len(response.data['results']), 2)
+
+    def test_cursor_mode_walks_all_tasks_without_count(self):
+        titles = []
+        url = '/api/tasks/?pagination=cursor&page_size=2'
+        while url:
+            response = self.client.get(url)
+            self.assertNotIn('count', response.data)
+            titles.extend(task['title'] for task in response.data['results'])
+            url = response.data['next']
+        self.assertEqual(titles, [f'Task {i}' for i in reversed(range(5))])
+
+    def test_cursor_mode_ignores_ordering(self):
+        # Tasks without a due date would fall out of a cursor on due_date
+        Task.objects.filter(title__in=['Task 1', 'Task 3']).update(due_date=timezone.now())
+        titles = []
+        url = '/api/tasks/?pagination=cursor&ordering=-due_date&page_size=2'
+        while url:
+            response = self.client.get(url)
+            titles.extend(task['title'] for task in response.data['results'])
+            url = response.data['next']
+        self.assertEqual(titles, [f'Task {i}' for i in reversed(range(5))])
+
+
+class TaskFilterTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            password='testpass123'
+        )
+        self.client.force_authenticate(user=self.user)
+        self.tag = Tag.objects.create(name='backend')
+        self.parent = Task.objects.create(
+            title='Write API docs', description='Document the endpoints', user=self.user,
+            status='in_progress', priority='high'
+        )
+        self.child = Task.objects.create(
+            title='Deploy', notes='needs the release checklist', user=self.user,
+            parent_task=self.parent, due_date=timezone.make_aware(datetime(2025, 1, 10))
+        )
+        self.child.tags.add(self.tag)
+
+    def titles(self, query):
+        response = self.client.get(f'/api/tasks/?{query}')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return {task['title'] for task in response.data['results']}
+
+    def test_choice_filters(self):
+        self.assertEqual(self.titles('status=in_progress'), {'Write API docs'})
+        self.assertEqual(self.titles('priority=medium,low'), {'Deploy'})
+
+    def test_invalid_choice(self):
+        response = self.client.get('/api/tasks/?status=done')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_tag_parent_and_due_filters(self):
+        self.assertEqual(self.titles(f'tag={self.tag.pk}'), {'Deploy'})
+        self.assertEqual(self.titles('parent=none'), {'Write API docs'})
+        self.assertEqual(self.titles(f'parent={self.parent.pk}'), {'Deploy'})
+        self.assertEqual(self.titles('due_after=2025-01-10&due_before=2025-01-10'), {'Deploy'})
+        self.assertEqual(self.titles('due_before=2025-01-09'), set())
+
+    def test_search_covers_description_and_notes(self):
+        self.assertEqual(self.titles('search=endpoints'), {'Write API docs'})
+        self.assertEqual(self.titles('search=release checklist'), {'Deploy'})
+
+    def test_ordering(self):
+        response = self.client.get('/api/tasks/?ordering=title')
+        self.assertEqual([task['title'] for task in response.data['results']], ['Deploy', 'Write API docs'])
+
+    def test_by_status_is_paginated(self):
+        response = self.client.get('/api/tasks/by_status/?status=todo')
+        self.assertEqual([task['title'] for task in response.data['results']], ['Deploy'])
+
+
+class TaskStatsAPITest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            password='testpass123'
+        )
+        self.client.force_authenticate(user=self.user)
+        yesterday = timezone.now() - timedelta(days=1)
+        Task.objects.create(title='Late', user=self.user, priority='urgent', due_date=yesterday)
+        Task.objects.create(title='Done late', user=self.user, status='completed', due_date=yesterday)
+        Task.objects.create(title='Soon', user=self.user, due_date=timezone.now() + timedelta(days=2))
+        cache.clear()
+
+    def test_counts(self):
+        response = self.client.get('/api/tasks/stats/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['total'], 3)
+        self.assertEqual(response.data['by_status']['completed'], 1)
+        self.assertEqual(response.data['by_priority']['urgent'], 1)
+        self.assertEqual(response.data['overdue'], 1)
+        self.assertEqual(response.data['due_soon'], 1)
+
+    def test_cached_until_tasks_change(self):
+        self.client.get('/api/tasks/stats/')
+        with self.assertNumQueries(0):
+            self.client.get('/api/tasks/stats/')
+
+        Task.objects.create(title='New', user=self.user)
+        response = self.client.get('/api/tasks/stats/')
+        self.assertEqual(response.data['total'], 4)
+
+        Task.objects.get(title='New').delete()
+        response = self.client.get('/api/tasks/stats/')
+        self.assertEqual(response.data['total'], 3)
+
+    def test_invalidated_again_on_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Task.objects.create(title='New', user=self.user)
+            # A concurrent reader caching counts before the commit...
+            self.client.get('/api/tasks/stats/')
+            version = get_version(tasks_version_key(self.user.pk))
+        # ...does not keep them, nor the version, past it
+        self.assertIsNone(cache.get(stats_cache_key(self.user.pk)))
+        self.assertNotEqual(get_version(tasks_version_key(self.user.pk)), version)
+
+
+class TaskSparseFieldsTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            password='testpass123'
+        )
+        self.client.force_authenticate(user=self.user)
+        self.task = Task.objects.create(
+            title='Write report', description='Quarterly numbers', notes='x' * 1000, user=self.user
+        )
+
+    def task_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        return response, [q['sql'] for q in queries if 'FROM "tasks_task"' in q['sql']]
+
+    def test_list_is_compact_and_skips_text_columns(self):
+        response, sql = self.task_queries('/api/tasks/')
+        task = response.data['results'][0]
+        self.assertEqual(task['title'], 'Write report')
+        for name in ('description', 'notes', 'subtasks'):
+            self.assertNotIn(name, task)
+        self.assertNotIn('"tasks_task"."notes"', sql[-1])
+
+    def test_fields_selects_from_full_representation(self):
+        response, sql = self.task_queries('/api/tasks/?fields=title,description')
+        self.assertEqual(response.data['results'][0], {
+            'id': self.task.pk, 'title': 'Write report', 'description': 'Quarterly numbers'
+        })
+        self.assertIn('"tasks_task"."description"', sql[-1])
+        self.assertNotIn('"tasks_task"."notes"', sql[-1])
+
+    def test_omit_on_detail(self):
+        response = self.client.get(f'/api/tasks/{self.task.pk}/?omit=notes,subtasks')
+        self.assertNotIn('notes', response.data)
+        self.assertNotIn('subtasks', response.data)
+        self.assertEqual(response.data['description'], 'Quarterly numbers')
+
+
+class TaskConditionalGetTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='testuser',
+            password='testpass123'
+        )
+        self.client.force_authenticate(user=self.user)
+        self.tag = Tag.objects.create(name='ops')
+        self.task = Task.objects.create(title='Rotate keys', user=self.user)
+        self.task.tags.add(self.tag)
+
+    def test_unchanged_list_is_not_modified_without_queries(self):
+        response = self.client.get('/api/tasks/')
+        etag = response['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/tasks/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_etag_changes_with_tasks_tags_and_query(self):
+        etag = self.client.get('/api/tasks/')['ETag']
+        self.assertNotEqual(self.client.get('/api/tasks/?status=todo')['ETag'], etag)
+
+        Task.objects.create(title='Renew certificates', user=self.user)
+        response = self.client.get('/api/tasks/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        etag = response['ETag']
+        self.tag.name = 'operations'
+        self.tag.save()
+        response = self.client.get('/api/tasks/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results'][-1]['tags'][0]['name'], 'operations')
+
+    def test_other_users_changes_keep_etag(self):
+        etag = self.client.get(f'/api/tasks/{self.task.pk}/')['ETag']
+        stranger = User.objects.create_user(username='stranger', password='testpass123')
+        Task.objects.create(title='Unrelated', user=stranger)
+        response = self.client.get(f'/api/tasks/{self.task.pk}/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_detail_last_modified(self):
+        response = self.client.get(f'/api/tasks/{self.task.pk}/')
+        self.assertEqual(response['Last-Modified'], http_date(self.task.updated_at.timestamp()))
+        self.assertIn('no-cache', response['Cache-Control'])
+
+
+class TaskChangesAPITest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            password='testpass123'
+        )
+        self.client.force_authenticate(user=self.user)
+        self.parent = Task.objects.create(title='Parent', user=self.user)
+        self.child = Task.objects.create(title='Child', user=self.user, parent_task=self.parent)
+        self.other = Task.objects.create(title='Other', user=self.user)
+
+    def sync_from(self, moment):
+        return self.client.get(f'/api/tasks/changes/?since={encode_cursor(moment)}')
+
+    def test_initial_sync_returns_everything(self):
+        response = self.client.get('/api/tasks/changes/')
+        self.assertEqual(len(response.data['changed']), 3)
+        self.assertEqual(response.data['deleted'], [])
+        self.assertIsNotNone(decode_cursor(response.data['cursor']))
+
+    def test_only_changes_since_cursor(self):
+        since = timezone.now()
+        self.other.title = 'Renamed'
+        self.other.save()
+        deleted_ids = [self.parent.pk, self.child.pk]
+        self.parent.delete()
+
+        response = self.sync_from(since)
+        self.assertFalse(response.data['full_sync_required'])
+        self.assertEqual([task['title'] for task in response.data['changed']], ['Renamed'])
+        self.assertEqual(sorted(response.data['deleted']), sorted(deleted_ids))
+
+    def test_other_users_deletions_are_not_reported(self):
+        since = timezone.now()
+        stranger = User.objects.create_user(username='stranger', password='testpass123')
+        Task.objects.create(title='Foreign', user=stranger).delete()
+        response = self.sync_from(since)
+        self.assertEqual(response.data['deleted'], [])
+
+    def test_expired_cursor_requires_full_sync(self):
+        response = self.sync_from(timezone.now() - timedelta(days=365))
+        self.assertTrue(response.data['full_sync_required'])
+        self.assertNotIn('changed', response.data)
+
+    def test_initial_sync_of_too_many_tasks_requires_full_sync(self):
+        with mock.patch('apps.tasks.views.TaskViewSet.changes_max_items', 2):
+            response = self.client.get('/api/tasks/changes/')
+        self.assertTrue(response.data['full_sync_required'])
+        self.assertNotIn('changed', response.data)
+
+    def test_tag_changes_are_reported(self):
+        tag = Tag.objects.create(name='backend')
+        since = timezone.now()
+        self.other.tags.add(tag)
+        self.assertEqual([task['title'] for task in self.sync_from(since).data['changed']], ['Other'])
+
+        since = timezone.now()
+        tag.name = 'api'
+        tag.save()
+        self.assertEqual([task['title'] for task in self.sync_from(since).data['changed']], ['Other'])
+
+        since = timezone.now()
+        tag.task_set.add(self.child)
+        tag.task_set.clear()
+        changed = [task['title'] for task in self.sync_from(since).data['changed']]
+        self.assertEqual(sorted(changed), ['Child', 'Other'])
+
+        self.parent.tags.add(tag)
+        since = timezone.now()
+        tag.delete()
+        self.assertEqual([task['title'] for task in self.sync_from(since).data['changed']], ['Parent'])
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/api/tasks/changes/?since=yesterday')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_prune_tombstones(self):
+        self.other.delete()
+        TaskTombstone.objects.update(deleted_at=timezone.now() - timedelta(days=60))
+        call_command('prune_task_tombstones', stdout=StringIO())
+        self.assertFalse(TaskTombstone.objects.exists())
+
+
+@override_settings(TASK_EVENTS_HEARTBEAT=0.05, TASK_EVENTS_STREAM_LIFETIME=0.2)
+class TaskEventsAPITest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            password='testpass123'
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def read_stream(self, response):
+        return ''.join(chunk.decode() for chunk in response.streaming_content)
+
+    def test_stream_receives_own_task_changes_after_commit(self):
+        response = self.client.get('/api/tasks/events/', HTTP_ACCEPT='text/event-stream')
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        stranger = User.objects.create_user(username='stranger', password='testpass123')
+        with self.captureOnCommitCallbacks(execute=True):
+            task = Task.objects.create(title='Mine', user=self.user)
+            Task.objects.create(title='Theirs', user=stranger)
+        Tag.objects.create(name='never-committed')
+
+        body = self.read_stream(response)
+        self.assertIn(f'event: task.created\ndata: {{"event": "task.created", "id": {task.pk}}}', body)
+        self.assertEqual(body.count('event: '), 1)
+        self.assertIn(': keep-alive', body)
+
+    def test_tag_changes_reach_every_stream(self):
+        response = self.client.get('/api/tasks/events/')
+        with self.captureOnCommitCallbacks(execute=True):
+            Tag.objects.create(name='shared')
+        self.assertIn('event: tags.changed', self.read_stream(response))
+
+    async def test_asgi_stream_waits_without_a_thread(self):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get('/api/tasks/events/', HTTP_ACCEPT='text/event-stream')
+        channel = user_channel(self.user.pk)
+        subscription, = pubsub.get_broker()._queues[channel]
+        self.assertIsInstance(subscription, pubsub.AsyncInMemorySubscription)
+
+        with mock.patch('asgiref.sync.SyncToAsync.__call__') as sync_to_async_call:
+            pubsub.publish(channel, {'event': 'task.created', 'id': 1})
+            body = ''.join([chunk.decode() async for chunk in response.streaming_content])
+        sync_to_async_call.assert_not_called()
+        self.assertIn('event: task.created', body)
+        # Unsubscribed once the stream ended
+        self.assertFalse(pubsub.get_broker()._queues[channel])
+
+    def test_requires_authentication(self):
+        self.client.force_authenticate(user=None)
+        response = self.client.get('/api/tasks/events/', HTTP_ACCEPT='text/event-stream')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertTrue(response.content.startswith(b'event: error'))
+
+
+class TaskBulkAPITest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            password='testpass123'
+        )
+        self.client.force_authenticate(user=self.user)
+        self.tag = Tag.objects.create(name='import')
+        self.parent = Task.objects.create(title='Parent', user=self.user)
+
+    def test_bulk_create_with_tags(self):
+        payload = [
+            {'title': f'Imported {i}', 'parent_task': self.parent.pk, 'tag_ids': [self.tag.pk]}
+            for i in range(20)
+        ]
+        with self.assertNumQueries(7):
+            # parent lookup, tag check, savepoint x2, task insert, tag insert, response tag prefetch
+            response = self.client.post('/api/tasks/bulk/', payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(response.data), 20)
+        task = Task.objects.get(title='Imported 3')
+        self.assertEqual(task.path, f'{self.parent.pk}/')
+        self.assertEqual(list(task.tags.all()), [self.tag])
+
+    def test_bulk_create_reports_errors_per_item(self):
+        payload = [{'title': 'Fine'}, {'title': ''}, {'title': 'Bad tag', 'tag_ids': [999]}]
+        response = self.client.post('/api/tasks/bulk/', payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertNotIn(0, response.data)
+        self.assertIn('title', response.data[1])
+        self.assertFalse(Task.objects.filter(title='Fine').exists())
+
+        response = self.client.post('/api/tasks/bulk/', [payload[0], payload[2]], format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertNotIn(0, response.data)
+        self.assertIn('tag_ids', response.data[1])
+
+    def test_bulk_update(self):
+        other = Task.objects.create(title='Other', user=self.user)
+        payload = [
+            {'id': self.parent.pk, 'status': 'completed'},
+            {'id': other.pk, 'priority': 'urgent', 'tag_ids': [self.tag.pk]},
+        ]
+        response = self.client.patch('/api/tasks/bulk/', payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.parent.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual(self.parent.status, 'completed')
+        self.assertEqual(other.priority, 'urgent')
+        self.assertEqual(list(other.tags.all()), [self.tag])
+
+    def test_bulk_update_rejects_other_users_tasks(self):
+        stranger = User.objects.create_user(username='stranger', password='testpass123')
+        foreign = Task.objects.create(title='Foreign', user=stranger)
+        response = self.client.patch('/api/tasks/bulk/', [{'id': foreign.pk, 'title': 'Mine'}], format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('id', response.data[0])
+
+    def test_bulk_update_requires_integer_ids(self):
+        for payload in ([{'id': [self.parent.pk]}], [{'title': 'No id'}], ['not a task']):
+            response = self.client.patch('/api/tasks/bulk/', payload, format='json')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_bulk_move_of_a_task_and_its_ancestor_is_rejected(self):
+        child = Task.objects.create(title='Child', user=self.user, parent_task=self.parent)
+        other = Task.objects.create(title='Other', user=self.user)
+        target = Task.objects.create(title='Target', user=self.user)
+        payload = [
+            {'id': self.parent.pk, 'parent_task': other.pk},
+            {'id': child.pk, 'parent_task': target.pk},
+        ]
+        response = self.client.patch('/api/tasks/bulk/', payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('parent_task', response.data[1])
+
+        # A cycle made of moves that are each valid on their own
+        payload = [
+            {'id': self.parent.pk, 'parent_task': other.pk},
+            {'id': other.pk, 'parent_task': child.pk},
+        ]
+        response = self.client.patch('/api/tasks/bulk/', payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.parent.refresh_from_db()
+        self.assertIsNone(self.parent.parent_task_id)
+
+    def test_bulk_move_of_unrelated_tasks(self):
+        child = Task.objects.create(title='Child', user=self.user, parent_task=self.parent)
+        other = Task.objects.create(title='Other', user=self.user)
+        response = self.client.patch('/api/tasks/bulk/', [
+            {'id': child.pk, 'parent_task': other.pk},
+            {'id': self.parent.pk, 'parent_task': None},
+        ], format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        child.refresh_from_db()
+        self.assertEqual(child.path, f'{other.pk}/')
+
+    def test_bulk_delete(self):
+        Task.objects.create(title='Child', user=self.user, parent_task=self.parent)
+        kept = Task.objects.create(title='Kept', user=self.user)
+        response = self.client.delete('/api/tasks/bulk/', {'ids': [self.parent.pk]}, format='json')
+        self.assertEqual(response.data, {'deleted': 2})
+        self.assertEqual(list(Task.objects.all()), [kept])
+
+    def test_bulk_delete_rejects_non_integer_ids(self):
+        for ids in ([True], [str(self.parent.pk)], self.parent.pk):
+            response = self.client.delete('/api/tasks/bulk/', {'ids': ids}, format='json')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertTrue(Task.objects.filter(pk=self.parent.pk).exists())
+
+
+class TaskBreakdownAPITest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            password='testpass123'
+        )
+        self.client.force_authenticate(user=self.user)
+        self.task = Task.objects.create(title='Launch', user=self.user)
+        cache.clear()
+        self.service = mock.AsyncMock()
+        self.service.breakdown_task.return_value = [
+            {'title': f'Step {i}', 'description': '', 'priority': 'medium'} for i in range(4)
+        ]
+        patcher = mock.patch('apps.tasks.async_views.aget_claude_service', return_value=self.service)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_subtasks_are_created_in_one_insert(self):
+        response = self.client.post(f'/api/tasks/{self.task.pk}/breakdown/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.json()['subtasks']), 4)
+        subtasks = Task.objects.filter(parent_task=self.task)
+        self.assertEqual(subtasks.count(), 4)
+        self.assertTrue(all(subtask.path == f'{self.task.pk}/' and subtask.depth == 1 for subtask in subtasks))
+
+    def test_concurrent_breakdown_conflicts(self):
+        async def breakdown_elsewhere(**kwargs):
+            # Another request finishes its breakdown while the AI call is running
+            await Task.objects.acreate(title='Step from elsewhere', user=self.user, parent_task=self.task)
+            return self.service.breakdown_task.return_value
+
+        self.service.breakdown_task.side_effect = breakdown_elsewhere
+        response = self.client.post(f'/api/tasks/{self.task.pk}/breakdown/')
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(Task.objects.filter(parent_task=self.task).count(), 1)
+
+    def test_retry_gets_the_same_breakdown(self):
+        first = self.client.post(f'/api/tasks/{self.task.pk}/breakdown/')
+        retry = self.client.post(f'/api/tasks/{self.task.pk}/breakdown/')
+        self.assertEqual(retry.status_code, status.HTTP_200_OK)
+        self.assertEqual(retry.json(), first.json())
+        self.assertEqual(self.service.breakdown_task.await_count, 1)
+        self.assertEqual(Task.objects.filter(parent_task=self.task).count(), 4)
+
+    def test_provider_outage(self):
+        self.service.breakdown_task.side_effect = AIServiceError(
+            'Service unavailable', AIProvider.ANTHROPIC, 'SERVER_ERROR', retry_after=20
+        )
+        response = self.client.post(f'/api/tasks/{self.task.pk}/breakdown/')
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(response['Retry-After'], '20')
+
+    def test_too_deeply_nested(self):
+        with mock.patch('apps.tasks.models.PATH_MAX_LENGTH', len(self.task.path)):
+            response = self.client.post(f'/api/tasks/{self.task.pk}/breakdown/')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.service.breakdown_task.assert_not_called()
+
+    def test_breakdown_again_after_deleting_subtasks(self):
+        self.client.post(f'/api/tasks/{self.task.pk}/breakdown/')
+        Task.objects.filter(parent_task=self.task).delete()
+
+        response = self.client.post(f'/api/tasks/{self.task.pk}/breakdown/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.service.breakdown_task.await_count, 2)
+        created = {subtask['id'] for subtask in response.json()['subtasks']}
+        self.assertEqual(set(Task.objects.filter(parent_task=self.task).values_list('pk', flat=True)), created)
+
+    def test_other_users_task_is_not_found(self):
+        stranger = User.objects.create_user(username='stranger', password='testpass123')
+        foreign = Task.objects.create(title='Foreign', user=stranger)
+        response = self.client.post(f'/api/tasks/{foreign.pk}/breakdown/')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_requires_authentication(self):
+        self.client.force_authenticate(user=None)
+        response = self.client.post(f'/api/tasks/{self.task.pk}/breakdown/')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class TaskAISuggestAPITest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            password='testpass123'
+        )
+        self.client.force_authenticate(user=self.user)
+        self.task = Task.objects.create(title='Launch', user=self.user)
+        cache.clear()
+        self.service = mock.AsyncMock()
+        self.service.get_task_suggestion.return_value = 'Start with a checklist.'
+        patcher = mock.patch('apps.tasks.async_views.aget_claude_service', return_value=self.service)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_suggestion_is_saved(self):
+        response = self.client.post(f'/api/tasks/{self.task.pk}/ai_suggest/', {'message': 'Where do I start?'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['ai_response'], 'Start with a checklist.')
+        interaction = AIAssistantInteraction.objects.get(pk=response.json()['interaction_id'])
+        self.assertEqual(interaction.ai_response, 'Start with a checklist.')
+        # The conversation is not copied into the user's notes
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.notes, '')
+
+    def test_duplicate_suggestions_share_one_call(self):
+        url = f'/api/tasks/{self.task.pk}/ai_suggest/'
+        first = self.client.post(url, {'message': 'Where do I start?'}, format='json')
+        duplicate = self.client.post(url, {'message': 'Where do I start?'}, format='json')
+        self.assertEqual(duplicate.json(), first.json())
+        self.assertEqual(AIAssistantInteraction.objects.count(), 1)
+
+        self.client.post(url, {'message': 'What comes next?'}, format='json')
+        self.assertEqual(self.service.get_task_suggestion.await_count, 2)
+
+    def test_message_is_required(self):
+        response = self.client.post(f'/api/tasks/{self.task.pk}/ai_suggest/', {'message': ' '}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.service.get_task_suggestion.assert_not_called()
+
+    def test_malformed_body(self):
+        url = f'/api/tasks/{self.task.pk}/ai_suggest/'
+        for data in (['Where do I start?'], {'message': 1}, {'message': ['Where do I start?']}):
+            response = self.client.post(url, data, format='json')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.service.get_task_suggestion.assert_not_called()
+
+    def read_events(self, response):
+        async def read():
+            return b''.join([chunk async for chunk in response.streaming_content])
+        blocks = async_to_sync(read)().decode().strip().split('\n\n')
+        return [
+            (event[len('event: '):], json.loads(data[len('data: '):]))
+            for event, data in (block.split('\n') for block in blocks)
+        ]
+
+    def test_streamed_suggestion_is_saved_at_the_end(self):
+        async def stream_task_suggestion(**kwargs):
+            yield 'Start with '
+            yield 'a checklist.'
+
+        self.service.stream_task_suggestion = mock.Mock(side_effect=stream_task_suggestion)
+        response = self.client.post(f'/api/tasks/{self.task.pk}/ai_suggest/', {
+            'message': 'Where do I start?', 'stream': True
+        }, format='json')
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        # Nothing is saved until the stream has been consumed
+        self.assertFalse(AIAssistantInteraction.objects.exists())
+
+        events = self.read_events(response)
+        interaction = AIAssistantInteraction.objects.get()
+        self.assertEqual(events, [
+            ('chunk', {'content': 'Start with '}),
+            ('chunk', {'content': 'a checklist.'}),
+            ('done', {'ai_response': 'Start with a checklist.', 'interaction_id': interaction.pk}),
+        ])
+        self.assertEqual(interaction.ai_response, 'Start with a checklist.')
+
+    def test_provider_outage_is_not_saved(self):
+        self.service.get_task_suggestion.side_effect = AIServiceError(
+            'Circuit open', AIProvider.ANTHROPIC, 'CIRCUIT_OPEN', retry_after=30
+        )
+        response = self.client.post(f'/api/tasks/{self.task.pk}/ai_suggest/', {'message': 'Where do I start?'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(response['Retry-After'], '30')
+        self.assertFalse(AIAssistantInteraction.objects.exists())
+
+    def test_streamed_outage_is_not_saved(self):
+        async def stream_task_suggestion(**kwargs):
+            yield 'Start with '
+            raise AIServiceError('Service unavailable', AIProvider.ANTHROPIC, 'SERVER_ERROR')
+
+        self.service.stream_task_suggestion = mock.Mock(side_effect=stream_task_suggestion)
+        response = self.client.post(f'/api/tasks/{self.task.pk}/ai_suggest/', {
+            'message': 'Where do I start?', 'stream': True
+        }, format='json')
+        with self.assertLogs('apps.tasks.services', 'ERROR'):
+            events = self.read_events(response)
+        self.assertEqual([event for event, data in events], ['chunk', 'error'])
+        self.assertFalse(AIAssistantInteraction.objects.exists())
+
+    def test_failures_are_not_saved(self):
+        url = f'/api/tasks/{self.task.pk}/ai_suggest/'
+        for code, expected in (('MISSING_API_KEY', 400), ('AUTHENTICATION_ERROR', 400), ('EMPTY_RESPONSE', 502)):
+            self.service.get_task_suggestion.side_effect = AIServiceError('Failed', AIProvider.ANTHROPIC, code)
+            with self.subTest(code=code), self.assertLogs('apps.tasks.services', 'ERROR'):
+                response = self.client.post(url, {'message': f'Why {code}?'}, format='json')
+                self.assertEqual(response.status_code, expected)
+        self.service.get_task_suggestion.side_effect = ValueError('bug')
+        with self.assertLogs('apps.tasks.services', 'ERROR'):
+            response = self.client.post(url, {'message': 'And now?'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_500_INTERNAL_SERVER_ERROR)
+        self.assertFalse(AIAssistantInteraction.objects.exists())
+
+
+class ClaudeAIServiceTest(TestCase):
+    @mock.patch.dict('os.environ', {'CLAUDE_API_KEY': 'sk-ant-api03-test'})
+    def setUp(self):
+        self.service = ClaudeAIService()
+
+    def suggest(self):
+        return async_to_sync(self.service.get_task_suggestion)('Launch', '', 'Where do I start?')
+
+    @mock.patch('apps.tasks.services.generate_cached')
+    def test_failures_are_raised(self, generate_cached):
+        for code in ('SERVER_ERROR', 'CIRCUIT_OPEN', 'RATE_LIMITED', 'AUTHENTICATION_ERROR', 'BAD_REQUEST'):
+            generate_cached.side_effect = AIServiceError('Failed', AIProvider.ANTHROPIC, code)
+            with self.subTest(code=code), self.assertRaises(AIServiceError):
+                self.suggest()
+
+    @mock.patch('apps.tasks.services.generate_cached')
+    def test_empty_response_is_raised(self, generate_cached):
+        generate_cached.return_value = AIResponse(content=' ', model='claude', provider=AIProvider.ANTHROPIC)
+        with self.assertRaises(AIServiceError) as raised:
+            self.suggest()
+        self.assertEqual(raised.exception.error_code, 'EMPTY_RESPONSE')
+
+    def test_missing_api_key_is_raised(self):
+        with mock.patch.dict('os.environ', clear=True), self.assertLogs('apps.tasks.services', 'WARNING'):
+            self.service = ClaudeAIService()
+        with self.assertRaises(AIServiceError) as raised:
+            self.suggest()
+        self.assertEqual(raised.exception.error_code, 'MISSING_API_KEY')
+
+    @mock.patch('apps.tasks.services.generate_cached')
+    def test_breakdown_outages_are_raised(self, generate_cached):
+        generate_cached.side_effect = AIServiceError('Timed out', AIProvider.ANTHROPIC, 'TIMEOUT')
+        with self.assertRaises(AIServiceError):
+            async_to_sync(self.service.breakdown_task)('Launch', '')
+
+
+class TaskInteractionsAPITest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.client.force_authenticate(user=self.user)
+        self.task = Task.objects.create(title='Launch', user=self.user)
+        start = timezone.now() - timedelta(hours=1)
+        for i in range(5):
+            interaction = AIAssistantInteraction.objects.create(
+                task=self.task, user_message=f'Question {i}', ai_response=f'Answer {i}'
+            )
+            AIAssistantInteraction.objects.filter(pk=interaction.pk).update(created_at=start + timedelta(minutes=i))
+
+    def test_pages_newest_first(self):
+        url = f'/api/tasks/{self.task.pk}/interactions/?page_size=2'
+        messages = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            messages += [item['user_message'] for item in response.data['results']]
+            url = response.data['next']
+        self.assertEqual(messages, [f'Question {i}' for i in range(4, -1, -1)])
+
+    def test_other_users_task_is_not_found(self):
+        stranger = User.objects.create_user(username='stranger', password='testpass123')
+        self.client.force_authenticate(user=stranger)
+        response = self.client.get(f'/api/tasks/{self.task.pk}/interactions/')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class ConversationNotesMigrationTest(TestCase):
+    migration = importlib.import_module('apps.tasks.migrations.0010_ai_conversation_log')
+
+    def test_conversations_move_out_of_notes(self):
+        user = User.objects.create_user(username='testuser', password='testpass123')
+        task = Task.objects.create(title='Launch', user=user, notes=(
+            "Call the venue first\n\n"
+            "--- AI Conversation (2025-08-22 10:00:00) ---\nYou: Where do I start?\nAI: With a checklist.\n"
+            "--- End of Conversation ---\n\n"
+            "--- AI Conversation (2025-08-23 09:30:00) ---\nYou: And then?\nAI: Line 1\nLine 2\n"
+            "--- End of Conversation ---"
+        ))
+        # Conversations from ai_suggest already have their row
+        AIAssistantInteraction.objects.create(task=task, user_message='Where do I start?', ai_response='With a checklist.')
+
+        self.migration.split_notes(apps, None)
+
+        task.refresh_from_db()
+        self.assertEqual(task.notes, 'Call the venue first')
+        self.assertEqual(AIAssistantInteraction.objects.count(), 2)
+        backfilled = AIAssistantInteraction.objects.get(user_message='And then?')
+        self.assertEqual(backfilled.ai_response, 'Line 1\nLine 2')
+        self.assertEqual(backfilled.created_at, datetime(2025, 8, 23, 9, 30, tzinfo=dt_timezone.utc))
+
+
+@override_settings(AI_CONVERSATION={
+    'KEEP_TURNS': 2, 'COMPACT_THRESHOLD': 100, 'SUMMARY_MAX_TOKENS': 100, 'CONTEXT_MAX_TOKENS': 1000,
+})
+class ConversationCompactionTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.client.force_authenticate(user=self.user)
+        self.task = Task.objects.create(title='Launch', user=self.user)
+        cache.clear()
+        self.service = mock.AsyncMock()
+        self.service.get_task_suggestion.return_value = 'Start with a checklist.'
+
+        async def summarize_conversation(task_title, summary, turns, max_tokens):
+            return ' '.join(filter(None, [summary, *[message for message, response in turns]]))
+
+        self.service.summarize_conversation.side_effect = summarize_conversation
+        for target in ('apps.tasks.async_views.aget_claude_service', 'apps.tasks.jobs.aget_claude_service'):
+            patcher = mock.patch(target, return_value=self.service)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def add_interactions(self, count, size=200):
+        for i in range(count):
+            AIAssistantInteraction.objects.create(task=self.task, user_message=f'Q{i}', ai_response='x' * size)
+
+    def suggest(self, message='What next?'):
+        return self.client.post(f'/api/tasks/{self.task.pk}/ai_suggest/', {'message': message}, format='json')
+
+    def test_short_conversations_are_not_compacted(self):
+        self.add_interactions(3, size=10)
+        self.suggest()
+        self.assertFalse(AIJob.objects.filter(kind=AIJob.COMPACT).exists())
+
+    def test_older_turns_are_folded_into_the_summary(self):
+        self.add_interactions(8)
+        self.suggest()
+        job = AIJob.objects.get(kind=AIJob.COMPACT)
+        work(burst=True)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, AIJob.SUCCEEDED)
+        self.assertEqual(job.result, {'summarized': 7})
+        # Folded in batches of about COMPACT_THRESHOLD tokens
+        self.assertEqual(self.service.summarize_conversation.await_count, 4)
+        summary = TaskConversationSummary.objects.get(task=self.task)
+        self.assertEqual(summary.summary, 'Q0 Q1 Q2 Q3 Q4 Q5 Q6')
+        self.assertEqual(summary.interaction_count, 7)
+
+        context = async_to_sync(aconversation_context)(self.task)
+        self.assertEqual(context.summary, summary.summary)
+        self.assertEqual([message for message, response in context.turns], ['Q7', 'What next?'])
+
+    def test_suggestions_see_the_summary_and_recent_turns(self):
+        self.add_interactions(8)
+        self.suggest()
+        work(burst=True)
+        self.suggest('And after that?')
+        context = self.service.get_task_suggestion.await_args.kwargs['context']
+        self.assertEqual(context.summary, 'Q0 Q1 Q2 Q3 Q4 Q5 Q6')
+        self.assertEqual(len(context.turns), 2)
+
+    def test_failed_summary_fails_the_job(self):
+        self.service.summarize_conversation.side_effect = None
+        self.service.summarize_conversation.return_value = None
+        self.add_interactions(8)
+        self.suggest()
+        work(burst=True)
+        job = AIJob.objects.get(kind=AIJob.COMPACT)
+        self.assertEqual(job.status, AIJob.FAILED)
+        self.assertFalse(TaskConversationSummary.objects.exists())
+
+
+class AIJobQueueTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            password='testpass123'
+        )
+        self.client.force_authenticate(user=self.user)
+        self.task = Task.objects.create(title='Launch', user=self.user)
+        self.service = mock.AsyncMock()
+        self.service.breakdown_task.return_value = [
+            {'title': f'Step {i}', 'description': '', 'priority': 'medium'} for i in range(3)
+        ]
+        self.service.get_task_suggestion.return_value = 'Start with a checklist.'
+        patcher = mock.patch('apps.tasks.jobs.aget_claude_service', return_value=self.service)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_background_breakdown_is_queued(self):
+        response = self.client.post(f'/api/tasks/{self.task.pk}/breakdown/', {'background': True}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        job = AIJob.objects.get(pk=response.json()['job_id'])
+        self.assertEqual((job.kind, job.status), (AIJob.BREAKDOWN, AIJob.QUEUED))
+        self.assertTrue(response.json()['status_url'].endswith(f'/api/ai-jobs/{job.pk}/'))
+        self.service.breakdown_task.assert_not_called()
+
+        response = self.client.get(f'/api/ai-jobs/{job.pk}/')
+        self.assertEqual(response.data['status'], AIJob.QUEUED)
+        self.assertEqual(response.data['queue_position'], 1)
+
+    def test_job_list_numbers_queue_without_query_per_job(self):
+        jobs = [
+            enqueue_job(Task.objects.create(title=f'Task {i}', user=self.user), AIJob.BREAKDOWN)
+            for i in range(3)
+        ]
+        for minutes, job in enumerate(jobs):
+            AIJob.objects.filter(pk=job.pk).update(created_at=timezone.now() + timedelta(minutes=minutes))
+        AIJob.objects.filter(pk=jobs[0].pk).update(status=AIJob.RUNNING)
+
+        # The page count and the jobs, whatever the number of queued jobs
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/ai-jobs/')
+        positions = {job['id']: job['queue_position'] for job in response.data['results']}
+        self.assertEqual(positions, {jobs[0].pk: None, jobs[1].pk: 1, jobs[2].pk: 2})
+
+    def test_worker_runs_breakdown(self):
+        response = self.client.post(f'/api/tasks/{self.task.pk}/breakdown/', {'background': True}, format='json')
+        work(burst=True)
+
+        response = self.client.get(f'/api/ai-jobs/{response.json()["job_id"]}/')
+        self.assertEqual(response.data['status'], AIJob.SUCCEEDED)
+        self.assertEqual(len(response.data['result']['subtasks']), 3)
+        self.assertEqual(Task.objects.filter(parent_task=self.task).count(), 3)
+
+    def test_worker_runs_suggestion(self):
+        response = self.client.post(f'/api/tasks/{self.task.pk}/ai_suggest/', {
+            'message': 'Where do I start?', 'background': True
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        work(burst=True)
+
+        job = AIJob.objects.get(pk=response.json()['job_id'])
+        self.assertEqual(job.status, AIJob.SUCCEEDED)
+        self.assertEqual(job.result['ai_response'], 'Start with a checklist.')
+        self.assertTrue(AIAssistantInteraction.objects.filter(pk=job.result['interaction_id']).exists())
+
+    def test_failed_breakdown_reports_error(self):
+        self.service.breakdown_task.return_value = []
+        job = enqueue_job(self.task, AIJob.BREAKDOWN)
+        work(burst=True)
+        job.refresh_from_db()
+        self.assertEqual(job.status, AIJob.FAILED)
+        self.assertIn('Failed to generate subtasks', job.error)
+
+    def test_failed_suggestion_is_not_saved(self):
+        self.service.get_task_suggestion.side_effect = AIServiceError(
+            'Service unavailable', AIProvider.ANTHROPIC, 'SERVER_ERROR'
+        )
+        job = enqueue_job(self.task, AIJob.SUGGEST, {'message': 'Where do I start?'})
+        with self.assertLogs('apps.tasks.services', 'ERROR'):
+            work(burst=True)
+        job.refresh_from_db()
+        self.assertEqual(job.status, AIJob.FAILED)
+        self.assertIn('temporarily unavailable', job.error)
+        self.assertFalse(AIAssistantInteraction.objects.exists())
+
+    def test_duplicate_background_request_reuses_job(self):
+        url = f'/api/tasks/{self.task.pk}/ai_suggest/'
+        first = self.client.post(url, {'message': 'Where do I start?', 'background': True}, format='json')
+        duplicate = self.client.post(url, {'message': 'Where do I start?', 'background': True}, format='json')
+        other = self.client.post(url, {'message': 'What comes next?', 'background': True}, format='json')
+        self.assertEqual(duplicate.json()['job_id'], first.json()['job_id'])
+        self.assertNotEqual(other.json()['job_id'], first.json()['job_id'])
+
+        work(burst=True)
+        # Once finished, the same request queues a new job
+        again = self.client.post(url, {'message': 'Where do I start?', 'background': True}, format='json')
+        self.assertNotEqual(again.json()['job_id'], first.json()['job_id'])
+
+    def test_job_is_claimed_once(self):
+        enqueue_job(self.task, AIJob.BREAKDOWN)
+        self.assertIsNotNone(claim_job())
+        self.assertIsNone(claim_job())
+
+    def test_stale_jobs_are_retried_then_failed(self):
+        long_ago = timezone.now() - timedelta(hours=1)
+        retried = enqueue_job(self.task, AIJob.BREAKDOWN)
+        given_up = enqueue_job(Task.objects.create(title='Ship', user=self.user), AIJob.BREAKDOWN)
+        AIJob.objects.filter(pk=retried.pk).update(status=AIJob.RUNNING, started_at=long_ago, attempts=1)
+        AIJob.objects.filter(pk=given_up.pk).update(status=AIJob.RUNNING, started_at=long_ago, attempts=2)
+
+        with self.assertLogs('apps.tasks.jobs', 'WARNING'):
+            requeue_stale_jobs()
+        retried.refresh_from_db()
+        given_up.refresh_from_db()
+        self.assertEqual(retried.status, AIJob.QUEUED)
+        self.assertEqual(given_up.status, AIJob.FAILED)
+
+    def test_other_users_job_is_not_found(self):
+        stranger = User.objects.create_user(username='stranger', password='testpass123')
+        job = enqueue_job(Task.objects.create(title='Foreign', user=stranger), AIJob.BREAKDOWN)
+        response = self.client.get(f'/api/ai-jobs/{job.pk}/')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+@override_settings(SINGLE_FLIGHT={'POLL_INTERVAL': 0.01})
+class SingleFlightTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_concurrent_callers_share_one_result(self):
+        calls = []
+
+        async def work():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return len(calls)
+
+        async def scenario():
+            return await asyncio.gather(*(single_flight('key', work) for _ in range(3)))
+
+        self.assertEqual(async_to_sync(scenario)(), [1, 1, 1])
+        self.assertEqual(len(calls), 1)
+
+    def test_outdated_result_is_not_reused(self):
+        calls = []
+
+        async def work():
+            calls.append(1)
+            return len(calls)
+
+        async def reuse(result):
+            return result > 1
+
+        async def scenario():
+            return [await single_flight('key', work, reuse=reuse) for _ in range(3)]
+
+        self.assertEqual(async_to_sync(scenario)(), [1, 2, 2])
+
+    def test_failure_is_not_shared(self):
+        calls = []
+
+        async def work():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            if len(calls) == 1:
+                raise ValueError('provider down')
+            return 'ok'
+
+        async def scenario():
+            return await asyncio.gather(single_flight('key', work), single_flight('key', work),
+                                        return_exceptions=True)
+
+        first, second = async_to_sync(scenario)()
+        self.assertIsInstance(first, ValueError)
+        self.assertEqual(second, 'ok')
+        self.assertEqual(len(calls), 2)
+
+
+TIERED_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'shared': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'tiered-test-shared'},
+    'tiered': {
+        'BACKEND': 'taskmanager.cache.TieredCache',
+        'LOCATION': 'tiered-test',
+        'OPTIONS': {'SHARED': 'shared'},
+    },
+}
+
+
+@override_settings(CACHES=TIERED_CACHES)
+# As if the broker reached other worker processes; otherwise L1 is bypassed
+@mock.patch.object(pubsub.InMemoryBroker, 'shared', True)
+class TieredCacheTest(TestCase):
+    def setUp(self):
+        self.tiered = caches['tiered']
+        self.shared = caches['shared']
+        self.tiered.clear()
+
+    def change_elsewhere(self, key, value):
+        """What another worker's write does: update L2 and announce the key"""
+        self.shared.set(self.tiered.make_key(key), value)
+        pubsub.publish('cache-invalidation:tiered-test', {
+            'origin': 'elsewhere', 'keys': [self.tiered.make_key(key)], 'clear': False,
+        })
+
+    def wait_for(self, key, expected):
+        deadline = time.monotonic() + 2
+        while self.tiered.get(key) != expected and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(self.tiered.get(key), expected)
+
+    def test_writes_go_through_to_the_shared_cache(self):
+        self.tiered.set('key', 'value')
+        self.assertEqual(self.shared.get(self.tiered.make_key('key')), 'value')
+        self.tiered.set('count', 1)
+        self.assertEqual(self.tiered.incr('count'), 2)
+        self.assertEqual(self.tiered.get('count'), 2)
+        self.tiered.delete('key')
+        self.assertIsNone(self.shared.get(self.tiered.make_key('key')))
+        self.assertIsNone(self.tiered.get('key'))
+
+    def test_reads_are_served_locally_until_invalidated(self):
+        self.tiered.set('key', 'old')
+        # Behind the tiered cache's back: not seen, the local copy answers
+        self.shared.set(self.tiered.make_key('key'), 'new')
+        self.assertEqual(self.tiered.get('key'), 'old')
+
+        self.change_elsewhere('key', 'newer')
+        self.wait_for('key', 'newer')
+
+    def test_local_level_bypassed_without_a_shared_broker(self):
+        self.tiered.set('key', 'old')
+        self.shared.set(self.tiered.make_key('key'), 'new')
+        with mock.patch.object(pubsub.InMemoryBroker, 'shared', False):
+            self.assertEqual(self.tiered.get('key'), 'new')
+
+    def test_get_many_combines_both_levels(self):
+        self.tiered.set('local', 1)
+        self.shared.set(self.tiered.make_key('remote'), 2)
+        self.assertEqual(self.tiered.get_many(['local', 'remote', 'missing']), {'local': 1, 'remote': 2})
+
+    def test_benchmark_command(self):
+        out = StringIO()
+        call_command('benchmark_cache', '--iterations', '5', '--alias', 'tiered', '--alias', 'shared', stdout=out)
+        lines = out.getvalue().splitlines()
+        self.assertEqual([line.split()[0] for line in lines[1:]], ['tiered', 'shared', 'database'])
@@ -0,0 +1,30 @@
+from collections import defaultdict
+
+
+class TaskTree:
+    """Parent -> children index over tasks fetched with a single query.
+
+    Lets TaskSerializer render nested subtasks without a query per node.
+    Tasks deeper than max_depth are kept in the index only so that
+    has_children() can report whether a collapsed node can be expanded.
+    """
+
+    def __init__(self, tasks, max_depth=None):
+        self.max_depth = max_depth
+        self._children = defaultdict(list)
+        by_id = {task.pk: task for task in tasks}
+        for task in by_id.values():
+            parent = by_id.get(task.parent_task_id)
+            if parent is not None:
+                # Prime the FK cache so parent_task_title needs no query
+                task.parent_task = parent
+            self._children[task.parent_task_id].append(task)
+
+    def children_of(self, task):
+        """Subtasks to render under task, empty once max_depth is reached"""
+        if self.max_depth is not None and task.depth >= self.max_depth:
+            return []
+        return self._children.get(task.pk, [])
+
+    def has_children(self, task):
+        return bool(self._children.get(task.pk))
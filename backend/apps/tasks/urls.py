@@ -1,11 +1,16 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import TaskViewSet, TagViewSet
+from .async_views import TaskAISuggestView, TaskBreakdownView
+from .views import TaskViewSet, TagViewSet, AIJobViewSet
 
 router = DefaultRouter()
 router.register(r'tasks', TaskViewSet, basename='task')
 router.register(r'tags', TagViewSet)
+router.register(r'ai-jobs', AIJobViewSet, basename='ai-job')
 
 urlpatterns = [
+    # AI endpoints are async views so a slow provider call doesn't hold a worker thread
+    path('api/tasks/<int:pk>/ai_suggest/', TaskAISuggestView.as_view(), name='task-ai-suggest'),
+    path('api/tasks/<int:pk>/breakdown/', TaskBreakdownView.as_view(), name='task-breakdown'),
     path('api/', include(router.urls)),
-]
\ No newline at end of file
+]
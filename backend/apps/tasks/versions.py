@@ -0,0 +1,27 @@
+import uuid
+
+from django.core.cache import cache
+
+TAGS_VERSION_KEY = 'tags:version'
+
+
+def tasks_version_key(user_id):
+    return f'tasks:version:{user_id}'
+
+
+def get_version(key):
+    """
+    Opaque token that changes whenever the data behind `key` changes. Tokens
+    are random rather than counters, so an evicted version is replaced by a
+    new token instead of repeating an old one.
+    """
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, uuid.uuid4().hex, None)
+        version = cache.get(key)
+    # Without a working cache, never let two requests share a version
+    return version or uuid.uuid4().hex
+
+
+def bump_version(key):
+    cache.set(key, uuid.uuid4().hex, None)
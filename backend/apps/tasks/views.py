@@ -1,158 +1,341 @@
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import OrderingFilter
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAuthenticated, SAFE_METHODS
+from rest_framework.renderers import JSONRenderer
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.db import connection
+from django.db.models import Exists, Func, OuterRef, Subquery, prefetch_related_objects
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
-from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+import hashlib
 import logging
-from .models import Task, Tag, AIAssistantInteraction
-from .serializers import TaskSerializer, TagSerializer, AIAssistantInteractionSerializer
-from .services import get_claude_service
+from taskmanager.pubsub import get_broker
+from .events import TAGS_CHANNEL, AsyncEventStream, EventStream, user_channel
+from .models import Task, Tag, TaskTombstone, AIAssistantInteraction, AIJob
+from .serializers import TaskSerializer, TaskListSerializer, TagSerializer, AIAssistantInteractionSerializer, AIJobSerializer
+from .filters import TaskFilterBackend
+from .pagination import InteractionCursorPagination, TaskPagination
+from .renderers import EventStreamRenderer
+from .signals import tasks_changed
+from .stats import get_task_stats
+from .sync import decode_cursor, next_cursor, tombstone_cutoff
+from .tree import TaskTree
+from .versions import TAGS_VERSION_KEY, get_version, tasks_version_key
 
 logger = logging.getLogger(__name__)
 
 
+def is_task_id(value):
+    # JSON true and false parse to bools, which are ints too
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
 class TaskViewSet(viewsets.ModelViewSet):
     serializer_class = TaskSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = TaskPagination
+    filter_backends = [TaskFilterBackend, OrderingFilter]
+    ordering_fields = ['created_at', 'updated_at', 'due_date', 'title', 'progress']
+    ordering = ['-created_at', '-id']
+    bulk_max_items = 500
+    changes_max_items = 1000
+    # Unbounded text columns, only loaded when the response includes them
+    deferrable_fields = ['description', 'notes']
 
     def get_queryset(self):
-        return Task.objects.filter(user=self.request.user)
+        queryset = (
+            Task.objects.filter(user=self.request.user)
+            .select_related('parent_task')
+            .prefetch_related('tags')
+            .annotate(has_subtasks=Exists(Task.objects.filter(parent_task=OuterRef('pk'))))
+        )
+        if self.request.method in SAFE_METHODS:
+            # Only the title of the parent task is serialized
+            queryset = self.defer_unused_fields(queryset).defer(
+                *[f'parent_task__{name}' for name in self.deferrable_fields]
+            )
+        return queryset
+
+    def defer_unused_fields(self, queryset):
+        """Skip loading the large text columns the response will not include"""
+        fields = self.get_serializer().fields
+        return queryset.defer(*[name for name in self.deferrable_fields if name not in fields])
+
+    def get_serializer_class(self):
+        # Lists default to the compact representation; ?fields= picks from the full one
+        if self.action in ('list', 'by_status', 'changes') and 'fields' not in self.request.query_params:
+            return TaskListSerializer
+        return TaskSerializer
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
-    @action(detail=True, methods=['post'])
-    def ai_suggest(self, request, pk=None):
+    def list(self, request, *args, **kwargs):
+        etag = self.get_etag(request)
+        not_modified = self.check_not_modified(request, etag)
+        if not_modified is not None:
+            return not_modified
+        return self.add_validators(super().list(request, *args, **kwargs), etag)
+
+    def retrieve(self, request, *args, **kwargs):
+        etag = self.get_etag(request)
+        not_modified = self.check_not_modified(request, etag)
+        if not_modified is not None:
+            return not_modified
+        instance = self.get_object()
+        response = Response(self.get_serializer(instance).data)
+        # Informational only: nested subtasks and tags can change without
+        # touching updated_at, so conditional requests are answered by the ETag
+        response['Last-Modified'] = http_date(instance.updated_at.timestamp())
+        return self.add_validators(response, etag)
+
+    def get_etag(self, request):
         """
-        Get AI suggestions for a task using Claude API
+        Strong ETag for a task read. It changes whenever any of the user's
+        tasks or any tag changes, so it can be checked without a query.
         """
-        task = self.get_object()
-        user_message = request.data.get('message', '')
-        
-        if not user_message.strip():
-            return Response(
-                {'error': 'Message is required'}, 
-                status=status.HTTP_400_BAD_REQUEST
-            )
-        
-        try:
-            # Get user-specific Claude service
-            claude_service = get_claude_service(request.user)
-
-            # Get AI suggestion from Claude
-            ai_response = claude_service.get_task_suggestion(
-                task_title=task.title,
-                task_description=task.description or "",
-                user_message=user_message
-            )
-            
-            # Save the interaction
-            interaction = AIAssistantInteraction.objects.create(
-                task=task,
-                user_message=user_message,
-                ai_response=ai_response
-            )
-            
-            # Append the conversation to task notes with timestamp
-            timestamp = timezone.now().strftime('%Y-%m-%d %H:%M:%S')
-            conversation_entry = f"\n\n--- AI Conversation ({timestamp}) ---\n"
-            conversation_entry += f"You: {user_message}\n"
-            conversation_entry += f"AI: {ai_response}\n"
-            conversation_entry += "--- End of Conversation ---"
-            
-            # Update task notes
-            if task.notes:
-                task.notes += conversation_entry
-            else:
-                task.notes = conversation_entry.strip()
-            task.save()
-            
-            logger.info(f"AI suggestion generated for task {task.id} by user {request.user.id}")
-            
-            return Response({
-                'ai_response': ai_response,
-                'interaction_id': interaction.id
-            })
-            
-        except Exception as e:
-            logger.error(f"Error generating AI suggestion: {str(e)}")
-            return Response(
-                {'error': 'Failed to generate AI suggestion. Please try again.'},
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR
-            )
+        key = ':'.join([
+            str(request.user.pk),
+            get_version(tasks_version_key(request.user.pk)),
+            get_version(TAGS_VERSION_KEY),
+            request.accepted_renderer.format,
+            request.get_full_path(),
+        ])
+        return quote_etag(hashlib.md5(key.encode(), usedforsecurity=False).hexdigest())
+
+    def check_not_modified(self, request, etag):
+        """304 response when If-None-Match matches, before any query or serialization"""
+        response = get_conditional_response(request, etag=etag)
+        if response is not None:
+            self.add_validators(response, etag)
+        return response
 
-    @action(detail=True, methods=['post'])
-    def breakdown(self, request, pk=None):
+    def add_validators(self, response, etag):
+        response['ETag'] = etag
+        # Browsers may keep the response but must revalidate it on every use
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+    @action(detail=False, methods=['get'])
+    def tree(self, request):
         """
-        Break down a complex task into subtasks using AI
+        Nested task tree assembled in memory from a single query.
+
+        ?root=<id> returns the subtasks of one task (lazy expansion) and
+        ?depth=<n> limits how many subtask levels are nested under each
+        returned task; collapsed nodes report has_children.
         """
-        task = self.get_object()
-        
-        # Check if task already has subtasks
-        if task.subtasks.exists():
-            return Response(
-                {'error': 'Task already has subtasks. Delete existing subtasks first to regenerate.'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-        
-        try:
-            # Get user-specific Claude service
-            claude_service = get_claude_service(request.user)
-
-            # Get AI breakdown from Claude
-            subtasks_data = claude_service.breakdown_task(
-                task_title=task.title,
-                task_description=task.description or ""
-            )
-            
-            if not subtasks_data:
-                return Response(
-                    {'error': 'Failed to generate subtasks. The task might be too simple or AI service is unavailable.'},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            
-            # Create subtasks
-            created_subtasks = []
-            for subtask_data in subtasks_data:
-                subtask = Task.objects.create(
-                    title=subtask_data['title'],
-                    description=subtask_data['description'],
-                    priority=subtask_data['priority'],
-                    status='todo',
-                    user=request.user,
-                    parent_task=task
-                )
-                created_subtasks.append(subtask)
-            
-            # Serialize and return the created subtasks
-            serializer = self.get_serializer(created_subtasks, many=True)
-            
-            logger.info(f"Task breakdown completed for task {task.id}: created {len(created_subtasks)} subtasks")
-            
-            return Response({
-                'message': f'Successfully created {len(created_subtasks)} subtasks',
-                'subtasks': serializer.data
-            })
-            
-        except Exception as e:
-            logger.error(f"Error during task breakdown: {str(e)}")
-            return Response(
-                {'error': 'Failed to break down task. Please try again.'},
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR
-            )
+        depth = request.query_params.get('depth')
+        if depth is not None:
+            try:
+                depth = int(depth)
+            except ValueError:
+                depth = -1
+            if depth < 0:
+                raise ValidationError({'depth': 'Depth must be a non-negative integer.'})
+
+        queryset = self.defer_unused_fields(
+            Task.objects.filter(user=request.user).prefetch_related('tags')
+        )
+        root_id = request.query_params.get('root')
+        if root_id:
+            try:
+                root_id = int(root_id)
+            except ValueError:
+                raise ValidationError({'root': 'Root must be a task id.'})
+            root = get_object_or_404(queryset, pk=root_id)
+            queryset = queryset.filter(path__startswith=root.subtree_prefix)
+            top_depth = root.depth + 1
+        else:
+            root = None
+            top_depth = 0
+
+        max_depth = None
+        if depth is not None:
+            max_depth = top_depth + depth
+            # One extra level so collapsed nodes know whether they have children
+            queryset = queryset.filter(depth__lte=max_depth + 1)
+
+        nodes = list(queryset)
+        if root is not None:
+            nodes.append(root)
+        tree = TaskTree(nodes, max_depth=max_depth)
+        top_level = [node for node in nodes if node.depth == top_depth]
+
+        serializer = self.get_serializer(top_level, many=True, context={
+            **self.get_serializer_context(),
+            'task_tree': tree,
+        })
+        return Response(serializer.data)
+
+    @action(detail=False, methods=['post', 'patch', 'delete'])
+    def bulk(self, request):
+        """
+        Create (POST a list of tasks), update (PATCH a list of partial tasks
+        with their "id") or delete (DELETE {"ids": [...]}) many tasks in one
+        transaction.
+        """
+        if request.method == 'DELETE':
+            return self._bulk_delete(request)
+
+        items = request.data
+        if not isinstance(items, list) or not items:
+            raise ValidationError({'non_field_errors': ['Expected a non-empty list of tasks.']})
+        if len(items) > self.bulk_max_items:
+            raise ValidationError({'non_field_errors': [f'At most {self.bulk_max_items} tasks per request.']})
+
+        if request.method == 'POST':
+            serializer = self.get_serializer(data=items, many=True)
+            serializer.is_valid(raise_exception=True)
+            tasks = serializer.save(user=request.user)
+            tasks_changed(request.user.pk)
+            # Freshly created tasks have no subtasks, so an in-memory tree
+            # lets the response render without a query per task
+            prefetch_related_objects(tasks, 'tags')
+            data = self.get_serializer(tasks, many=True, context={
+                **self.get_serializer_context(),
+                'task_tree': TaskTree(tasks),
+            }).data
+            return Response(data, status=status.HTTP_201_CREATED)
+
+        ids = [item.get('id') if isinstance(item, dict) else None for item in items]
+        if not all(is_task_id(pk) for pk in ids):
+            raise ValidationError({'non_field_errors': ['Each task needs an integer "id".']})
+        tasks = self.get_queryset().in_bulk(ids)
+        instances = [tasks.get(pk) for pk in ids]
+        if len(set(ids)) != len(ids):
+            raise ValidationError({'non_field_errors': ['Each task may only appear once.']})
+        serializer = self.get_serializer(instances, data=items, many=True, partial=True)
+        serializer.is_valid(raise_exception=True)
+        updated = serializer.save()
+        tasks_changed(request.user.pk)
+        return Response({'updated': [task.pk for task in updated]})
+
+    def _bulk_delete(self, request):
+        ids = request.data.get('ids') if isinstance(request.data, dict) else None
+        if not isinstance(ids, list) or not all(is_task_id(pk) for pk in ids):
+            raise ValidationError({'ids': ['Expected a list of task ids.']})
+        # Subtasks cascade with their parents; only count the tasks themselves
+        _, deleted = Task.objects.filter(user=request.user, pk__in=ids).delete()
+        return Response({'deleted': deleted.get(Task._meta.label, 0)})
+
+    @action(detail=False, methods=['get'])
+    def changes(self, request):
+        """
+        Delta sync: tasks created or updated, and ids of tasks deleted, since
+        ?since=<cursor>. Without a cursor every task is returned. Pass the
+        returned cursor as ?since= on the next call. full_sync_required means
+        the cursor is too old or too much changed (or, without a cursor, the
+        user has more than changes_max_items tasks), and the client should
+        load its task list from the paginated list endpoint instead.
+        """
+        cursor = next_cursor()
+        queryset = self.get_queryset().order_by('updated_at', 'id')
+        since_param = request.query_params.get('since')
+        if since_param is None:
+            tasks = list(queryset[:self.changes_max_items + 1])
+            if len(tasks) > self.changes_max_items:
+                return Response({'cursor': cursor, 'full_sync_required': True})
+            return self._changes_response(cursor, tasks, [])
+
+        since = decode_cursor(since_param)
+        if since is None:
+            raise ValidationError({'since': 'Invalid cursor.'})
+        if since < tombstone_cutoff():
+            return Response({'cursor': cursor, 'full_sync_required': True})
+
+        changed = list(queryset.filter(updated_at__gt=since)[:self.changes_max_items + 1])
+        if len(changed) > self.changes_max_items:
+            return Response({'cursor': cursor, 'full_sync_required': True})
+        deleted = TaskTombstone.objects.filter(user=request.user, deleted_at__gt=since).values_list('task_id', flat=True)
+        return self._changes_response(cursor, changed, list(deleted))
+
+    def _changes_response(self, cursor, tasks, deleted):
+        return Response({
+            'cursor': cursor,
+            'full_sync_required': False,
+            'changed': self.get_serializer(tasks, many=True).data,
+            'deleted': deleted,
+        })
+
+    @action(detail=False, methods=['get'], renderer_classes=[EventStreamRenderer, JSONRenderer])
+    def events(self, request):
+        """
+        Server-Sent Events stream of changes to the user's tasks and to tags.
+        Each event is named after the change (task.created, task.updated,
+        task.deleted, tasks.changed for bulk writes, tags.changed) and carries
+        the task id when there is one.
+        """
+        # Subscribe before responding so no event is missed
+        channels = (user_channel(request.user.pk), TAGS_CHANNEL)
+        if isinstance(request._request, ASGIRequest):
+            # The stream must be async, or Django would buffer it whole. It
+            # subscribes on the server's event loop, where it is then read
+            stream_class = AsyncEventStream
+            subscription = async_to_sync(get_broker().asubscribe)(*channels)
+        else:
+            stream_class = EventStream
+            subscription = get_broker().subscribe(*channels)
+        stream = stream_class(
+            subscription,
+            heartbeat=settings.TASK_EVENTS_HEARTBEAT,
+            lifetime=settings.TASK_EVENTS_STREAM_LIFETIME,
+        )
+        if not connection.in_atomic_block:
+            # The stream never queries; don't hold a connection for its lifetime
+            connection.close()
+        response = StreamingHttpResponse(stream, content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        # Keep nginx from buffering the stream
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+    @action(detail=False, methods=['get'])
+    def stats(self, request):
+        """Dashboard counts by status, priority and due date, cached per user"""
+        return Response(get_task_stats(request.user))
 
     @action(detail=False, methods=['get'])
     def by_status(self, request):
-        status_param = request.query_params.get('status')
-        if status_param:
-            tasks = self.get_queryset().filter(status=status_param)
-            serializer = self.get_serializer(tasks, many=True)
-            return Response(serializer.data)
-        return Response({'error': 'Status parameter required'}, status=400)
+        if not request.query_params.get('status'):
+            return Response({'error': 'Status parameter required'}, status=400)
+        tasks = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(tasks)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    @action(detail=True, methods=['get'])
+    def interactions(self, request, pk=None):
+        """The task's AI conversation log, newest first, in keyset pages"""
+        task = get_object_or_404(Task.objects.only('id'), pk=pk, user=request.user)
+        paginator = InteractionCursorPagination()
+        page = paginator.paginate_queryset(AIAssistantInteraction.objects.filter(task=task), request, view=self)
+        return paginator.get_paginated_response(AIAssistantInteractionSerializer(page, many=True).data)
 
 
 class TagViewSet(viewsets.ModelViewSet):
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
-    permission_classes = [IsAuthenticated]
\ No newline at end of file
+    permission_classes = [IsAuthenticated]
+
+class AIJobViewSet(viewsets.ReadOnlyModelViewSet):
+    """Status and result of the user's background AI jobs"""
+    serializer_class = AIJobSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        # Count the queued jobs ahead in the same query instead of one COUNT per job
+        jobs_ahead = (
+            AIJob.objects.filter(status=AIJob.QUEUED, created_at__lt=OuterRef('created_at'))
+            .order_by()
+            .annotate(count=Func('pk', function='COUNT'))
+            .values('count')
+        )
+        return AIJob.objects.filter(user=self.request.user).annotate(jobs_ahead=Subquery(jobs_ahead))
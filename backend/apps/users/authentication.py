@@ -0,0 +1,192 @@
+"""
+Token authentication without a database query per request.
+
+CachedTokenAuthentication is a drop-in replacement for DRF's
+TokenAuthentication. Each token maps to a snapshot of its user, looked up
+in a small in-process LRU, then in the shared cache
+(settings.TOKEN_AUTH['CACHE_ALIAS']), and only then in the database.
+Cache keys are digests of the token, never the token itself, and
+snapshots leave out the password hash.
+
+Deleting a token (logout, rotation, expiry) or saving its user (e.g.
+deactivation) drops the cached snapshots: at once in the process making the
+change, and in other workers through a PUBSUB_BROKER message. Without a
+broker shared by all workers the in-process LRU is not used. Entries also
+expire on their own, after 'LOCAL_TIMEOUT' seconds in the LRU and
+'TIMEOUT' seconds in the shared cache.
+
+With 'TOKEN_TTL' set, tokens older than that many seconds are rejected and
+deleted; logging in again or POST /api/auth/token/rotate/ issues a new one.
+"""
+from collections import OrderedDict
+from datetime import timedelta
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from taskmanager import pubsub
+
+DEFAULTS = {
+    'CACHE_ALIAS': 'default',
+    'TIMEOUT': 300,
+    'LOCAL_TIMEOUT': 60,
+    'LOCAL_MAX_ENTRIES': 1000,
+    # Seconds a token stays valid; None for tokens that never expire
+    'TOKEN_TTL': None,
+}
+
+INVALIDATION_CHANNEL = 'auth-tokens'
+KEY_PREFIX = 'auth-token'
+# Everything but the password hash
+SNAPSHOT_FIELDS = [field.attname for field in User._meta.concrete_fields if field.attname != 'password']
+
+
+def get_options():
+    return {**DEFAULTS, **getattr(settings, 'TOKEN_AUTH', {})}
+
+
+def _cache():
+    return caches[get_options()['CACHE_ALIAS']]
+
+
+def token_digest(key):
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+def token_expired(created):
+    ttl = get_options()['TOKEN_TTL']
+    return ttl is not None and created <= timezone.now() - timedelta(seconds=ttl)
+
+
+def issue_token(user):
+    """The user's token, replaced by a new one if it has expired"""
+    token, created = Token.objects.get_or_create(user=user)
+    if not created and token_expired(token.created):
+        token = rotate_token(user)
+    return token
+
+
+def rotate_token(user):
+    """Replace the user's token; the old one stops working everywhere at once"""
+    Token.objects.filter(user=user).delete()
+    return Token.objects.create(user=user)
+
+
+class LocalTokenCache:
+    """Least recently used snapshots of this process, each kept `timeout` seconds"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, digest):
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is None:
+                return None
+            snapshot, expires_at = entry
+            if time.monotonic() >= expires_at:
+                del self._entries[digest]
+                return None
+            self._entries.move_to_end(digest)
+            return snapshot
+
+    def set(self, digest, snapshot):
+        options = get_options()
+        with self._lock:
+            self._entries[digest] = (snapshot, time.monotonic() + options['LOCAL_TIMEOUT'])
+            self._entries.move_to_end(digest)
+            while len(self._entries) > options['LOCAL_MAX_ENTRIES']:
+                self._entries.popitem(last=False)
+
+    def discard(self, digest):
+        with self._lock:
+            self._entries.pop(digest, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+local_cache = LocalTokenCache()
+
+
+def _listen_for_invalidations():
+    """
+    Whether this process receives invalidations from other workers. Until
+    it does, and always with a broker that does not reach other processes
+    (InMemoryBroker), the LRU is bypassed: it could not be told about
+    revocations made elsewhere.
+    """
+    return pubsub.broker_is_shared() and pubsub.listen(
+        INVALIDATION_CHANNEL,
+        lambda message: local_cache.discard(message['digest']),
+        reset=local_cache.clear,
+    ).active
+
+
+def invalidate_token(key):
+    digest = token_digest(key)
+    local_cache.discard(digest)
+    _cache().delete(f'{KEY_PREFIX}:{digest}')
+    pubsub.publish(INVALIDATION_CHANNEL, {'digest': digest})
+
+
+def _snapshot(token):
+    return {
+        'created': token.created,
+        'user': {name: getattr(token.user, name) for name in SNAPSHOT_FIELDS},
+    }
+
+
+def _load_snapshot(key):
+    digest = token_digest(key)
+    use_local = _listen_for_invalidations()
+    snapshot = local_cache.get(digest) if use_local else None
+    if snapshot is not None:
+        return snapshot
+
+    cache_key = f'{KEY_PREFIX}:{digest}'
+    snapshot = _cache().get(cache_key)
+    if snapshot is None:
+        try:
+            token = Token.objects.select_related('user').get(key=key)
+        except Token.DoesNotExist:
+            return None
+        snapshot = _snapshot(token)
+        _cache().set(cache_key, snapshot, timeout=get_options()['TIMEOUT'])
+    if use_local:
+        local_cache.set(digest, snapshot)
+    return snapshot
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication reading tokens through the token caches"""
+
+    def authenticate_credentials(self, key):
+        snapshot = _load_snapshot(key)
+        if snapshot is None:
+            raise exceptions.AuthenticationFailed(_('Invalid token.'))
+
+        if token_expired(snapshot['created']):
+            Token.objects.filter(key=key).delete()
+            raise exceptions.AuthenticationFailed(_('Token has expired.'))
+
+        # A fresh instance per request, so that changes to request.user stay
+        # private; the password field is deferred and loads on access
+        user = User.from_db(None, SNAPSHOT_FIELDS, [snapshot['user'][name] for name in SNAPSHOT_FIELDS])
+        if not user.is_active:
+            raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+
+        token = Token.from_db(None, ['key', 'user_id', 'created'], [key, user.pk, snapshot['created']])
+        token.user = user
+        return (user, token)
@@ -0,0 +1,27 @@
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from .authentication import invalidate_token
+
+
+def tokens_changed(keys):
+    for key in keys:
+        invalidate_token(key)
+    # Again after commit: another request may have cached the old rows
+    # while the transaction was still open
+    transaction.on_commit(lambda: [invalidate_token(key) for key in keys])
+
+
+@receiver(post_delete, sender=Token)
+def token_deleted(sender, instance, **kwargs):
+    tokens_changed([instance.key])
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, **kwargs):
+    # Deactivation, or any other change to the user snapshot
+    if not created:
+        tokens_changed(list(Token.objects.filter(user=instance).values_list('key', flat=True)))
@@ -1 +1,93 @@
-from django.test import TestCase
\ No newline at end of file
+import time
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.test import override_settings
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+
+from taskmanager import pubsub
+from .authentication import INVALIDATION_CHANNEL, local_cache, token_digest
+
+
+class CachedTokenAuthenticationTest(APITestCase):
+    def setUp(self):
+        caches['default'].clear()
+        local_cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.token = Token.objects.create(user=self.user)
+
+    def profile(self, key=None):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {key or self.token.key}')
+        return self.client.get('/api/auth/profile/')
+
+    def test_warm_token_needs_no_query(self):
+        self.assertEqual(self.profile().status_code, status.HTTP_200_OK)
+        with self.assertNumQueries(0):
+            response = self.profile()
+        self.assertEqual(response.json()['username'], 'testuser')
+
+    def test_shared_cache_backs_the_local_one(self):
+        self.profile()
+        local_cache.clear()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.profile().status_code, status.HTTP_200_OK)
+
+    def test_logout_revokes_the_token(self):
+        self.profile()
+        self.assertEqual(self.client.post('/api/auth/logout/').status_code, status.HTTP_200_OK)
+        self.assertEqual(self.profile().status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deactivation_revokes_the_token(self):
+        self.profile()
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.profile().status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_invalid_token(self):
+        response = self.profile('0' * 40)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(response['WWW-Authenticate'], 'Token')
+
+    def test_rotation(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        new_key = self.client.post('/api/auth/token/rotate/').json()['token']
+        self.assertNotEqual(new_key, self.token.key)
+        self.assertEqual(self.profile().status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(self.profile(new_key).status_code, status.HTTP_200_OK)
+
+    def test_expired_token_is_rejected_and_replaced_on_login(self):
+        self.profile()
+        with override_settings(TOKEN_AUTH={'TOKEN_TTL': 0}):
+            response = self.profile()
+            self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+            self.assertEqual(response.json()['detail'], 'Token has expired.')
+            self.assertFalse(Token.objects.filter(key=self.token.key).exists())
+
+        Token.objects.create(user=self.user, key='a' * 40)
+        with override_settings(TOKEN_AUTH={'TOKEN_TTL': 3600}):
+            self.client.credentials()
+            login = self.client.post('/api/auth/login/', {'username': 'testuser', 'password': 'testpass123'})
+            self.assertEqual(login.json()['token'], 'a' * 40)
+        with override_settings(TOKEN_AUTH={'TOKEN_TTL': 0}):
+            login = self.client.post('/api/auth/login/', {'username': 'testuser', 'password': 'testpass123'})
+            self.assertNotEqual(login.json()['token'], 'a' * 40)
+
+    def test_local_cache_unused_without_a_shared_broker(self):
+        # InMemoryBroker could not tell this process about a revocation
+        # made in another worker
+        self.profile()
+        self.assertIsNone(local_cache.get(token_digest(self.token.key)))
+
+    @mock.patch.object(pubsub.InMemoryBroker, 'shared', True)
+    def test_invalidation_from_another_worker_reaches_local_cache(self):
+        self.profile()
+        digest = token_digest(self.token.key)
+        self.assertIsNotNone(local_cache.get(digest))
+        pubsub.publish(INVALIDATION_CHANNEL, {'digest': digest})
+        deadline = time.monotonic() + 2
+        while local_cache.get(digest) is not None and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertIsNone(local_cache.get(digest))
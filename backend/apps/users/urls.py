@@ -1,9 +1,10 @@
 from django.urls import path
-from .views import RegisterView, LoginView, LogoutView, UserProfileView
+from .views import RegisterView, LoginView, LogoutView, TokenRotateView, UserProfileView
 
 urlpatterns = [
     path('register/', RegisterView.as_view(), name='register'),
     path('login/', LoginView.as_view(), name='login'),
     path('logout/', LogoutView.as_view(), name='logout'),
+    path('token/rotate/', TokenRotateView.as_view(), name='token-rotate'),
     path('profile/', UserProfileView.as_view(), name='profile'),
 ]
\ No newline at end of file
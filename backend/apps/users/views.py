@@ -6,6 +6,7 @@ from rest_framework.views import APIView
 from rest_framework.authtoken.models import Token
 from django.contrib.auth import authenticate
 from django.contrib.auth.models import User
+from .authentication import issue_token, rotate_token
 from .serializers import UserRegistrationSerializer, UserSerializer
 
 
@@ -34,7 +35,7 @@ class LoginView(APIView):
         if username and password:
             user = authenticate(username=username, password=password)
             if user:
-                token, created = Token.objects.get_or_create(user=user)
+                token = issue_token(user)
                 return Response({
                     'user': UserSerializer(user).data,
                     'token': token.key
@@ -56,6 +57,15 @@ class LogoutView(APIView):
             return Response({'error': 'Error logging out'}, status=status.HTTP_400_BAD_REQUEST)
 
 
+class TokenRotateView(APIView):
+    """Replace the caller's token with a new one; the old one stops working"""
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        token = rotate_token(request.user)
+        return Response({'token': token.key})
+
+
 class UserProfileView(APIView):
     permission_classes = [IsAuthenticated]
 
@@ -0,0 +1,18 @@
+"""
+ASGI config for taskmanager project.
+
+It exposes the ASGI callable as a module-level variable named ``application``.
+Production serves it with uvicorn workers, so the async AI endpoints can wait
+on providers without holding a worker thread each.
+
+For more information on this file, see
+https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
+"""
+
+import os
+
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'taskmanager.settings.development')
+
+application = get_asgi_application()
@@ -0,0 +1,112 @@
+"""
+Async counterpart of DRF's APIView for endpoints that spend most of their
+time waiting on AI providers. Under ASGI a worker can hold many of these
+requests at once instead of blocking a thread on each.
+"""
+import json
+
+from asgiref.sync import sync_to_async
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils.decorators import classonlymethod
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import exceptions
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+
+def event_stream_response(events):
+    """
+    text/event-stream response over an async iterable of (event, data)
+    pairs. Only ASGI servers send it incrementally; under WSGI Django
+    consumes the whole iterable before responding.
+    """
+    async def stream():
+        async for event, data in events:
+            yield f'event: {event}\ndata: {json.dumps(data, cls=DjangoJSONEncoder)}\n\n'
+
+    response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Keep nginx from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def too_many_requests(retry_after=None):
+    """429 for a call refused by the outbound AI rate limiter"""
+    return retry_later('Too many AI requests. Please try again shortly.', 429, retry_after)
+
+
+def service_unavailable(retry_after=None):
+    """503 for a call the AI provider could not answer for now"""
+    return retry_later('AI service is temporarily unavailable. Please try again shortly.', 503, retry_after)
+
+
+def retry_later(error, status, retry_after=None):
+    response = JsonResponse({'error': error, 'retry_after': retry_after}, status=status)
+    if retry_after:
+        response['Retry-After'] = str(retry_after)
+    return response
+
+
+class AsyncAPIView(View):
+    """
+    Runs the usual DRF authentication, permission and parser classes, then
+    awaits an async handler (`async def post(self, request, ...)`) with the
+    DRF Request. Handlers return Django responses, typically JsonResponse.
+    """
+    authentication_classes = api_settings.DEFAULT_AUTHENTICATION_CLASSES
+    permission_classes = api_settings.DEFAULT_PERMISSION_CLASSES
+    parser_classes = api_settings.DEFAULT_PARSER_CLASSES
+
+    @classonlymethod
+    def as_view(cls, **initkwargs):
+        # Same as APIView: SessionAuthentication enforces CSRF itself
+        return csrf_exempt(super().as_view(**initkwargs))
+
+    async def dispatch(self, request, *args, **kwargs):
+        method = request.method.lower()
+        handler = getattr(self, method, None) if method in self.http_method_names else None
+        if handler is None:
+            return self.handle_exception(request, exceptions.MethodNotAllowed(request.method))
+        try:
+            # Authentication and body parsing may touch the database
+            drf_request = await sync_to_async(self.initialize_request)(request)
+        except exceptions.APIException as exc:
+            return self.handle_exception(request, exc)
+        return await handler(drf_request, *args, **kwargs)
+
+    def initialize_request(self, request):
+        drf_request = Request(
+            request,
+            parsers=[parser() for parser in self.parser_classes],
+            authenticators=[auth() for auth in self.authentication_classes],
+        )
+        for permission in [permission() for permission in self.permission_classes]:
+            if not permission.has_permission(drf_request, self):
+                if drf_request.authenticators and not drf_request.successful_authenticator:
+                    raise exceptions.NotAuthenticated()
+                raise exceptions.PermissionDenied(getattr(permission, 'message', None))
+        # Parse the body here as well, so handlers never block on it
+        drf_request.data
+        return drf_request
+
+    def wants_stream(self, request):
+        """True when the client asked for a streamed response"""
+        if isinstance(request.data, dict) and request.data.get('stream'):
+            return True
+        return 'text/event-stream' in request.headers.get('Accept', '')
+
+    def handle_exception(self, request, exc):
+        """Error response in the same shape as DRF's exception handler"""
+        data = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+        response = JsonResponse(data, status=exc.status_code, safe=False)
+        if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+            authenticators = [auth() for auth in self.authentication_classes]
+            header = authenticators[0].authenticate_header(request) if authenticators else None
+            if header:
+                response['WWW-Authenticate'] = header
+            else:
+                response.status_code = exceptions.PermissionDenied.status_code
+        return response
@@ -0,0 +1,188 @@
+"""
+Two-level cache backend: a per-process LRU (L1) in front of a shared cache
+(L2), typically Redis.
+
+    CACHES = {
+        'shared': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', ...},
+        'default': {
+            'BACKEND': 'taskmanager.cache.TieredCache',
+            'LOCATION': 'default',
+            'OPTIONS': {'SHARED': 'shared', 'LOCAL_TIMEOUT': 30, 'LOCAL_MAX_ENTRIES': 5000},
+        },
+    }
+
+Reads are served from L1 when possible and fill it from L2 otherwise.
+Writes go to L2 and are announced on a PUBSUB_BROKER channel, so every
+other process drops its L1 copy of the keys; while a process can't
+receive those messages, or when the broker does not reach other processes
+(InMemoryBroker), it bypasses its L1 altogether.
+
+Timeouts left to their default use the shared alias's TIMEOUT. An L1
+entry lives at most 'LOCAL_TIMEOUT' seconds, which also bounds how long it
+can outlive the L2 entry's own expiry. Keys used for locks and
+counters that must be read fresh every time (rate limit buckets, circuit
+breakers, single-flight) belong in the shared alias directly.
+"""
+import os
+import threading
+import uuid
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.core.cache.backends.locmem import LocMemCache
+
+from . import pubsub
+
+_missing = object()
+
+
+class TieredCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._shared_alias = options['SHARED']
+        self._local_timeout = options.get('LOCAL_TIMEOUT', 30)
+        # LocMemCache instances with the same name share their storage, so
+        # every thread's instance of this backend sees the same L1
+        self._local = LocMemCache(f'tiered:{location}', {
+            'TIMEOUT': self._local_timeout,
+            'OPTIONS': {'MAX_ENTRIES': options.get('LOCAL_MAX_ENTRIES', 1000)},
+        })
+        self._location = location
+        self._channel = f'cache-invalidation:{location}'
+
+    @property
+    def _shared(self):
+        return caches[self._shared_alias]
+
+    @property
+    def _state(self):
+        return _process_state(self._location)
+
+    def _use_local(self):
+        return pubsub.broker_is_shared() and pubsub.listen(
+            self._channel, self._invalidated, reset=self._local.clear
+        ).active
+
+    def _invalidated(self, message):
+        # This process's own writes have already updated its L1
+        if message['origin'] == self._state.origin:
+            return
+        with self._state.lock:
+            self._state.generation += 1
+        if message.get('clear'):
+            self._local.clear()
+        for key in message.get('keys', ()):
+            self._local.delete(key)
+
+    def _announce(self, keys=(), clear=False):
+        pubsub.publish(self._channel, {'origin': self._state.origin, 'keys': list(keys), 'clear': clear})
+
+    def _local_timeout_for(self, timeout):
+        if timeout is DEFAULT_TIMEOUT or timeout is None:
+            return self._local_timeout
+        return min(timeout, self._local_timeout)
+
+    def get(self, key, default=None, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        if not self._use_local():
+            return self._shared.get(key, default)
+        value = self._local.get(key, _missing)
+        if value is not _missing:
+            return value
+        generation = self._state.generation
+        value = self._shared.get(key, _missing)
+        if value is _missing:
+            return default
+        # An invalidation during the read may concern the value just read
+        if generation == self._state.generation:
+            self._local.set(key, value, timeout=self._local_timeout)
+        return value
+
+    def get_many(self, keys, version=None):
+        made = {self.make_and_validate_key(key, version=version): key for key in keys}
+        if not self._use_local():
+            return {made[key]: value for key, value in self._shared.get_many(made).items()}
+        found = {}
+        for key in made:
+            value = self._local.get(key, _missing)
+            if value is not _missing:
+                found[key] = value
+        generation = self._state.generation
+        fetched = self._shared.get_many([key for key in made if key not in found])
+        if generation == self._state.generation:
+            for key, value in fetched.items():
+                self._local.set(key, value, timeout=self._local_timeout)
+        found.update(fetched)
+        return {made[key]: value for key, value in found.items()}
+
+    def has_key(self, key, version=None):
+        return self.get(key, _missing, version=version) is not _missing
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        self._shared.set(key, value, timeout=timeout)
+        self._local.set(key, value, timeout=self._local_timeout_for(timeout))
+        self._announce([key])
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        added = self._shared.add(key, value, timeout=timeout)
+        if added:
+            self._local.delete(key)
+            self._announce([key])
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        # L1 copies keep their own, shorter, timeouts
+        return self._shared.touch(key, timeout=timeout)
+
+    def delete(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        deleted = self._shared.delete(key)
+        self._local.delete(key)
+        self._announce([key])
+        return deleted
+
+    def delete_many(self, keys, version=None):
+        keys = [self.make_and_validate_key(key, version=version) for key in keys]
+        self._shared.delete_many(keys)
+        for key in keys:
+            self._local.delete(key)
+        self._announce(keys)
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        value = self._shared.incr(key, delta)
+        self._local.delete(key)
+        self._announce([key])
+        return value
+
+    def clear(self):
+        self._shared.clear()
+        self._local.clear()
+        self._announce(clear=True)
+
+
+class _State:
+    def __init__(self):
+        self.lock = threading.Lock()
+        # Tells this process's messages apart from other processes'
+        self.origin = uuid.uuid4().hex
+        # Bumped on every invalidation received
+        self.generation = 0
+
+
+_states = {}
+_states_lock = threading.Lock()
+
+
+def _process_state(location):
+    # Per process: a forked child must not share its parent's origin
+    key = (os.getpid(), location)
+    state = _states.get(key)
+    if state is None:
+        with _states_lock:
+            state = _states.setdefault(key, _State())
+    return state
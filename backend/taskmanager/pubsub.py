@@ -0,0 +1,258 @@
+"""
+Publish/subscribe used to push change events to open event streams.
+
+settings.PUBSUB_BROKER selects the backend. InMemoryBroker only reaches
+subscribers in the same process, which is enough for development and tests;
+RedisBroker is shared by every worker process.
+
+subscribe() returns a subscription whose get() blocks the calling thread.
+asubscribe() returns one to await on an event loop instead, so that an open
+stream under ASGI doesn't hold a thread while it waits.
+"""
+import asyncio
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+
+class InMemoryBroker:
+    # Only subscribers of the publishing process get the messages
+    shared = False
+
+    def __init__(self, **options):
+        self._lock = threading.Lock()
+        self._queues = defaultdict(set)
+
+    def publish(self, channel, message):
+        with self._lock:
+            queues = list(self._queues[channel])
+        for subscriber_queue in queues:
+            subscriber_queue.put(message)
+
+    def subscribe(self, *channels):
+        return InMemorySubscription(self, channels)
+
+    async def asubscribe(self, *channels):
+        return AsyncInMemorySubscription(self, channels)
+
+    def _add(self, channels, subscriber_queue):
+        with self._lock:
+            for channel in channels:
+                self._queues[channel].add(subscriber_queue)
+
+    def _discard(self, channels, subscriber_queue):
+        with self._lock:
+            for channel in channels:
+                self._queues[channel].discard(subscriber_queue)
+
+
+class InMemorySubscription:
+    def __init__(self, broker, channels):
+        self._broker = broker
+        self._channels = channels
+        self._queue = queue.Queue()
+        broker._add(channels, self._queue)
+
+    def get(self, timeout):
+        """Next message, or None if nothing arrived within timeout seconds"""
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self._broker._discard(self._channels, self._queue)
+
+
+class AsyncInMemorySubscription:
+    def __init__(self, broker, channels):
+        self._broker = broker
+        self._channels = channels
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+        # Publishers call put() from any thread
+        broker._add(channels, self)
+
+    def put(self, message):
+        try:
+            self._loop.call_soon_threadsafe(self._queue.put_nowait, message)
+        except RuntimeError:
+            # The loop is closed; close() was never awaited
+            self._broker._discard(self._channels, self)
+
+    async def get(self, timeout):
+        """Next message, or None if nothing arrived within timeout seconds"""
+        try:
+            return await asyncio.wait_for(self._queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    async def aclose(self):
+        self._broker._discard(self._channels, self)
+
+
+class RedisBroker:
+    shared = True
+
+    def __init__(self, url, **options):
+        import redis
+
+        self._url = url
+        self._options = options
+        self._client = redis.Redis.from_url(url, **options)
+
+    def publish(self, channel, message):
+        self._client.publish(channel, json.dumps(message))
+
+    def subscribe(self, *channels):
+        pubsub = self._client.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(*channels)
+        return RedisSubscription(pubsub)
+
+    async def asubscribe(self, *channels):
+        import redis.asyncio
+
+        # A client of its own: its connections belong to the running loop
+        client = redis.asyncio.Redis.from_url(self._url, **self._options)
+        pubsub = client.pubsub(ignore_subscribe_messages=True)
+        await pubsub.subscribe(*channels)
+        return AsyncRedisSubscription(client, pubsub)
+
+
+class RedisSubscription:
+    def __init__(self, pubsub):
+        self._pubsub = pubsub
+
+    def get(self, timeout):
+        """Next message, or None if nothing arrived within timeout seconds"""
+        message = self._pubsub.get_message(timeout=timeout)
+        if message is None:
+            return None
+        return json.loads(message['data'])
+
+    def close(self):
+        self._pubsub.close()
+
+
+class AsyncRedisSubscription:
+    def __init__(self, client, pubsub):
+        self._client = client
+        self._pubsub = pubsub
+
+    async def get(self, timeout):
+        """Next message, or None if nothing arrived within timeout seconds"""
+        message = await self._pubsub.get_message(timeout=timeout)
+        if message is None:
+            return None
+        return json.loads(message['data'])
+
+    async def aclose(self):
+        await self._pubsub.aclose()
+        await self._client.aclose()
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                config = settings.PUBSUB_BROKER
+                _broker = import_string(config['BACKEND'])(**config.get('OPTIONS', {}))
+    return _broker
+
+
+def broker_is_shared():
+    """Whether published messages reach every worker process, not just this one"""
+    return getattr(get_broker(), 'shared', False)
+
+
+def publish(channel, message):
+    """Publish without letting a broker outage break the write that triggered it"""
+    try:
+        get_broker().publish(channel, message)
+    except Exception:
+        logger.exception("Failed to publish event on %s", channel)
+
+
+class Listener:
+    """
+    Calls `callback(message)` from a daemon thread for each message on
+    `channel`. Whenever messages may have been missed (the broker failed,
+    or while resubscribing) `reset()` is called and `active` is false, so
+    that state kept in sync by the messages can be dropped or bypassed.
+    """
+    RETRY_INTERVAL = 1
+
+    def __init__(self, channel, callback, reset):
+        self.channel = channel
+        self.callback = callback
+        self.reset = reset
+        self.active = False
+        # First subscription in the caller's thread: no message published
+        # after listen() returns can be missed
+        subscription = self._subscribe()
+        threading.Thread(target=self._run, args=(subscription,), daemon=True,
+                         name=f'pubsub-listener:{channel}').start()
+
+    def _subscribe(self):
+        try:
+            subscription = get_broker().subscribe(self.channel)
+        except Exception:
+            logger.exception("Failed to subscribe to %s", self.channel)
+            return None
+        self.active = True
+        return subscription
+
+    def _run(self, subscription):
+        while True:
+            if subscription is None:
+                time.sleep(self.RETRY_INTERVAL)
+                subscription = self._subscribe()
+                continue
+            try:
+                message = subscription.get(timeout=60)
+                if message is not None:
+                    self.callback(message)
+            except Exception:
+                logger.exception("Listener on %s failed", self.channel)
+                self.active = False
+                self.reset()
+                try:
+                    subscription.close()
+                except Exception:
+                    pass
+                subscription = None
+
+
+_listeners = {}
+_listeners_lock = threading.Lock()
+
+
+def listen(channel, callback, reset=lambda: None):
+    """
+    The Listener running `callback` for `channel` in this process, started
+    on first use. Forked children start their own, calling `reset()` first
+    to drop state inherited from the parent.
+    """
+    key = (os.getpid(), channel)
+    listener = _listeners.get(key)
+    if listener is None:
+        with _listeners_lock:
+            listener = _listeners.get(key)
+            if listener is None:
+                reset()
+                listener = _listeners[key] = Listener(channel, callback, reset)
+    return listener
@@ -102,9 +102,11 @@ MEDIA_ROOT = BASE_DIR / 'media'
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 REST_FRAMEWORK = {
+    # Token first, so that unauthenticated requests get 401 with a
+    # WWW-Authenticate challenge rather than a 403
     'DEFAULT_AUTHENTICATION_CLASSES': [
+        'apps.users.authentication.CachedTokenAuthentication',
         'rest_framework.authentication.SessionAuthentication',
-        'rest_framework.authentication.TokenAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
@@ -113,6 +115,127 @@ REST_FRAMEWORK = {
     'PAGE_SIZE': 20,
 }
 
+# Token -> user snapshots for CachedTokenAuthentication, kept LOCAL_TIMEOUT
+# seconds in each process and TIMEOUT seconds in the shared cache. Tokens
+# older than TOKEN_TTL seconds are rejected (None: tokens never expire).
+TOKEN_AUTH = {
+    'CACHE_ALIAS': 'default',
+    'TIMEOUT': 300,
+    'LOCAL_TIMEOUT': 60,
+    'LOCAL_MAX_ENTRIES': 1000,
+    'TOKEN_TTL': None,
+}
+
+# Task dashboard counts are invalidated on change; the timeout only bounds
+# how stale the time-based counts (overdue, due soon) can get
+TASK_STATS_CACHE_TIMEOUT = 60
+
+# How long deleted-task tombstones are kept for delta sync; clients with an
+# older cursor are asked to reload their task list
+TASK_TOMBSTONE_RETENTION_DAYS = 30
+
+# Broker for task change events streamed by /api/tasks/events/. The in-memory
+# broker only reaches streams served by the same process.
+PUBSUB_BROKER = {
+    'BACKEND': 'taskmanager.pubsub.InMemoryBroker',
+}
+# Seconds between keep-alive comments, and before a stream is closed so the
+# client reconnects (releasing the worker thread it holds under WSGI)
+TASK_EVENTS_HEARTBEAT = 15
+TASK_EVENTS_STREAM_LIFETIME = 300
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Least recently used entries are dropped past MAX_ENTRIES
+    'ai_responses': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'ai-responses',
+        'OPTIONS': {'MAX_ENTRIES': 1000},
+    },
+}
+
+# Background AI jobs, run by `manage.py run_ai_worker`. Jobs running longer
+# than TIMEOUT seconds are retried, up to MAX_ATTEMPTS claims in total.
+AI_JOBS = {
+    'PROCESSES': 2,
+    'POLL_INTERVAL': 2,
+    'TIMEOUT': 300,
+    'MAX_ATTEMPTS': 2,
+}
+
+# Duplicate AI requests in flight at once (double clicks, client retries)
+# wait for the first one and get its result, kept RESULT_TIMEOUT seconds.
+SINGLE_FLIGHT = {
+    'CACHE_ALIAS': 'default',
+    'LOCK_TIMEOUT': 120,
+    'RESULT_TIMEOUT': 10,
+    'POLL_INTERVAL': 0.2,
+}
+
+# Identical AI requests are answered from the cache for TIMEOUT seconds.
+# Expired entries are kept STALE_TIMEOUT seconds longer, to be served when
+# the provider rate limits or times out (SERVE_STALE).
+AI_RESPONSE_CACHE = {
+    'ALIAS': 'ai_responses',
+    'TIMEOUT': 3600,
+    'STALE_TIMEOUT': 86400,
+    'SERVE_STALE': True,
+}
+
+# Outbound AI calls: token buckets per user and per API key, refilled each
+# minute, and a cap on calls in flight across workers sharing CACHE_ALIAS.
+# Calls over a limit wait up to MAX_WAIT seconds, then get a 429.
+AI_RATE_LIMIT = {
+    'ENABLED': True,
+    'CACHE_ALIAS': 'default',
+    'USER_REQUESTS_PER_MINUTE': 30,
+    'USER_TOKENS_PER_MINUTE': 50000,
+    'KEY_REQUESTS_PER_MINUTE': 50,
+    'KEY_TOKENS_PER_MINUTE': 100000,
+    'MAX_IN_FLIGHT': 20,
+    'MAX_WAIT': 10,
+}
+
+# Long task conversations are fed back to the model as a rolling summary plus
+# the newest turns. Once the turns older than the last KEEP_TURNS reach
+# COMPACT_THRESHOLD estimated tokens, a background job folds them into the
+# summary, itself capped at SUMMARY_MAX_TOKENS.
+AI_CONVERSATION = {
+    'KEEP_TURNS': 6,
+    'COMPACT_THRESHOLD': 2000,
+    'SUMMARY_MAX_TOKENS': 500,
+    'CONTEXT_MAX_TOKENS': 4000,
+}
+
+# Per-process cache of each user's Claude settings. Saves replace a version
+# token in the default cache, which invalidates the entry in every worker.
+AI_SETTINGS_CACHE = {
+    'TIMEOUT': 300,
+    'MAX_ENTRIES': 10000,
+}
+
+# Retries and per-provider circuit breakers around AI provider calls
+AI_RESILIENCE = {
+    'CACHE_ALIAS': 'default',
+    'MAX_RETRIES': 2,
+    'BACKOFF_BASE': 0.5,
+    'BACKOFF_MAX': 8,
+    'MAX_RETRY_AFTER': 10,
+    'FAILURE_THRESHOLD': 5,
+    'RECOVERY_TIMEOUT': 30,
+}
+
+# Connection pool shared by all Anthropic API calls in a worker process
+AI_HTTP_CLIENT = {
+    'MAX_CONNECTIONS': 100,
+    'MAX_KEEPALIVE_CONNECTIONS': 20,
+    'KEEPALIVE_EXPIRY': 60,
+    'CONNECT_TIMEOUT': 5,
+    'HTTP2': True,
+}
+
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:3000",
     "http://127.0.0.1:3000",
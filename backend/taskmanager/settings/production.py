@@ -21,12 +21,46 @@ SECURE_PROXY_SSL_HEADER = ('HTTP_X_FORWARDED_PROTO', 'https')
 STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 MIDDLEWARE.insert(1, 'whitenoise.middleware.WhiteNoiseMiddleware')
 
-# Database connection pooling
-DATABASES['default']['CONN_MAX_AGE'] = 60
+# Persistent connections are per thread, and under ASGI sync code runs in
+# short-lived executor threads, so they would leak rather than be reused
+DATABASES['default']['CONN_MAX_AGE'] = 0
 
-# Cache configuration - Database-based caching
-CACHES = {
-    'default': {
+# Caching. With Redis, 'shared' is Redis and 'default' a per-process LRU in
+# front of it, whose entries are invalidated across workers through the
+# Redis pub/sub broker. Locks and counters that must be read fresh every
+# time (AI rate limits, circuit breakers, single-flight) use 'shared'.
+# Without Redis both fall back to the database cache table.
+REDIS_URL = config('REDIS_URL', default='')
+if REDIS_URL:
+    # Task change events and cache invalidations reach every worker through Redis
+    PUBSUB_BROKER = {
+        'BACKEND': 'taskmanager.pubsub.RedisBroker',
+        'OPTIONS': {'url': REDIS_URL},
+    }
+    # Run Redis with maxmemory-policy allkeys-lru
+    CACHES = {
+        'shared': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+            'TIMEOUT': 300,
+        },
+        'default': {
+            'BACKEND': 'taskmanager.cache.TieredCache',
+            'LOCATION': 'default',
+            'OPTIONS': {
+                'SHARED': 'shared',
+                'LOCAL_TIMEOUT': 30,
+                'LOCAL_MAX_ENTRIES': 5000,
+            },
+        },
+        'ai_responses': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+            'KEY_PREFIX': 'ai',
+        },
+    }
+else:
+    DATABASE_CACHE = {
         'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
         'LOCATION': 'taskmanager_cache_table',
         'TIMEOUT': 300,
@@ -35,10 +69,22 @@ CACHES = {
             'CULL_FREQUENCY': 3,
         }
     }
-}
+    CACHES = {
+        'shared': DATABASE_CACHE,
+        'default': DATABASE_CACHE,
+        'ai_responses': CACHES['ai_responses'],
+    }
+AI_RESILIENCE['CACHE_ALIAS'] = 'shared'
+SINGLE_FLIGHT['CACHE_ALIAS'] = 'shared'
+# CachedTokenAuthentication keeps an LRU of its own
+TOKEN_AUTH['CACHE_ALIAS'] = 'shared'
+
+# Tokens expire after 30 days unless overridden
+TOKEN_AUTH['TOKEN_TTL'] = config('TOKEN_TTL', default=60 * 60 * 24 * 30, cast=int)
 
-# Session storage - Database-based sessions
-SESSION_ENGINE = 'django.contrib.sessions.backends.db'
+# Sessions are read from the cache and written through to the database
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+SESSION_CACHE_ALIAS = 'default'
 SESSION_COOKIE_AGE = 1209600  # 2 weeks
 
 # Logging configuration
@@ -104,7 +150,9 @@ HEALTH_CHECK = {
 
 # Rate limiting
 RATELIMIT_ENABLE = True
-RATELIMIT_USE_CACHE = 'default'
+RATELIMIT_USE_CACHE = 'shared'
+AI_RATE_LIMIT['ENABLED'] = RATELIMIT_ENABLE
+AI_RATE_LIMIT['CACHE_ALIAS'] = RATELIMIT_USE_CACHE
 
 # CORS settings for production
 CORS_ALLOWED_ORIGINS = config('CORS_ALLOWED_ORIGINS', default='').split(',')
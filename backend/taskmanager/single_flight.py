@@ -0,0 +1,85 @@
+"""
+Coalescing of duplicate requests across workers.
+
+Callers sharing a key run the work once: the first takes a lock in the
+settings.SINGLE_FLIGHT['CACHE_ALIAS'] cache and computes the result, and
+the others poll until it is published, then return it too. The result is
+kept 'RESULT_TIMEOUT' seconds, so a client retry arriving just after the
+first request finished gets the same answer instead of a second one,
+unless the caller's `reuse` check finds it out of date.
+
+Exceptions are not shared: when the work fails, the lock is released and a
+waiting caller takes over. A caller that dies mid-flight holds the lock for
+at most 'LOCK_TIMEOUT' seconds.
+"""
+import asyncio
+import hashlib
+import json
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+
+DEFAULTS = {
+    'CACHE_ALIAS': 'default',
+    # Longer than the slowest work, retries included
+    'LOCK_TIMEOUT': 120,
+    'RESULT_TIMEOUT': 10,
+    'POLL_INTERVAL': 0.2,
+}
+
+KEY_PREFIX = 'single-flight'
+
+_missing = object()
+
+
+class FlightTimeout(Exception):
+    """The caller holding the lock did not publish a result in time"""
+
+
+def get_options():
+    return {**DEFAULTS, **getattr(settings, 'SINGLE_FLIGHT', {})}
+
+
+def flight_key(*parts) -> str:
+    """Key for work identified by `parts`, which must be JSON serializable"""
+    return hashlib.sha256(json.dumps(parts, sort_keys=True).encode()).hexdigest()
+
+
+async def single_flight(key, work, wait_timeout=None, reuse=None):
+    """
+    Result of `await work()`, computed once for concurrent callers sharing
+    `key`. The result must be picklable. Waiters give up with FlightTimeout
+    after `wait_timeout` seconds, 'LOCK_TIMEOUT' by default.
+
+    When given, `await reuse(result)` tells whether a published result still
+    holds; one that doesn't is dropped and the work runs again.
+    """
+    options = get_options()
+    cache = caches[options['CACHE_ALIAS']]
+    lock_key = f'{KEY_PREFIX}:lock:{key}'
+    result_key = f'{KEY_PREFIX}:result:{key}'
+    deadline = time.monotonic() + (wait_timeout if wait_timeout is not None else options['LOCK_TIMEOUT'])
+
+    while True:
+        result = await cache.aget(result_key, _missing)
+        if result is not _missing:
+            if reuse is None or await reuse(result):
+                return result
+            await cache.adelete(result_key)
+
+        token = uuid.uuid4().hex
+        if await cache.aadd(lock_key, token, timeout=options['LOCK_TIMEOUT']):
+            try:
+                result = await work()
+                await cache.aset(result_key, result, timeout=options['RESULT_TIMEOUT'])
+                return result
+            finally:
+                # Not atomic, but a lock lost to expiry only costs a duplicate call
+                if await cache.aget(lock_key) == token:
+                    await cache.adelete(lock_key)
+
+        if time.monotonic() >= deadline:
+            raise FlightTimeout(key)
+        await asyncio.sleep(options['POLL_INTERVAL'])
@@ -1,7 +1,9 @@
-import React from 'react';
+import React, { useEffect } from 'react';
+import { useQueryClient } from 'react-query';
 import { Outlet, Link, useLocation } from 'react-router-dom';
 import { useAuth } from '../contexts/AuthContext';
 import { useTheme } from '../contexts/ThemeContext';
+import { subscribeToTaskEvents } from '../services/events';
 import ThemeSelector from './ThemeSelector';
 import { LayoutDashboard, CheckSquare, Plus, LogOut, Settings } from 'lucide-react';
 import styled from 'styled-components';
@@ -141,6 +143,19 @@ const ToggleWrapper = styled.div`
 
 function Layout() {
   const { user, logout } = useAuth();
+  const queryClient = useQueryClient();
+
+  // Changes made in other tabs or by the AI are pushed by the server,
+  // so cached task queries are refreshed instead of polled
+  useEffect(() => subscribeToTaskEvents(({ event, id }) => {
+    queryClient.invalidateQueries('tasks');
+    if (id) {
+      queryClient.invalidateQueries(['task', String(id)]);
+    }
+    if (event === 'tags.changed') {
+      queryClient.invalidateQueries('tags');
+    }
+  }), [queryClient]);
   const theme = useTheme();
   const location = useLocation();
 
@@ -6,7 +6,13 @@ import App from './App';
 import { AuthProvider } from './contexts/AuthContext';
 import './index.css';
 
-const queryClient = new QueryClient();
+// Task changes arrive over the server event stream (see services/events.js),
+// so there is no need to refetch whenever the window regains focus
+const queryClient = new QueryClient({
+  defaultOptions: {
+    queries: { refetchOnWindowFocus: false },
+  },
+});
 
 const root = ReactDOM.createRoot(document.getElementById('root'));
 root.render(
@@ -281,6 +281,7 @@ const AISettings = () => {
     model: 'claude-3-5-sonnet-20241022',
     max_tokens: 4096,
     temperature: 0.7,
+    cache_responses: true,
     is_active: false,
     api_key_preview: '',
   });
@@ -318,6 +319,7 @@ const AISettings = () => {
         model: settings.model,
         max_tokens: parseInt(settings.max_tokens),
         temperature: parseFloat(settings.temperature),
+        cache_responses: settings.cache_responses,
       };
 
       if (apiKey.trim()) {
@@ -458,6 +460,18 @@ const AISettings = () => {
           />
           <HelpText>Response creativity level (0.0 = more focused, 1.0 = more creative)</HelpText>
         </FormGroup>
+
+        <FormGroup>
+          <Label>
+            <input
+              type="checkbox"
+              checked={settings.cache_responses}
+              onChange={(e) => setSettings({ ...settings, cache_responses: e.target.checked })}
+            />{' '}
+            Reuse answers to repeated questions
+          </Label>
+          <HelpText>Identical requests are answered from a cache instead of calling Claude again</HelpText>
+        </FormGroup>
       </Section>
 
       <ButtonGroup>
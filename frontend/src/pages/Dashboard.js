@@ -2,7 +2,7 @@ import React from 'react';
 import { useQuery } from 'react-query';
 import { Link } from 'react-router-dom';
 import { tasksAPI } from '../services/api';
-import { extractTasksFromResponse, filterTasksByStatus, filterTasksByPriority } from '../utils/tasks';
+import { extractTasksFromResponse } from '../utils/tasks';
 import { CheckSquare, Clock, AlertCircle, Plus } from 'lucide-react';
 import styled from 'styled-components';
 
@@ -166,21 +166,25 @@ const EmptyState = styled.div`
 `;
 
 function Dashboard() {
-  const { data: tasksResponse, isLoading } = useQuery('tasks', () =>
-    tasksAPI.getTasks().then(res => res.data)
+  const { data: stats, isLoading } = useQuery(['tasks', 'stats'], () =>
+    tasksAPI.getStats().then(res => res.data)
+  );
+  const { data: todoResponse } = useQuery(['tasks', { status: 'todo', page_size: 5 }], () =>
+    tasksAPI.getTasks({ status: 'todo', page_size: 5 }).then(res => res.data)
+  );
+  const { data: inProgressResponse } = useQuery(['tasks', { status: 'in_progress', page_size: 5 }], () =>
+    tasksAPI.getTasks({ status: 'in_progress', page_size: 5 }).then(res => res.data)
   );
 
   if (isLoading) {
     return <div>Loading dashboard...</div>;
   }
 
-  // Safely extract tasks from API response
-  const tasks = extractTasksFromResponse(tasksResponse);
-
-  const todoTasks = filterTasksByStatus(tasks, 'todo');
-  const inProgressTasks = filterTasksByStatus(tasks, 'in_progress');
-  const completedTasks = filterTasksByStatus(tasks, 'completed');
-  const highPriorityTasks = filterTasksByPriority(tasks, ['high', 'urgent']);
+  // Counts come from the stats endpoint; only the five most recent tasks
+  // per column are fetched for display
+  const todoTasks = extractTasksFromResponse(todoResponse);
+  const inProgressTasks = extractTasksFromResponse(inProgressResponse);
+  const highPriorityCount = (stats?.by_priority?.high || 0) + (stats?.by_priority?.urgent || 0);
 
   return (
     <div className="animate-fade-in">
@@ -192,7 +196,7 @@ function Dashboard() {
             <CheckSquare size={24} />
           </StatIcon>
           <StatInfo>
-            <StatNumber>{tasks.length}</StatNumber>
+            <StatNumber>{stats?.total || 0}</StatNumber>
             <StatLabel>Total Tasks</StatLabel>
           </StatInfo>
         </StatCard>
@@ -202,7 +206,7 @@ function Dashboard() {
             <Clock size={24} />
           </StatIcon>
           <StatInfo>
-            <StatNumber>{inProgressTasks.length}</StatNumber>
+            <StatNumber>{stats?.by_status?.in_progress || 0}</StatNumber>
             <StatLabel>In Progress</StatLabel>
           </StatInfo>
         </StatCard>
@@ -212,7 +216,7 @@ function Dashboard() {
             <CheckSquare size={24} />
           </StatIcon>
           <StatInfo>
-            <StatNumber>{completedTasks.length}</StatNumber>
+            <StatNumber>{stats?.by_status?.completed || 0}</StatNumber>
             <StatLabel>Completed</StatLabel>
           </StatInfo>
         </StatCard>
@@ -222,7 +226,7 @@ function Dashboard() {
             <AlertCircle size={24} />
           </StatIcon>
           <StatInfo>
-            <StatNumber>{highPriorityTasks.length}</StatNumber>
+            <StatNumber>{highPriorityCount}</StatNumber>
             <StatLabel>High Priority</StatLabel>
           </StatInfo>
         </StatCard>
@@ -231,10 +235,10 @@ function Dashboard() {
       <SectionTitle>Recent Tasks</SectionTitle>
       <TaskGrid>
         <TaskSection>
-          <TaskSectionHeader>To Do ({todoTasks.length})</TaskSectionHeader>
+          <TaskSectionHeader>To Do ({stats?.by_status?.todo || 0})</TaskSectionHeader>
           <TaskList>
             {todoTasks.length > 0 ? (
-              todoTasks.slice(0, 5).map(task => (
+              todoTasks.map(task => (
                 <TaskItem key={task.id} to={`/tasks/${task.id}`}>
                   <TaskTitle>{task.title}</TaskTitle>
                   <TaskMeta>Priority: {task.priority}</TaskMeta>
@@ -247,10 +251,10 @@ function Dashboard() {
         </TaskSection>
 
         <TaskSection>
-          <TaskSectionHeader>In Progress ({inProgressTasks.length})</TaskSectionHeader>
+          <TaskSectionHeader>In Progress ({stats?.by_status?.in_progress || 0})</TaskSectionHeader>
           <TaskList>
             {inProgressTasks.length > 0 ? (
-              inProgressTasks.slice(0, 5).map(task => (
+              inProgressTasks.map(task => (
                 <TaskItem key={task.id} to={`/tasks/${task.id}`}>
                   <TaskTitle>{task.title}</TaskTitle>
                   <TaskMeta>Priority: {task.priority}</TaskMeta>
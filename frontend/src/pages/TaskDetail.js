@@ -1,7 +1,8 @@
 import React, { useState } from 'react';
 import { useParams, useNavigate } from 'react-router-dom';
-import { useQuery, useMutation, useQueryClient } from 'react-query';
+import { useQuery, useInfiniteQuery, useMutation, useQueryClient } from 'react-query';
 import { tasksAPI } from '../services/api';
+import { streamAISuggestion } from '../services/events';
 import { Edit, Trash2, MessageCircle, ArrowLeft, Layers, Plus } from 'lucide-react';
 import styled from 'styled-components';
 import TaskHierarchy from '../components/TaskHierarchy';
@@ -226,6 +227,18 @@ const ConversationHistory = styled.div`
   transition: all 0.3s ease;
 `;
 
+const ConversationEntry = styled.div`
+  padding-bottom: 15px;
+  margin-bottom: 15px;
+  border-bottom: 1px solid var(--color-border);
+`;
+
+const ConversationTime = styled.div`
+  font-size: 12px;
+  color: var(--color-text-muted);
+  margin-bottom: 5px;
+`;
+
 const ConversationTitle = styled.h4`
   margin: 0 0 15px 0;
   color: var(--color-text);
@@ -331,6 +344,13 @@ function TaskDetail() {
     () => tasksAPI.getTask(id).then(res => res.data)
   );
 
+  const interactionsQuery = useInfiniteQuery(
+    ['task-interactions', id],
+    ({ pageParam }) => tasksAPI.getInteractions(id, pageParam).then(res => res.data),
+    { getNextPageParam: (lastPage) => lastPage.next || undefined }
+  );
+  const interactions = interactionsQuery.data?.pages.flatMap(page => page.results) || [];
+
   const deleteMutation = useMutation(
     () => tasksAPI.deleteTask(id),
     {
@@ -342,23 +362,27 @@ function TaskDetail() {
   );
 
   const aiSuggestionMutation = useMutation(
-    (message) => tasksAPI.getAISuggestion(id, message),
+    (message) => {
+      // Show the suggestion as it is generated
+      setAiResponse('');
+      return streamAISuggestion(id, message, (text) => setAiResponse(prev => prev + text));
+    },
     {
       onSuccess: (data) => {
-        setAiResponse(data.data.ai_response);
+        setAiResponse(data.ai_response);
         setAiMessage(''); // Clear the input after successful submission
-        // Refresh task data to get updated notes
-        queryClient.invalidateQueries(['task', id]);
+        // Refresh the conversation history
+        queryClient.invalidateQueries(['task-interactions', id]);
       },
       onError: (error) => {
-        const errorMessage = error.response?.data?.error || 'Failed to get AI suggestion. Please try again.';
+        const errorMessage = error.message || 'Failed to get AI suggestion. Please try again.';
         setAiResponse(`Error: ${errorMessage}`);
       }
     }
   );
 
   const breakdownMutation = useMutation(
-    () => tasksAPI.breakdownTask(id),
+    () => tasksAPI.breakdownTaskInBackground(id),
     {
       onSuccess: () => {
         // Refresh task data to get new subtasks
@@ -366,7 +390,7 @@ function TaskDetail() {
         queryClient.invalidateQueries('tasks');
       },
       onError: (error) => {
-        const errorMessage = error.response?.data?.error || 'Failed to break down task. Please try again.';
+        const errorMessage = error.response?.data?.error || error.message || 'Failed to break down task. Please try again.';
         alert(errorMessage);
       }
     }
@@ -488,6 +512,12 @@ function TaskDetail() {
           {task.description || <em>No description provided</em>}
         </Description>
 
+        {task.notes && (
+          <Description>
+            <strong>Notes:</strong> {task.notes}
+          </Description>
+        )}
+
         <div>
           <strong>Created:</strong> {new Date(task.created_at).toLocaleString()}
         </div>
@@ -600,11 +630,26 @@ function TaskDetail() {
           </AIResponse>
         )}
 
-        {task.notes && (
+        {interactions.length > 0 && (
           <div>
             <ConversationTitle>Conversation History</ConversationTitle>
             <ConversationHistory>
-              {task.notes}
+              {interactions.map(interaction => (
+                <ConversationEntry key={interaction.id}>
+                  <ConversationTime>{new Date(interaction.created_at).toLocaleString()}</ConversationTime>
+                  {`You: ${interaction.user_message}\nAI: ${interaction.ai_response}`}
+                </ConversationEntry>
+              ))}
+              {interactionsQuery.hasNextPage && (
+                <button
+                  type="button"
+                  className="btn btn-secondary"
+                  onClick={() => interactionsQuery.fetchNextPage()}
+                  disabled={interactionsQuery.isFetchingNextPage}
+                >
+                  {interactionsQuery.isFetchingNextPage ? 'Loading...' : 'Load older messages'}
+                </button>
+              )}
             </ConversationHistory>
           </div>
         )}
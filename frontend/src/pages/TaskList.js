@@ -208,26 +208,28 @@ const EmptyState = styled.div`
   animation: fadeIn 0.5s ease-out;
 `;
 
+const TASK_CARD_FIELDS = 'id,title,description,status,priority,created_at,due_date';
+
 function TaskList() {
   const [search, setSearch] = useState('');
   const [statusFilter, setStatusFilter] = useState('');
   const [priorityFilter, setPriorityFilter] = useState('');
 
-  const { data: tasksResponse, isLoading } = useQuery('tasks', () =>
-    tasksAPI.getTasks().then(res => res.data)
+  const filters = {
+    ...(search && { search }),
+    ...(statusFilter && { status: statusFilter }),
+    ...(priorityFilter && { priority: priorityFilter }),
+  };
+
+  // Filtering and search run server-side so only matching tasks are sent,
+  // with just the fields the cards display
+  const { data: tasksResponse, isLoading } = useQuery(['tasks', filters], () =>
+    tasksAPI.getTasks({ ...filters, fields: TASK_CARD_FIELDS }).then(res => res.data),
+    { keepPreviousData: true }
   );
 
   // Safely extract tasks from API response
-  const tasks = extractTasksFromResponse(tasksResponse);
-
-  const filteredTasks = tasks.filter(task => {
-    const matchesSearch = task.title?.toLowerCase().includes(search.toLowerCase()) ||
-                         task.description?.toLowerCase().includes(search.toLowerCase());
-    const matchesStatus = !statusFilter || task.status === statusFilter;
-    const matchesPriority = !priorityFilter || task.priority === priorityFilter;
-    
-    return matchesSearch && matchesStatus && matchesPriority;
-  });
+  const filteredTasks = extractTasksFromResponse(tasksResponse);
 
   if (isLoading) {
     return <div>Loading tasks...</div>;
@@ -47,8 +47,42 @@ export const tasksAPI = {
   updateTask: (id, data) => api.patch(`/api/tasks/${id}/`, data),
   deleteTask: (id) => api.delete(`/api/tasks/${id}/`),
   getTasksByStatus: (status) => api.get(`/api/tasks/by_status/?status=${status}`),
+  getStats: () => api.get('/api/tasks/stats/'),
+  // Newest first; pass the previous page's `next` URL for older ones
+  getInteractions: (id, nextUrl) => api.get(nextUrl || `/api/tasks/${id}/interactions/`),
   getAISuggestion: (id, message) => api.post(`/api/tasks/${id}/ai_suggest/`, { message }),
   breakdownTask: (id) => api.post(`/api/tasks/${id}/breakdown/`),
+  // Queued on the server; resolves with the finished job
+  breakdownTaskInBackground: async (id) => {
+    const { data } = await api.post(`/api/tasks/${id}/breakdown/`, { background: true });
+    return aiJobsAPI.waitForJob(data.job_id);
+  },
+};
+
+const JOB_POLL_INTERVAL_MS = 1500;
+// A job nobody picks up within this time means no AI worker is running
+const JOB_QUEUED_TIMEOUT_MS = 30000;
+// Longer than the server spends on one AI call, retries included
+const JOB_WAIT_TIMEOUT_MS = 150000;
+
+export const aiJobsAPI = {
+  getJob: (id) => api.get(`/api/ai-jobs/${id}/`),
+  waitForJob: async (id) => {
+    const started = Date.now();
+    for (;;) {
+      const { data: job } = await aiJobsAPI.getJob(id);
+      if (job.status === 'succeeded') return job;
+      if (job.status === 'failed') throw new Error(job.error);
+      const waited = Date.now() - started;
+      if (job.status === 'queued' && waited >= JOB_QUEUED_TIMEOUT_MS) {
+        throw new Error('The AI request is still waiting to be processed. Please make sure the AI worker is running, then try again.');
+      }
+      if (waited >= JOB_WAIT_TIMEOUT_MS) {
+        throw new Error('The AI request is taking too long. Please try again later.');
+      }
+      await new Promise(resolve => setTimeout(resolve, JOB_POLL_INTERVAL_MS));
+    }
+  },
 };
 
 export const tagsAPI = {
@@ -0,0 +1,97 @@
+const API_BASE_URL = process.env.REACT_APP_API_URL || 'http://localhost:8000';
+const RECONNECT_DELAY_MS = 3000;
+
+/**
+ * Follow the server-sent task change stream, calling onEvent with each
+ * parsed event ({ event, id }). EventSource cannot send the auth token
+ * header, so the stream is read with fetch. Reconnects whenever the server
+ * ends the stream; returns a function that stops it.
+ */
+export function subscribeToTaskEvents(onEvent) {
+  let controller = null;
+  let stopped = false;
+
+  const connect = async () => {
+    controller = new AbortController();
+    try {
+      const response = await fetch(`${API_BASE_URL}/api/tasks/events/`, {
+        headers: {
+          Accept: 'text/event-stream',
+          Authorization: `Token ${localStorage.getItem('token')}`,
+        },
+        signal: controller.signal,
+      });
+      if (response.ok) {
+        await readEvents(response.body, onEvent);
+      }
+    } catch (error) {
+      if (error.name === 'AbortError') return;
+    }
+    if (!stopped) {
+      setTimeout(connect, RECONNECT_DELAY_MS);
+    }
+  };
+
+  connect();
+  return () => {
+    stopped = true;
+    controller?.abort();
+  };
+}
+
+/**
+ * Ask for a streamed AI suggestion on a task. onChunk receives each piece
+ * of text as it is generated; resolves with the final { ai_response,
+ * interaction_id } once the server has saved the interaction.
+ */
+export async function streamAISuggestion(taskId, message, onChunk) {
+  const response = await fetch(`${API_BASE_URL}/api/tasks/${taskId}/ai_suggest/`, {
+    method: 'POST',
+    headers: {
+      Accept: 'text/event-stream',
+      Authorization: `Token ${localStorage.getItem('token')}`,
+      'Content-Type': 'application/json',
+    },
+    body: JSON.stringify({ message, stream: true }),
+  });
+  if (!response.ok) {
+    const data = await response.json().catch(() => ({}));
+    throw new Error(data.error || data.detail || 'Failed to get AI suggestion. Please try again.');
+  }
+
+  let result = null;
+  let failure = null;
+  await readEvents(response.body, (data, event) => {
+    if (event === 'chunk') onChunk(data.content);
+    else if (event === 'done') result = data;
+    else if (event === 'error') failure = data.error;
+  });
+  if (failure || !result) {
+    throw new Error(failure || 'The AI suggestion stream ended unexpectedly.');
+  }
+  return result;
+}
+
+async function readEvents(body, onEvent) {
+  const reader = body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+  for (;;) {
+    const { value, done } = await reader.read();
+    if (done) return;
+    buffer += decoder.decode(value, { stream: true });
+    const messages = buffer.split('\n\n');
+    buffer = messages.pop();
+    messages.forEach(message => {
+      const lines = message.split('\n');
+      const event = lines.find(line => line.startsWith('event: '))?.slice(7);
+      const data = lines
+        .filter(line => line.startsWith('data: '))
+        .map(line => line.slice(6))
+        .join('\n');
+      if (data) {
+        onEvent(JSON.parse(data), event);
+      }
+    });
+  }
+}